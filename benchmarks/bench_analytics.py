@@ -0,0 +1,37 @@
+"""
+Time repeated longest-streak queries answered from the habits' memoized streaks.
+
+Run from the repository root:
+    python -m benchmarks.bench_analytics [n_users] [n_completions]
+"""
+import sys
+import time
+from datetime import datetime
+from src.analytics import get_user_longest_streak_all, get_cache_info, reset_cache_info
+from benchmarks.datagen import make_users
+
+def time_queries(users) -> float:
+    start = time.perf_counter()
+    for user in users:
+        get_user_longest_streak_all(user)
+    return time.perf_counter() - start
+
+def main(n_users: int = 10_000, n_completions: int = 100) -> None:
+    users = list(make_users(n_users, 3, n_completions).values())
+    print(f"get_user_longest_streak_all on {n_users} users x 3 habits x {n_completions} completions")
+
+    reset_cache_info()
+    cold_time = time_queries(users)
+    warm_time = time_queries(users)
+    for user in users[:n_users // 100]:
+        user.get_habits()[0].add_completion(datetime.now())
+    changed_time = time_queries(users)
+
+    info = get_cache_info()
+    print(f"first query:              {cold_time * 1000:8.1f} ms")
+    print(f"repeated query:           {warm_time * 1000:8.1f} ms  ({cold_time / warm_time:.0f}x)")
+    print(f"after 1% of users change: {changed_time * 1000:8.1f} ms")
+    print(f"memoized streaks: {info.hits} hits, {info.misses} misses")
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,52 @@
+"""
+Compare a streaming heap leaderboard with loading every user and sorting all streaks.
+
+Run from the repository root:
+    python -m benchmarks.bench_leaderboard [n_users] [k]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from src.user import User
+from src.storage import JSONStorage
+from src.analytics import get_leaderboard
+from benchmarks.datagen import make_users
+
+def sort_all(file_path: str, k: int) -> list:
+    # The approach without a leaderboard API: load everything, compute every streak, sort
+    users = User.load_all_from_json(file_path)
+    streaks = {(user.username, habit.name): habit.get_longest_streak()
+               for user in users.values() for habit in user.get_habits()}
+    return sorted(streaks.items(), key=lambda item: item[1], reverse=True)[:k]
+
+def measure(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    # Tracing slows allocation down, so the peak is measured in a second run
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def main(n_users: int = 100_000, k: int = 10) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'users_data.json')
+        User.save_all_to_json(make_users(n_users, 3, 30), file_path)
+        print(f"top {k} of {n_users} users x 3 habits x 30 completions")
+
+        expected, sort_time, sort_peak = measure(sort_all, file_path, k)
+        storage = JSONStorage(file_path)
+        storage.load_users()  # Build the index outside the measurement
+        leaderboard, heap_time, heap_peak = measure(get_leaderboard, storage, k)
+        storage.close()
+        assert [entry.streak for entry in leaderboard] == [streak for _, streak in expected]
+
+    print(f"load all + sort:      {sort_time * 1000:9.1f} ms  peak {sort_peak / 1e3:10.0f} kB")
+    print(f"streaming + nlargest: {heap_time * 1000:9.1f} ms  peak {heap_peak / 1e3:10.0f} kB")
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,34 @@
+"""
+Compare the resident size of list-backed and compact habits.
+
+Run from the repository root:
+    python -m benchmarks.bench_memory [n_habits] [n_completions]
+"""
+import random
+import sys
+import tracemalloc
+from src.habit import Habit
+from benchmarks.datagen import FREQUENCIES, make_habit
+
+def measure(n_habits: int, n_completions: int, compact: bool) -> int:
+    rng = random.Random(0)
+    templates = [make_habit(f"habit{i}", FREQUENCIES[i % len(FREQUENCIES)], n_completions, rng).to_dict()
+                 for i in range(n_habits)]
+    tracemalloc.start()
+    habits = [Habit.from_dict(data, compact=compact) for data in templates]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del habits
+    return size
+
+def main(n_habits: int = 1000, n_completions: int = 1000) -> None:
+    print(f"{n_habits} habits x {n_completions} completions")
+    list_size = measure(n_habits, n_completions, compact=False)
+    compact_size = measure(n_habits, n_completions, compact=True)
+    total = n_habits * n_completions
+    print(f"list of datetimes: {list_size / 1e6:8.1f} MB  ({list_size / total:5.1f} bytes/completion)")
+    print(f"CompletionLog:     {compact_size / 1e6:8.1f} MB  ({compact_size / total:5.1f} bytes/completion, "
+          f"{list_size / compact_size:.1f}x smaller)")
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
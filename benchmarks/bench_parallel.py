@@ -0,0 +1,37 @@
+"""
+Time sharded multi-process analytics with a growing number of workers.
+
+Run from the repository root:
+    python -m benchmarks.bench_parallel [n_users] [shard_size]
+"""
+import os
+import sys
+import time
+from datetime import datetime
+from src.analytics import get_completion_rate
+from src.parallel import ParallelAnalytics
+from benchmarks.datagen import make_users
+
+def main(n_users: int = 20_000, shard_size: int = 1000) -> None:
+    users = list(make_users(n_users, 3, 300).values())
+    start, end = datetime(2020, 1, 1), datetime(2021, 1, 1)
+    print(f"{n_users} users x 3 habits x 300 completions, {os.cpu_count()} CPUs")
+
+    begin = time.perf_counter()
+    for user in users:
+        for habit in user.get_habits():
+            habit.get_longest_streak()
+            get_completion_rate(habit, start, end)
+    serial_time = time.perf_counter() - begin
+    print(f"single process, per habit: {serial_time * 1000:9.1f} ms")
+
+    workers = 1
+    while workers <= (os.cpu_count() or 1):
+        begin = time.perf_counter()
+        ParallelAnalytics(workers, shard_size).run(users, 10, start, end)
+        elapsed = time.perf_counter() - begin
+        print(f"{workers:3d} worker(s):              {elapsed * 1000:9.1f} ms  ({serial_time / elapsed:.1f}x)")
+        workers *= 2
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
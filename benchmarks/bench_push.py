@@ -0,0 +1,85 @@
+"""
+Compare per-message latency of push notifications sent with a new connection
+each (requests.post) and over a keep-alive session.
+
+A local HTTP/1.1 server stands in for FCM. It has no TLS, so the gap against
+the real endpoint, where every new connection also pays a TLS handshake, is
+larger than measured here.
+
+Run from the repository root:
+    python -m benchmarks.bench_push [n_messages]
+"""
+import multiprocessing
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from src.user import User
+from src.habit import Habit
+from src.reminder import Reminder, create_push_session
+
+class PushHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = b'{"success": 1}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+def serve(ports: multiprocessing.Queue) -> None:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PushHandler)
+    server.daemon_threads = True
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+def main(n_messages: int = 1000) -> None:
+    # Serve from another process so the server does not compete with the client for the GIL
+    ports = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve, args=(ports,), daemon=True)
+    process.start()
+    url = f"http://127.0.0.1:{ports.get()}/fcm/send"
+
+    user = User(username="bench_user", email="bench_user@example.com")
+    habit = Habit(name="Exercise", frequency="daily")
+    user.add_habit(habit)
+    session = create_push_session(max_connections=10)
+    reminder = Reminder(user, session=session, push_url=url, push_timeout=10)
+    headers = reminder.build_push_headers()
+    tokens = [f"device{i}" for i in range(n_messages)]
+    payloads = [reminder.build_push_payload([habit], token) for token in tokens]
+    print(f"{n_messages} push notifications to {url}")
+
+    start = time.perf_counter()
+    for payload in payloads:
+        requests.post(url, headers=headers, json=payload, timeout=10).raise_for_status()
+    fresh_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for payload in payloads:
+        assert reminder.post_push(headers, payload).success
+    session_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = reminder.send_push_batch([habit], tokens, max_workers=10)
+    batch_time = time.perf_counter() - start
+    assert all(result.success for result in results)
+    session.close()
+    process.terminate()
+    process.join()
+
+    print(f"new connection per message: {fresh_time / n_messages * 1e6:8.0f} us/message")
+    print(f"keep-alive session:         {session_time / n_messages * 1e6:8.0f} us/message  "
+          f"({fresh_time / session_time:.1f}x)")
+    print(f"batch, 10 connections:      {batch_time / n_messages * 1e6:8.0f} us/message  "
+          f"({fresh_time / batch_time:.1f}x)")
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,40 @@
+"""
+Compare running CLI commands as separate processes and in one shell process.
+
+Run from the repository root:
+    python -m benchmarks.bench_shell [n_commands] [n_users]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from src.user import User
+from benchmarks.datagen import make_users
+
+def main(n_commands: int = 50, n_users: int = 10_000) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'users_data.json')
+        User.save_all_to_json(make_users(n_users, 3, 30), file_path)
+        env = dict(os.environ, HABIT_DATA_FILE=file_path, PYTHONPATH=os.getcwd())
+        # Each process has to select the user again before completing a habit
+        print(f"{n_commands} x (change-user + complete-task) on {n_users} users")
+
+        start = time.perf_counter()
+        for _ in range(n_commands):
+            subprocess.run([sys.executable, '-m', 'src.cli', 'shell'], env=env, check=True,
+                           input="change-user user0\ncomplete-task habit0\n", capture_output=True, text=True)
+        process_time = time.perf_counter() - start
+
+        script = "change-user user0\n" + "complete-task habit0\n" * n_commands
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'src.cli', 'shell'], env=env, check=True,
+                       input=script, capture_output=True, text=True)
+        shell_time = time.perf_counter() - start
+
+    print(f"one process per command: {process_time / n_commands * 1000:8.1f} ms/command")
+    print(f"one shell:               {shell_time / n_commands * 1000:8.1f} ms/command  "
+          f"({process_time / shell_time:.0f}x)")
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,47 @@
+"""
+Compare CLI startup cost of eager and lazy loading of a users JSON file.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup [n_users]
+"""
+import os
+import sys
+import tempfile
+import time
+from src.user import User
+from src.store import LazyUserStore
+from benchmarks.datagen import make_users
+
+def main(n_users: int = 10_000, n_habits: int = 3, n_completions: int = 30) -> None:
+    users = make_users(n_users, n_habits, n_completions)
+    target = f"user{n_users // 2}"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'users_data.json')
+        User.save_all_to_json(users, file_path)
+        del users
+        size_mb = os.path.getsize(file_path) / 1e6
+        print(f"{n_users} users x {n_habits} habits x {n_completions} completions ({size_mb:.1f} MB)")
+
+        start = time.perf_counter()
+        eager = User.load_all_from_json(file_path)
+        eager[target].get_habits()
+        eager_time = time.perf_counter() - start
+        del eager
+
+        start = time.perf_counter()
+        lazy = LazyUserStore(file_path)
+        lazy[target].get_habits()
+        lazy_time = time.perf_counter() - start
+
+        os.remove(f"{file_path}.idx")
+        start = time.perf_counter()
+        cold = LazyUserStore(file_path)
+        cold[target].get_habits()
+        cold_time = time.perf_counter() - start
+
+    print(f"eager load + lookup:              {eager_time * 1000:9.1f} ms")
+    print(f"lazy load + lookup (index):       {lazy_time * 1000:9.1f} ms  ({eager_time / lazy_time:.0f}x)")
+    print(f"lazy load + lookup (rebuild idx): {cold_time * 1000:9.1f} ms  ({eager_time / cold_time:.1f}x)")
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,41 @@
+"""
+Compare calculate_streak with the NumPy batch streak engine.
+
+Run from the repository root:
+    python -m benchmarks.bench_streaks [n_completions]
+"""
+import random
+import sys
+import time
+from src.analytics import calculate_streak
+from src.batch_analytics import BatchStreakEngine, to_datetime64
+from benchmarks.datagen import FREQUENCIES, make_habit
+
+def main(n_completions: int = 1_000_000, per_habit: int = 1000) -> None:
+    rng = random.Random(0)
+    habits = [make_habit(f"habit{i}", FREQUENCIES[i % len(FREQUENCIES)], per_habit, rng)
+              for i in range(n_completions // per_habit)]
+    print(f"{len(habits)} habits x {per_habit} completions")
+
+    start = time.perf_counter()
+    expected = [calculate_streak(habit.completion_dates, habit.frequency) for habit in habits]
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    arrays = [to_datetime64(habit.completion_dates) for habit in habits]
+    convert_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine = BatchStreakEngine()
+    for habit, dates in zip(habits, arrays):
+        engine.add(habit.name, dates, habit.frequency)
+    streaks = engine.longest_streaks().tolist()
+    engine_time = time.perf_counter() - start
+    assert streaks == expected
+
+    print(f"calculate_streak loop:          {loop_time * 1000:9.1f} ms")
+    print(f"batch engine (datetime64 input): {engine_time * 1000:8.1f} ms  ({loop_time / engine_time:.0f}x)")
+    print(f"datetime -> datetime64 conversion: {convert_time * 1000:6.1f} ms")
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
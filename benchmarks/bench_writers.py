@@ -0,0 +1,51 @@
+"""
+Time concurrent writer processes appending completions to one users file.
+
+Run from the repository root:
+    python -m benchmarks.bench_writers [n_writers] [n_records]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from src.user import User
+from src.habit import Habit
+from src.journal import Journal
+from src.storage import JSONStorage
+
+def write(file_path: str, habit_name: str, n_records: int) -> None:
+    storage = JSONStorage(file_path)
+    habit = storage.load_users()["user0"].get_habit_by_name(habit_name)
+    for i in range(n_records):
+        completed_at = datetime(2020, 1, 1) + timedelta(hours=i)
+        habit.add_completion(completed_at)
+        storage.complete("user0", habit_name, completed_at)
+    storage.close()
+
+def main(n_writers: int = 4, n_records: int = 5000) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'users_data.json')
+        user = User("user0", "user0@example.com")
+        for i in range(n_writers):
+            user.add_habit(Habit(f"habit{i}", "daily"))
+        User.save_all_to_json({"user0": user}, file_path)
+        print(f"{n_writers} writer processes x {n_records} completions")
+
+        start = time.perf_counter()
+        processes = [multiprocessing.Process(target=write, args=(file_path, f"habit{i}", n_records))
+                     for i in range(n_writers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        users = Journal(file_path).load()
+        kept = sum(len(habit.completion_dates) for habit in users["user0"].get_habits())
+    print(f"{elapsed * 1000:9.1f} ms, {n_writers * n_records / elapsed:9.0f} records/s, "
+          f"{kept} of {n_writers * n_records} completions kept")
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,50 @@
+import random
+from datetime import datetime, timedelta
+from typing import Dict
+from src.user import User
+from src.habit import Habit
+
+FREQUENCIES = ['daily', 'weekly', 'monthly']
+STEPS = {'daily': timedelta(days=1), 'weekly': timedelta(weeks=1), 'monthly': timedelta(days=30)}
+
+def make_habit(name: str, frequency: str, n_completions: int, rng: random.Random) -> Habit:
+    """
+    Create a habit with a synthetic completion history.
+
+    Completions are spaced one period apart with an occasional missed period,
+    so the history contains several streaks of different lengths.
+
+    :param name: The name of the habit.
+    :param frequency: The frequency of the habit.
+    :param n_completions: The number of completions to generate.
+    :param rng: The random number generator to use.
+    """
+    habit = Habit(name=name, frequency=frequency)
+    habit.creation_date = datetime(2020, 1, 1)
+    step = STEPS[frequency]
+    completed_at = habit.creation_date + timedelta(hours=rng.randrange(24))
+    dates = []
+    for _ in range(n_completions):
+        dates.append(completed_at)
+        completed_at += step * (2 if rng.random() < 0.1 else 1)
+    habit.completion_dates = dates
+    return habit
+
+def make_users(n_users: int, n_habits: int, n_completions: int, seed: int = 0) -> Dict[str, User]:
+    """
+    Create N users with M habits each and K completions per habit.
+
+    :param n_users: The number of users.
+    :param n_habits: The number of habits per user.
+    :param n_completions: The number of completions per habit.
+    :param seed: The random seed, so runs are reproducible.
+    """
+    rng = random.Random(seed)
+    users = {}
+    for i in range(n_users):
+        username = f"user{i}"
+        user = User(username=username, email=f"{username}@example.com")
+        for j in range(n_habits):
+            user.add_habit(make_habit(f"habit{j}", FREQUENCIES[j % len(FREQUENCIES)], n_completions, rng))
+        users[username] = user
+    return users
@@ -0,0 +1,229 @@
+"""
+Time the storage, analytics and reminder hot paths on synthetic data and
+record the results as JSON, so runs on different commits can be compared.
+
+Each case runs --repeat times on N users x M habits x K completions and
+reports the minimum, median and every run in seconds. Reminders are sent
+with ``Reminder.send_reminders`` to local stand-in SMTP and push servers.
+
+Run from the repository root:
+    python -m benchmarks.suite [--users N] [--habits M] [--completions K] [--repeat R]
+                               [--only CASE]... [--output results.json]
+    python -m benchmarks.suite --compare baseline.json [--threshold 10]
+
+With --compare the run is checked against an earlier --output file, and the
+exit status is 1 if the minimum of any case got slower by more than
+--threshold percent. The minimum is the run least disturbed by the rest of
+the machine, so it is the most stable figure to gate on.
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional
+from src.user import User
+from src.analytics import calculate_streak, get_user_longest_streak_all
+from src.reminder import Reminder, SMTPConnectionPool, create_push_session
+from tests.stand_ins import LocalSMTPServer, LocalPushServer
+from benchmarks.datagen import make_users
+
+FORMAT_VERSION = 1
+
+class Workload(NamedTuple):
+    """
+    The data every case runs on.
+    """
+    users: Dict[str, User]
+    file_path: str
+    reminder_users: List[User]
+
+class Case(NamedTuple):
+    """
+    A benchmark: ``setup`` prepares the workload and returns the function to time.
+    """
+    name: str
+    setup: Callable[[Workload], Callable[[], object]]
+
+def setup_json_save(workload: Workload) -> Callable[[], None]:
+    return lambda: User.save_all_to_json(workload.users, workload.file_path)
+
+def setup_json_load(workload: Workload) -> Callable[[], Dict[str, User]]:
+    User.save_all_to_json(workload.users, workload.file_path)
+    return lambda: User.load_all_from_json(workload.file_path)
+
+def setup_calculate_streak(workload: Workload) -> Callable[[], List[int]]:
+    habits = [habit for user in workload.users.values() for habit in user.get_habits()]
+    return lambda: [calculate_streak(habit.completion_dates, habit.frequency) for habit in habits]
+
+def setup_longest_streak_all(workload: Workload) -> Callable[[], List[Optional[str]]]:
+    users = list(workload.users.values())
+    habits = [habit for user in users for habit in user.get_habits()]
+
+    def run() -> List[Optional[str]]:
+        # Measure the streak computation rather than memo hits: resetting the
+        # frequency drops each habit's streak state
+        for habit in habits:
+            habit.frequency = habit.frequency
+        return [get_user_longest_streak_all(user) for user in users]
+    return run
+
+def setup_longest_streak_all_cached(workload: Workload) -> Callable[[], List[Optional[str]]]:
+    users = list(workload.users.values())
+    for user in users:
+        get_user_longest_streak_all(user)
+    return lambda: [get_user_longest_streak_all(user) for user in users]
+
+def setup_send_reminders(workload: Workload) -> Callable[[], None]:
+    # The sender address comes from the config; the stand-in accepts any login
+    os.environ.setdefault('EMAIL_USER', "bench@example.com")
+    # The servers live as long as the process; they are daemon threads
+    smtp = LocalSMTPServer().__enter__()
+    push = LocalPushServer().__enter__()
+    pool = SMTPConnectionPool("bench@example.com", "secret", host='127.0.0.1', port=smtp.port,
+                              use_ssl=False, size=4, timeout=10)
+    reminders = [Reminder(user, session=create_push_session(), push_url=push.url, pool=pool)
+                 for user in workload.reminder_users]
+
+    # Reminder prints a line per message; keep them out of the report
+    devnull = open(os.devnull, 'w')
+
+    def run() -> None:
+        with contextlib.redirect_stdout(devnull):
+            for reminder in reminders:
+                reminded = reminder.send_reminders()
+                assert len(reminded) == len(reminder.user.get_habits()), reminder.user.username
+    return run
+
+CASES = [
+    Case('json_save', setup_json_save),
+    Case('json_load', setup_json_load),
+    Case('calculate_streak', setup_calculate_streak),
+    Case('longest_streak_all', setup_longest_streak_all),
+    Case('longest_streak_all_cached', setup_longest_streak_all_cached),
+    Case('send_reminders', setup_send_reminders),
+]
+
+def time_case(function: Callable[[], object], repeat: int) -> Dict:
+    """
+    Time a function several times.
+
+    :param function: The function to time.
+    :param repeat: The number of runs.
+    :return: The minimum, median and every run in seconds.
+    """
+    runs = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - start)
+    return {'min': min(runs), 'median': statistics.median(runs), 'runs': runs}
+
+def git_commit() -> Optional[str]:
+    """
+    Get the commit being benchmarked, if run from a git checkout.
+    """
+    try:
+        result = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+def run_suite(n_users: int, n_habits: int, n_completions: int, n_reminder_users: int, repeat: int,
+              only: Optional[List[str]] = None) -> Dict:
+    """
+    Run the benchmark cases.
+
+    :param n_users: The number of users.
+    :param n_habits: The number of habits per user.
+    :param n_completions: The number of completions per habit.
+    :param n_reminder_users: The number of users to send reminders to.
+    :param repeat: The number of runs per case.
+    :param only: The names of the cases to run (defaults to all).
+    :return: The results, as written by --output.
+    """
+    cases = [case for case in CASES if not only or case.name in only]
+    users = make_users(n_users, n_habits, n_completions)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        workload = Workload(users, os.path.join(tmp_dir, 'users_data.json'), list(users.values())[:n_reminder_users])
+        for case in cases:
+            results[case.name] = time_case(case.setup(workload), repeat)
+            print(f"{case.name:<28} min {results[case.name]['min'] * 1000:10.2f} ms"
+                  f"   median {results[case.name]['median'] * 1000:10.2f} ms")
+    return {
+        'format': FORMAT_VERSION,
+        'commit': git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'workload': {'users': n_users, 'habits': n_habits, 'completions': n_completions,
+                     'reminder_users': n_reminder_users, 'repeat': repeat},
+        'results': results,
+    }
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """
+    Compare the minimum of each case with a baseline run.
+
+    :param baseline: The results of the earlier run.
+    :param current: The results of this run.
+    :param threshold: The slowdown, as a fraction, above which a case counts as a regression.
+    :return: The names of the cases that regressed.
+    """
+    if baseline['workload'] != current['workload']:
+        print(f"Warning: the baseline ran a different workload: {baseline['workload']}")
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} ({baseline['created']}):")
+    regressions = []
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            print(f"{name:<28} (not in baseline)")
+            continue
+        before, after = baseline['results'][name]['min'], result['min']
+        ratio = after / before if before else float('inf')
+        status = ''
+        if ratio > 1 + threshold:
+            status = 'REGRESSION'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            status = 'faster'
+        print(f"{name:<28} {before * 1000:10.2f} ms -> {after * 1000:10.2f} ms  {ratio:6.2f}x  {status}")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the storage, analytics and reminder hot paths.")
+    parser.add_argument('--users', type=int, default=1000, help="Number of users.")
+    parser.add_argument('--habits', type=int, default=3, help="Habits per user.")
+    parser.add_argument('--completions', type=int, default=100, help="Completions per habit.")
+    parser.add_argument('--reminder-users', type=int, default=100, help="Users to send reminders to.")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per case.")
+    parser.add_argument('--only', action='append', choices=[case.name for case in CASES], help="Run only this case.")
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    parser.add_argument('--compare', help="Compare with the results in this JSON file.")
+    parser.add_argument('--threshold', type=float, default=10.0, help="Slowdown in percent that counts as a regression.")
+    args = parser.parse_args(argv)
+
+    print(f"{args.users} users x {args.habits} habits x {args.completions} completions, {args.repeat} runs per case")
+    results = run_suite(args.users, args.habits, args.completions, args.reminder_users, args.repeat, args.only)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold / 100)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:g}%: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,41 +1,84 @@
+import heapq
 from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
 from src.habit import Habit
 from src.user import User
+from src.storage import Storage
+from src.streaks import calculate_streaks, get_rule
 
-def get_all_habits() -> list:
+def load_habits(storage: Optional[Storage] = None) -> list:
+    """
+    Return every habit from a storage backend, or from habits.json if none is given.
+
+    :param storage: The storage backend to read habits from.
+    """
+    if storage is None:
+        return Habit.load_all()
+    return [habit for _, habit in storage.iter_habits()]
+
+class CacheInfo(NamedTuple):
+    """
+    Hit and miss counts of the habits' memoized streaks.
+    """
+    hits: int
+    misses: int
+
+def get_cache_info() -> CacheInfo:
+    """
+    Return how many streak lookups were answered from a habit's memoized state and how many recomputed it.
+
+    Habits keep their streaks until a completion or frequency change, and saved
+    habits carry them, so lookups on habits reloaded from storage hit as well.
+    """
+    return CacheInfo(Habit.memo_hits, Habit.memo_misses)
+
+def reset_cache_info() -> None:
+    """
+    Reset the hit and miss counts.
+    """
+    Habit.memo_hits = 0
+    Habit.memo_misses = 0
+
+def get_all_habits(storage: Optional[Storage] = None) -> list:
     """
     Return a list of all currently tracked habits.
+
+    :param storage: The storage backend to read habits from (defaults to habits.json).
     """
-    habits = Habit.load_all()
+    habits = load_habits(storage)
     return [habit.name for habit in habits]
 
-def get_habits_by_period(frequency: str) -> list:
+def get_habits_by_period(frequency: str, storage: Optional[Storage] = None) -> list:
     """
     Return a list of all habits with the same periodicity.
     
     :param frequency: The frequency to filter habits by ('daily', 'weekly', 'monthly').
+    :param storage: The storage backend to read habits from (defaults to habits.json).
     """
-    habits = Habit.load_all()
+    habits = load_habits(storage)
     return [habit.name for habit in habits if habit.frequency == frequency]
 
-def get_longest_streak(habit_name: str) -> int:
+def get_longest_streak(habit_name: str, storage: Optional[Storage] = None) -> int:
     """
     Return the longest run streak for a given habit.
     
     :param habit_name: The name of the habit.
+    :param storage: The storage backend to read habits from (defaults to habits.json).
     """
-    habit = Habit.load(habit_name)
+    habit = Habit.load(habit_name) if storage is None else storage.find_habit(habit_name)
     if habit:
-        return calculate_streak(habit.completion_dates, habit.frequency)
+        return habit.get_longest_streak()
     return 0
 
-def get_longest_streak_all() -> str:
+def get_longest_streak_all(storage: Optional[Storage] = None) -> Optional[str]:
     """
     Return the habit with the longest run streak among all defined habits.
+
+    :param storage: The storage backend to read habits from (defaults to habits.json).
+    :return: The name of the habit, or None if there are no habits.
     """
-    habits = Habit.load_all()
-    streaks = {habit.name: calculate_streak(habit.completion_dates, habit.frequency) for habit in habits}
-    return max(streaks, key=streaks.get)
+    best = max(load_habits(storage), key=Habit.get_longest_streak, default=None)
+    return best.name if best else None
 
 def get_user_longest_streak(user: User, habit_name: str) -> int:
     """
@@ -46,57 +89,240 @@ def get_user_longest_streak(user: User, habit_name: str) -> int:
     """
     habit = user.get_habit_by_name(habit_name)
     if habit:
-        return calculate_streak(habit.completion_dates, habit.frequency)
+        return habit.get_longest_streak()
     return 0
 
-def get_user_longest_streak_all(user: User) -> str:
+def get_user_longest_streak_all(user: User) -> Optional[str]:
     """
     Return the habit with the longest run streak among all habits for a specific user.
     
     :param user: The user object.
+    :return: The name of the habit, or None if the user has no habits.
     """
-    streaks = {habit.name: calculate_streak(habit.completion_dates, habit.frequency) for habit in user.get_habits()}
-    return max(streaks, key=streaks.get)
+    best = max(user.get_habits(), key=Habit.get_longest_streak, default=None)
+    return best.name if best else None
 
 def calculate_streak(completion_dates: list, frequency: str) -> int:
     """
     Calculate the longest streak for a given list of completion dates and frequency.
-    
-    :param completion_dates: A list of completion dates.
-    :param frequency: The frequency of the habit ('daily', 'weekly', 'monthly').
-    """
-    if not completion_dates:
-        return 0
-
-    # Sort completion dates
-    sorted_dates = sorted(completion_dates)
-    longest_streak = 1
-    current_streak = 1
 
-    # Calculate streaks
-    for i in range(1, len(sorted_dates)):
-        if is_within_frequency(sorted_dates[i - 1], sorted_dates[i], frequency):
-            current_streak += 1
-            longest_streak = max(longest_streak, current_streak)
-        else:
-            current_streak = 1
+    Completions are numbered by the period they fall in, so several completions
+    in one period count once, and the distinct periods are scanned in one pass.
 
-    return longest_streak
+    :param completion_dates: A list of completion dates or a CompletionLog, in any order.
+    :param frequency: The frequency of the habit (see ``streaks.get_rule``).
+    """
+    if len(completion_dates) < 2:
+        return len(completion_dates)
+    return calculate_streaks(completion_dates, frequency).longest
 
 def is_within_frequency(date1: datetime, date2: datetime, frequency: str) -> bool:
     """
-    Check if two dates are within the specified frequency.
-    
+    Check if two dates fall in the same or consecutive periods of the specified frequency.
+
     :param date1: The first date.
     :param date2: The second date.
-    :param frequency: The frequency to check ('daily', 'weekly', 'monthly').
-    """
-    if frequency == 'daily':
-        return date2 - date1 <= timedelta(days=1)
-    elif frequency == 'weekly':
-        return date2 - date1 <= timedelta(weeks=1)
-    elif frequency == 'monthly':
-        return (date2.year == date1.year and date2.month == date1.month + 1) or \
-               (date2.year == date1.year + 1 and date2.month == 1 and date1.month == 12)
+    :param frequency: The frequency to check (see ``streaks.get_rule``).
+    """
+    rule = get_rule(frequency)
+    return 0 <= rule.bucket(date2) - rule.bucket(date1) <= 1
+
+def period_start(date: datetime, period: str) -> datetime:
+    """
+    Return the start of the calendar day, week (starting Monday) or month containing a date.
+
+    :param date: The date.
+    :param period: The period ('day', 'week', 'month').
+    """
+    day = datetime(date.year, date.month, date.day)
+    if period == 'day':
+        return day
+    elif period == 'week':
+        return day - timedelta(days=day.weekday())
+    elif period == 'month':
+        return day.replace(day=1)
+    else:
+        raise ValueError("Unsupported period. Use 'day', 'week', or 'month'.")
+
+def next_period_start(start: datetime, period: str) -> datetime:
+    """
+    Return the start of the period after the one starting at ``start``.
+
+    :param start: The start of a period.
+    :param period: The period ('day', 'week', 'month').
+    """
+    if period == 'day':
+        return start + timedelta(days=1)
+    elif period == 'week':
+        return start + timedelta(weeks=1)
+    elif period == 'month':
+        return start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
     else:
-        raise ValueError("Unsupported frequency. Use 'daily', 'weekly', or 'monthly'.")
+        raise ValueError("Unsupported period. Use 'day', 'week', or 'month'.")
+
+def count_completions(habit: Habit, start: Optional[datetime] = None, end: Optional[datetime] = None) -> int:
+    """
+    Return the number of completions of a habit in ``[start, end)`` in O(log n).
+
+    :param habit: The habit.
+    :param start: The earliest completion to count.
+    :param end: The completion time to stop before.
+    """
+    low, high = habit.completion_span(start, end)
+    return high - low
+
+def get_completions_between(habit: Habit, start: Optional[datetime] = None,
+                            end: Optional[datetime] = None) -> List[datetime]:
+    """
+    Return the completions of a habit in ``[start, end)`` in chronological order, in O(log n + k).
+
+    :param habit: The habit.
+    :param start: The earliest completion to include.
+    :param end: The completion time to stop before.
+    """
+    return list(habit.completions_between(start, end))
+
+def get_histogram(habit: Habit, start: datetime, end: datetime, period: str = 'day') -> List[Tuple[datetime, int]]:
+    """
+    Count a habit's completions per day, week or month over ``[start, end)``.
+
+    Costs O(log n + k + buckets): only the completions in the range are visited.
+
+    :param habit: The habit.
+    :param start: The start of the range.
+    :param end: The end of the range (exclusive).
+    :param period: The bucket size ('day', 'week', 'month').
+    :return: (bucket start, count) pairs for every bucket overlapping the range, including empty ones.
+    """
+    dates = habit.sorted_completions()
+    low, high = habit.completion_span(start, end)
+    histogram = []
+    bucket = period_start(start, period)
+    i = low
+    while bucket < end:
+        bucket_end = next_period_start(bucket, period)
+        count = 0
+        while i < high and dates[i] < bucket_end:
+            count += 1
+            i += 1
+        histogram.append((bucket, count))
+        bucket = bucket_end
+    return histogram
+
+def get_period_histogram(habit: Habit, start: datetime, end: datetime) -> List[Tuple[datetime, int]]:
+    """
+    Count a habit's completions per period of its own frequency over ``[start, end)``.
+
+    Reads the habit's per-period counters, so it costs O(buckets) whatever
+    the number of completions. Periods partly in the range count in full.
+
+    :param habit: The habit.
+    :param start: The start of the range.
+    :param end: The end of the range (exclusive).
+    :return: (period start, count) pairs for every period overlapping the range, including empty ones.
+    """
+    if end <= start:
+        return []
+    rule = get_rule(habit.frequency)
+    counts = habit.period_counts()
+    return [(rule.start(period), counts.get(period, 0))
+            for period in range(rule.bucket(start), rule.bucket(end - timedelta(microseconds=1)) + 1)]
+
+def get_completion_rate(habit: Habit, start: datetime, end: datetime) -> float:
+    """
+    Return the share of the habit's periods in ``[start, end)`` with at least one completion.
+
+    A daily habit is measured in calendar days, a weekly one in weeks and a
+    monthly one in months; periods partly in the range count.
+
+    :param habit: The habit.
+    :param start: The start of the range.
+    :param end: The end of the range (exclusive).
+    :return: The completion rate, between 0 and 1.
+    """
+    rule = get_rule(habit.frequency)
+    if end <= start:
+        return 0.0
+    completed = len(set(map(rule.bucket, habit.completions_between(start, end))))
+    return completed / (rule.bucket(end - timedelta(microseconds=1)) - rule.bucket(start) + 1)
+
+def get_current_streak(habit: Habit, now: Optional[datetime] = None) -> int:
+    """
+    Return the habit's streak if it is still alive, i.e. the next completion would extend it.
+
+    :param habit: The habit.
+    :param now: The current time (defaults to now).
+    """
+    now = datetime.now() if now is None else now
+    streak = habit.get_current_streak()
+    last_completion = habit.get_last_completion()
+    if last_completion is None:
+        return 0
+    # Still in the period of the last completion (e.g. the same month), or in the next one
+    rule = get_rule(habit.frequency)
+    if rule.bucket(now) - rule.bucket(last_completion) > 1:
+        return 0
+    return streak
+
+LEADERBOARD_METRICS = ('longest', 'current')
+
+class LeaderboardEntry(NamedTuple):
+    """
+    A place on a leaderboard: a habit of a user, or a user's best habit.
+    """
+    user: str
+    habit: str
+    streak: int
+
+def iter_streaks(users: Iterable[User], metric: str = 'longest',
+                 now: Optional[datetime] = None) -> Iterator[LeaderboardEntry]:
+    """
+    Generate one entry per habit with its longest or current streak.
+
+    :param users: The users.
+    :param metric: 'longest' or 'current' (the current streak is 0 once a period has been missed).
+    :param now: The time to measure current streaks at (defaults to now).
+    """
+    if metric not in LEADERBOARD_METRICS:
+        raise ValueError("Unsupported metric. Use 'longest' or 'current'.")
+    now = datetime.now() if now is None else now
+    for user in users:
+        for habit in user.get_habits():
+            streak = habit.get_longest_streak() if metric == 'longest' else get_current_streak(habit, now)
+            yield LeaderboardEntry(user.username, habit.name, streak)
+
+def best_per_user(entries: Iterable[LeaderboardEntry]) -> Iterator[LeaderboardEntry]:
+    """
+    Reduce habit entries, grouped by user as ``iter_streaks`` yields them, to each user's best habit.
+
+    :param entries: The habit entries.
+    """
+    best = None
+    for entry in entries:
+        if best is not None and entry.user != best.user:
+            yield best
+            best = None
+        if best is None or entry.streak > best.streak:
+            best = entry
+    if best is not None:
+        yield best
+
+def get_leaderboard(storage: Storage, k: int = 10, metric: str = 'longest', by_user: bool = False,
+                    now: Optional[datetime] = None) -> List[LeaderboardEntry]:
+    """
+    Return the top K habits, or users, by streak across every user.
+
+    Users are streamed from storage one at a time and only the best K entries
+    are kept on a heap, so this takes O(n log k) time and O(k) memory.
+
+    :param storage: The storage holding the users.
+    :param k: The number of entries to return.
+    :param metric: 'longest' or 'current'.
+    :param by_user: Rank users by their best habit instead of ranking habits.
+    :param now: The time to measure current streaks at (defaults to now).
+    :return: The entries, best first; ties keep storage order.
+    """
+    entries = iter_streaks(storage.iter_users(), metric, now)
+    if by_user:
+        entries = best_per_user(entries)
+    return heapq.nlargest(k, entries, key=lambda entry: entry.streak)
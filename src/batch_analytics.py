@@ -0,0 +1,124 @@
+from datetime import datetime
+from typing import Hashable, Iterable, List
+import numpy as np
+from src.habit import Habit
+from src.completions import CompletionLog, to_timestamp
+from src.streaks import get_rule
+
+def to_datetime64(completion_dates: Iterable[datetime]) -> np.ndarray:
+    """
+    Convert completion dates to a datetime64 array with microsecond precision.
+
+    :param completion_dates: The completion dates.
+    """
+    # Integer arithmetic on the datetimes is several times faster than letting NumPy convert them
+    if isinstance(completion_dates, CompletionLog):
+        # Copy so the log's array is not left exporting its buffer (which would block appends)
+        return np.frombuffer(completion_dates.timestamps, dtype=np.int64).view('datetime64[us]').copy()
+    return np.array([to_timestamp(date) for date in completion_dates], dtype=np.int64).view('datetime64[us]')
+
+class BatchStreakEngine:
+    def __init__(self):
+        """
+        Initialize an empty batch of habits.
+
+        Each habit's completions are kept as a datetime64 array; streaks for the
+        whole batch are computed at once by numbering the periods completions
+        fall in (one vectorized call per frequency) and detecting runs of
+        consecutive periods.
+        """
+        self.keys: List[Hashable] = []
+        self._dates: List[np.ndarray] = []
+        self._frequencies: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, key: Hashable, completion_dates, frequency: str) -> None:
+        """
+        Add a habit's completions to the batch.
+
+        :param key: The key the habit's results are reported under.
+        :param completion_dates: The completion dates, as datetimes, a CompletionLog or a datetime64 array.
+        :param frequency: The frequency of the habit (see ``streaks.get_rule``).
+        """
+        if isinstance(completion_dates, np.ndarray):
+            dates = completion_dates.astype('datetime64[us]')
+        else:
+            dates = to_datetime64(completion_dates)
+        self.keys.append(key)
+        self._dates.append(dates)
+        self._frequencies.append(frequency)
+
+    def add_habit(self, habit: Habit, key: Hashable = None) -> None:
+        """
+        Add a habit to the batch.
+
+        :param habit: The habit to add.
+        :param key: The key to report results under (defaults to the habit's name).
+        """
+        self.add(habit.name if key is None else key, habit.completion_dates, habit.frequency)
+
+    def longest_streaks(self) -> np.ndarray:
+        """
+        Calculate the longest streak of every habit in the batch.
+
+        Gives the same results as ``analytics.calculate_streak`` for each habit.
+
+        :return: An array with the longest streak of each habit, in the order they were added.
+        """
+        n_habits = len(self.keys)
+        lengths = np.array([len(dates) for dates in self._dates], dtype=np.int64)
+        if lengths.sum() == 0:
+            return np.zeros(n_habits, dtype=np.int64)
+
+        habit_ids = np.repeat(np.arange(n_habits), lengths)
+        # Period numbers grow with time, so sorting each habit's dates sorts its periods too
+        dates = np.concatenate([np.sort(dates) for dates in self._dates])
+        periods = np.zeros(len(dates), dtype=np.int64)
+        frequencies = np.array(self._frequencies, dtype=object)
+        for frequency in set(self._frequencies):
+            members = frequencies == frequency
+            # A lone completion is a streak of one, so only histories of two or more need a rule
+            if not (lengths[members] > 1).any():
+                continue
+            selected = members[habit_ids]
+            periods[selected] = get_rule(frequency).bucket_array(dates[selected])
+
+        # Keep each (habit, period) once
+        new_habit = np.ones(len(periods), dtype=bool)
+        new_habit[1:] = habit_ids[1:] != habit_ids[:-1]
+        keep = new_habit.copy()
+        keep[1:] |= periods[1:] != periods[:-1]
+        habit_ids, periods, new_habit = habit_ids[keep], periods[keep], new_habit[keep]
+
+        # A run starts at each habit's first period and after every gap of more than one period
+        run_start = new_habit.copy()
+        run_start[1:] |= periods[1:] - periods[:-1] != 1
+        positions = np.arange(len(periods))
+        runs = positions - np.maximum.accumulate(np.where(run_start, positions, 0)) + 1
+
+        longest = np.zeros(n_habits, dtype=np.int64)
+        firsts = np.flatnonzero(new_habit)
+        longest[habit_ids[firsts]] = np.maximum.reduceat(runs, firsts)
+        return longest
+
+    def results(self) -> dict:
+        """
+        Calculate the longest streak of every habit in the batch.
+
+        :return: A dictionary mapping each habit's key to its longest streak.
+        """
+        return dict(zip(self.keys, self.longest_streaks().tolist()))
+
+def batch_longest_streaks(habits: Iterable[Habit]) -> dict:
+    """
+    Calculate the longest streak of many habits at once.
+
+    :param habits: The habits to calculate streaks for.
+    :return: A dictionary mapping habit names to their longest streaks.
+    """
+    engine = BatchStreakEngine()
+    for habit in habits:
+        engine.add_habit(habit)
+    return engine.results()
@@ -0,0 +1,163 @@
+import csv
+import json
+import os
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, TextIO, Tuple
+from src.storage import Storage
+
+# A completion to import: (username, habit name, completion time)
+Record = Tuple[str, str, datetime]
+
+FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+class ImportReport(NamedTuple):
+    """
+    The outcome of a bulk import.
+    """
+    records: int
+    added: int
+    duplicates: int
+    unknown: int
+
+def parse_timestamp(value: str) -> datetime:
+    """
+    Parse an ISO-8601 completion time into the naive local time the app stores.
+
+    :param value: The timestamp.
+    """
+    date = datetime.fromisoformat(value)
+    if date.tzinfo is not None:
+        date = date.astimezone().replace(tzinfo=None)
+    return date
+
+def read_csv(f: TextIO) -> Iterator[Record]:
+    """
+    Read completions from CSV with a header row naming the user, habit and timestamp columns.
+
+    :param f: The CSV file.
+    """
+    for line, row in enumerate(csv.DictReader(f), start=2):
+        try:
+            yield row['user'], row['habit'], parse_timestamp(row['timestamp'])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid record on line {line}: {e}") from e
+
+def read_ndjson(f: TextIO) -> Iterator[Record]:
+    """
+    Read completions from newline-delimited JSON objects with user, habit and timestamp keys.
+
+    Records with a 'type' other than 'completion' (as written by ``export``) are skipped.
+
+    :param f: The NDJSON file.
+    """
+    for line, text in enumerate(f, start=1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+            if record.get('type', 'completion') != 'completion':
+                continue
+            yield record['user'], record['habit'], parse_timestamp(record['timestamp'])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid record on line {line}: {e}") from e
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+def read_records(f: TextIO, fmt: str) -> Iterator[Record]:
+    """
+    Read completions from a file, one record at a time.
+
+    :param f: The file.
+    :param fmt: The format ('csv' or 'ndjson').
+    """
+    if fmt not in READERS:
+        raise ValueError(f"Unsupported format '{fmt}'. Use one of: {', '.join(READERS)}.")
+    return READERS[fmt](f)
+
+def guess_format(file_path: str) -> str:
+    """
+    Guess the format of a completions file from its extension.
+
+    :param file_path: The path to the file.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Cannot tell the format of '{file_path}' from its extension.")
+    return FORMATS[extension]
+
+def batched(records: Iterable[Record], batch_size: int) -> Iterator[List[Record]]:
+    """
+    Split records into lists of at most ``batch_size``.
+
+    :param records: The records.
+    :param batch_size: The maximum number of records per batch.
+    """
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def bulk_import(storage: Storage, records: Iterable[Record], batch_size: int = 10_000) -> ImportReport:
+    """
+    Import completions into existing habits, one batch at a time.
+
+    Each batch is grouped by habit and merged into each habit's history with a
+    single sort, then persisted with one storage call. Only one batch of
+    records is read at a time, and users loaded for a batch are released
+    again once the storage can reload them (see ``Storage.release_users``), so
+    memory stays bounded however large the input is. Users that were loaded
+    before the import are kept. Completions that are already recorded are
+    skipped, and records naming an unknown user or habit are counted but not
+    imported.
+
+    :param storage: The storage holding the users.
+    :param records: The (username, habit name, completion time) records.
+    :param batch_size: The number of records per batch.
+    :return: The import report.
+    """
+    users = storage.load_users()
+    # Users this import loaded and has not released yet
+    loaded: Set[str] = set()
+    total = added = duplicates = unknown = 0
+    for batch in batched(records, batch_size):
+        groups: Dict[Tuple[str, str], List[datetime]] = defaultdict(list)
+        for username, habit_name, completed_at in batch:
+            groups[(username, habit_name)].append(completed_at)
+        merges = {}
+        for (username, habit_name), dates in groups.items():
+            was_loaded = username in loaded or storage.is_loaded(username)
+            user = users.get(username)
+            if user is not None and not was_loaded:
+                loaded.add(username)
+            if user is None or not user.has_habit(habit_name):
+                unknown += len(dates)
+                continue
+            merged = user.get_habit_by_name(habit_name).merge_completions(dates)
+            if merged:
+                merges[(username, habit_name)] = merged
+            added += len(merged)
+            duplicates += len(dates) - len(merged)
+        if merges:
+            storage.merge_completions(merges)
+        loaded -= storage.release_users(loaded)
+        total += len(batch)
+    return ImportReport(total, added, duplicates, unknown)
+
+def bulk_import_file(storage: Storage, file_path: str, fmt: Optional[str] = None,
+                     batch_size: int = 10_000) -> ImportReport:
+    """
+    Import completions from a CSV or NDJSON file.
+
+    :param storage: The storage holding the users.
+    :param file_path: The path to the file.
+    :param fmt: The format ('csv' or 'ndjson'; guessed from the extension if omitted).
+    :param batch_size: The number of records per batch.
+    :return: The import report.
+    """
+    fmt = fmt or guess_format(file_path)
+    with open(file_path, 'r', newline='' if fmt == 'csv' else None) as f:
+        return bulk_import(storage, read_records(f, fmt), batch_size)
@@ -1,16 +1,26 @@
+import os
+import shlex
+import sys
+from datetime import datetime
 import click
 from src.user import User
 from src.habit import Habit
-from src.analytics import get_longest_streak, get_longest_streak_all, get_user_longest_streak, get_user_longest_streak_all
+from src.storage import open_storage
+from src.serializers import SERIALIZERS, convert as convert_users
+from src.bulk_import import READERS, bulk_import_file
+from src.export import iter_records, write_ndjson
+from src.analytics import (get_longest_streak, get_longest_streak_all, get_user_longest_streak,
+                           get_user_longest_streak_all, get_completion_rate, get_current_streak, get_histogram,
+                           get_period_histogram, get_leaderboard)
 
-# Define the path to the JSON file
-USER_DATA_FILE = 'users_data.json'
+# Define the path to the data file: a users JSON file, a binary snapshot (.bin) or a SQLite database (.db, .sqlite)
+USER_DATA_FILE = os.environ.get('HABIT_DATA_FILE', 'users_data.json')
 
-# Load all users data from JSON file
-try:
-    users = User.load_all_from_json(USER_DATA_FILE)
-except FileNotFoundError:
-    users = {}
+# For JSON, mutations are appended to a journal next to the file and compacted into it in the background
+storage = open_storage(USER_DATA_FILE)
+
+# Users are loaded on first access
+users = storage.load_users()
 
 # Current user
 current_user = None
@@ -32,7 +42,7 @@ def create_user(username, email):
     user = User(username=username, email=email)
     users[username] = user
     current_user = user
-    User.save_all_to_json(users, USER_DATA_FILE)
+    storage.create_user(user)
     click.echo(f"User '{username}' with email '{email}' created.")
 
 @cli.command()
@@ -46,7 +56,7 @@ def remove_user(username):
     del users[username]
     if current_user and current_user.username == username:
         current_user = None
-    User.save_all_to_json(users, USER_DATA_FILE)
+    storage.remove_user(username)
     click.echo(f"User '{username}' removed.")
 
 @cli.command()
@@ -69,8 +79,12 @@ def create_habit(name, frequency):
         click.echo("No user selected. Use 'change_user' to select a user.")
         return
     habit = Habit(name=name, frequency=frequency)
-    current_user.add_habit(habit)
-    User.save_all_to_json(users, USER_DATA_FILE)
+    try:
+        current_user.add_habit(habit)
+    except ValueError as e:
+        click.echo(str(e))
+        return
+    storage.add_habit(current_user.username, habit)
     click.echo(f"Habit '{name}' with frequency '{frequency}' created.")
 
 @cli.command()
@@ -97,22 +111,26 @@ def modify_frequency(name, new_frequency):
     try:
         habit = current_user.get_habit_by_name(name)
         habit.frequency = new_frequency
-        User.save_all_to_json(users, USER_DATA_FILE)
+        storage.set_frequency(current_user.username, name, new_frequency)
         click.echo(f"Habit '{name}' frequency updated to '{new_frequency}'.")
     except ValueError as e:
         click.echo(str(e))
 
 @cli.command()
 @click.argument('name')
-def complete_task(name):
+@click.option('--again', is_flag=True, help="Record the completion even if the habit is already done this period.")
+def complete_task(name, again):
     """Mark a habit task as completed."""
     if not current_user:
         click.echo("No user selected. Use 'change_user' to select a user.")
         return
     try:
         habit = current_user.get_habit_by_name(name)
-        habit.complete_task()
-        User.save_all_to_json(users, USER_DATA_FILE)
+        if not again and habit.is_done():
+            click.echo(f"Habit '{name}' is already completed for this period. Use --again to record another completion.")
+            return
+        completed_at = habit.complete_task()
+        storage.complete(current_user.username, name, completed_at)
         click.echo(f"Habit '{name}' marked as completed.")
     except ValueError as e:
         click.echo(str(e))
@@ -134,7 +152,237 @@ def longest_streak_all():
         click.echo("No user selected. Use 'change_user' to select a user.")
         return
     habit_name = get_user_longest_streak_all(current_user)
+    if habit_name is None:
+        click.echo(f"User '{current_user.username}' has no habits.")
+        return
     click.echo(f"The habit with the longest streak is '{habit_name}'.")
 
+@cli.command()
+@click.option('--top', 'k', type=click.IntRange(min=1), default=10, show_default=True, help="Number of places to show.")
+@click.option('--by', 'metric', type=click.Choice(['longest', 'current']), default='longest', show_default=True,
+              help="Rank by longest or current streak.")
+@click.option('--users', 'by_user', is_flag=True, help="Rank users by their best habit instead of ranking habits.")
+def leaderboard(k, metric, by_user):
+    """Show the top habits or users by streak across all users."""
+    entries = get_leaderboard(storage, k, metric, by_user)
+    if not entries:
+        click.echo("No habits found.")
+        return
+    for place, entry in enumerate(entries, start=1):
+        click.echo(f"{place:3d}. {entry.user:<20} {entry.habit:<20} {entry.streak}")
+
+def habit_range(habit, since, until):
+    # Defaults to the habit's whole life so far
+    return since or habit.creation_date, until or datetime.now()
+
+@cli.command()
+@click.argument('name')
+@click.option('--since', type=click.DateTime(), help="Start of the range (default: when the habit was created).")
+@click.option('--until', type=click.DateTime(), help="End of the range, exclusive (default: now).")
+def completion_rate(name, since, until):
+    """Get the share of periods in a range in which a habit was completed."""
+    if not current_user:
+        click.echo("No user selected. Use 'change_user' to select a user.")
+        return
+    try:
+        habit = current_user.get_habit_by_name(name)
+        start, end = habit_range(habit, since, until)
+        rate = get_completion_rate(habit, start, end)
+    except ValueError as e:
+        click.echo(str(e))
+        return
+    click.echo(f"Habit '{name}' was completed in {rate:.0%} of its periods from {start:%Y-%m-%d} to {end:%Y-%m-%d}.")
+
+@cli.command()
+@click.argument('name')
+def current_streak(name):
+    """Get the current streak of a habit."""
+    if not current_user:
+        click.echo("No user selected. Use 'change_user' to select a user.")
+        return
+    try:
+        streak = get_current_streak(current_user.get_habit_by_name(name))
+    except ValueError as e:
+        click.echo(str(e))
+        return
+    click.echo(f"The current streak for habit '{name}' is {streak}.")
+
+@cli.command()
+@click.argument('name')
+@click.option('--by', 'period', type=click.Choice(['day', 'week', 'month', 'period']), default='day', show_default=True,
+              help="Bucket size; 'period' uses the habit's own frequency.")
+@click.option('--since', type=click.DateTime(), help="Start of the range (default: when the habit was created).")
+@click.option('--until', type=click.DateTime(), help="End of the range, exclusive (default: now).")
+def histogram(name, period, since, until):
+    """Count a habit's completions per day, week or month."""
+    if not current_user:
+        click.echo("No user selected. Use 'change_user' to select a user.")
+        return
+    try:
+        habit = current_user.get_habit_by_name(name)
+        start, end = habit_range(habit, since, until)
+        if period == 'period':
+            buckets = get_period_histogram(habit, start, end)
+        else:
+            buckets = get_histogram(habit, start, end, period)
+    except ValueError as e:
+        click.echo(str(e))
+        return
+    for bucket, count in buckets:
+        click.echo(f"{bucket:%Y-%m-%d}  {count:4d}  {'#' * count}")
+
+@cli.command()
+@click.argument('source')
+@click.argument('target')
+@click.option('--from', 'source_fmt', type=click.Choice(list(SERIALIZERS)), help="Format of SOURCE (default: from extension).")
+@click.option('--to', 'target_fmt', type=click.Choice(list(SERIALIZERS)), help="Format of TARGET (default: from extension).")
+def convert(source, target, source_fmt, target_fmt):
+    """Convert a users file between JSON and the binary snapshot format."""
+    try:
+        count = convert_users(source, target, source_fmt, target_fmt)
+    except (OSError, ValueError) as e:
+        click.echo(str(e))
+        return
+    click.echo(f"Converted {count} users from '{source}' to '{target}'.")
+
+@cli.command()
+@click.option('--digest', is_flag=True, help="Send one email and one push notification per user.")
+@click.option('--email-concurrency', default=4, show_default=True, help="SMTP connections to send over.")
+@click.option('--push-concurrency', default=20, show_default=True, help="Push requests in flight at once.")
+@click.option('--timeout', default=10.0, show_default=True, help="Seconds to wait for each request.")
+@click.option('--retries', default=3, show_default=True, help="Retries for each failed push notification.")
+@click.option('--all', 'remind_all', is_flag=True, help="Remind about every habit, not only those that are due.")
+def send_reminders(digest, email_concurrency, push_concurrency, timeout, retries, remind_all):
+    """Send reminders about due habits to all users concurrently."""
+    # Imported here so other commands don't pay for loading requests and the SMTP stack at startup
+    from src.reminder import SMTPConnectionPool, smtp_settings
+    from src.dispatcher import ReminderDispatcher
+    from src.scheduler import ReminderScheduler
+    recipients = [users[username] for username in users]
+    if not recipients:
+        click.echo("No users to remind.")
+        return
+    with SMTPConnectionPool(size=email_concurrency, timeout=timeout, **smtp_settings()) as pool:
+        dispatcher = ReminderDispatcher(pool, push_concurrency=push_concurrency, timeout=timeout,
+                                        max_retries=retries, digest=digest)
+        now = datetime.now()
+        if remind_all:
+            report = dispatcher.run(recipients)
+        else:
+            scheduler = ReminderScheduler()
+            try:
+                scheduler.add_users(recipients)
+                report = dispatcher.run_due(scheduler, now)
+            finally:
+                # The shell keeps the users loaded; don't leave the habits listening to this run's scheduler
+                scheduler.close()
+    # Saved so the next run doesn't remind about the same habits again this period
+    if report.reminded:
+        for username, habit_name in report.reminded:
+            users[username].get_habit_by_name(habit_name).last_reminded = now
+        storage.record_reminders(dict.fromkeys(report.reminded, now))
+    for result in report.failures:
+        click.echo(f"Failed to send reminder to {result.recipient}: {result.error}")
+    click.echo(f"Sent {len(report.emails)} emails and {len(report.pushes)} push notifications "
+               f"({len(report.failures)} failed).")
+
+@cli.command()
+@click.argument('file')
+@click.option('--format', 'fmt', type=click.Choice(list(READERS)), help="Format of FILE (default: from extension).")
+@click.option('--batch-size', default=10_000, show_default=True, help="Records merged and saved at a time.")
+def bulk_import(file, fmt, batch_size):
+    """Import completions from a CSV or NDJSON file of user, habit and timestamp."""
+    try:
+        report = bulk_import_file(storage, file, fmt, batch_size)
+    except (OSError, ValueError) as e:
+        click.echo(str(e))
+        return
+    click.echo(f"Read {report.records} records: {report.added} completions added, "
+               f"{report.duplicates} already recorded, {report.unknown} for unknown users or habits.")
+
+@cli.command()
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help="File to write (default: standard output).")
+@click.option('--user', 'usernames', multiple=True, help="Only export this user (repeatable).")
+@click.option('--habit', 'habit_names', multiple=True, help="Only export this habit (repeatable).")
+@click.option('--since', type=click.DateTime(), help="Only export completions at or after this time.")
+@click.option('--until', type=click.DateTime(), help="Only export completions before this time.")
+def export(output, usernames, habit_names, since, until):
+    """Export users, habits and completions as NDJSON, one record per line."""
+    records = iter_records(storage, usernames or None, habit_names or None, since, until)
+    if output is None:
+        write_ndjson(records, sys.stdout)
+        return
+    with open(output, 'w') as f:
+        count = write_ndjson(records, f)
+    click.echo(f"Exported {count} records to '{output}'.")
+
+@cli.command()
+@click.option('--workers', type=click.IntRange(min=1), help="Number of worker processes (default: one per CPU).")
+@click.option('--shard-size', default=1000, show_default=True, type=click.IntRange(min=1),
+              help="Users per shard sent to a worker.")
+@click.option('--top', 'k', type=click.IntRange(min=1), default=10, show_default=True, help="Number of places to show.")
+@click.option('--since', type=click.DateTime(), help="Start of the range for completion rates.")
+@click.option('--until', type=click.DateTime(), help="End of the range for completion rates (default: now).")
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help="Write each habit's results to this NDJSON file.")
+def analyze(workers, shard_size, k, since, until, output):
+    """Compute the streaks and completion rates of every habit of every user in parallel."""
+    # Imported here so other commands don't pay for loading numpy at startup
+    from src.parallel import ParallelAnalytics
+    if since is not None and until is None:
+        until = datetime.now()
+    try:
+        summary = ParallelAnalytics(workers, shard_size).run(storage.iter_users(), k, since, until)
+    except ValueError as e:
+        click.echo(str(e))
+        return
+    click.echo(f"Analyzed {len(summary.longest)} habits.")
+    for place, entry in enumerate(summary.leaderboard, start=1):
+        click.echo(f"{place:3d}. {entry.user:<20} {entry.habit:<20} {entry.streak}")
+    if summary.rates:
+        click.echo(f"Average completion rate: {sum(summary.rates.values()) / len(summary.rates):.0%}")
+    if output is not None:
+        records = ({'type': 'stats', 'user': user, 'habit': habit, 'longest_streak': streak,
+                    'completion_rate': summary.rates.get((user, habit))}
+                   for (user, habit), streak in summary.longest.items())
+        with open(output, 'w') as f:
+            count = write_ndjson(records, f)
+        click.echo(f"Wrote {count} records to '{output}'.")
+
+@cli.command()
+@click.option('--flush-delay', default=1.0, show_default=True,
+              help="Seconds to buffer changes before writing them to disk.")
+def shell(flush_delay):
+    """Run commands in one process, keeping users and the current user loaded."""
+    prompt = "habit> " if sys.stdin.isatty() else ""
+    storage.set_flush_delay(flush_delay)
+    try:
+        while True:
+            try:
+                line = input(prompt)
+            except EOFError:
+                break
+            try:
+                args = shlex.split(line)
+            except ValueError as e:
+                click.echo(str(e))
+                continue
+            if not args:
+                continue
+            if args[0] in ('exit', 'quit'):
+                break
+            if args[0] == 'shell':
+                click.echo("Already in the shell.")
+                continue
+            try:
+                cli.main(args=args, prog_name='', standalone_mode=False)
+            except click.UsageError as e:
+                click.echo(f"Error: {e.format_message()}")
+            except click.ClickException as e:
+                e.show()
+            except click.exceptions.Abort:
+                click.echo("Aborted!")
+    finally:
+        storage.set_flush_delay(0)
+
 if __name__ == '__main__':
     cli()
\ No newline at end of file
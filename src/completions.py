@@ -0,0 +1,116 @@
+from array import array
+from collections.abc import MutableSequence
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, Union
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+def to_timestamp(date: datetime) -> int:
+    """
+    Convert a datetime to microseconds since the epoch.
+
+    Timezone-aware datetimes are first converted to the naive local time the
+    app stores, as ``bulk_import.parse_timestamp`` does.
+
+    :param date: The datetime to convert.
+    """
+    if date.tzinfo is not None:
+        date = date.astimezone().replace(tzinfo=None)
+    return (date - EPOCH) // MICROSECOND
+
+def from_timestamp(timestamp: int) -> datetime:
+    """
+    Convert microseconds since the epoch to a naive datetime.
+
+    :param timestamp: The timestamp to convert.
+    """
+    return EPOCH + timedelta(0, 0, timestamp)
+
+class CompletionLog(MutableSequence):
+    def __init__(self, dates: Iterable[datetime] = ()):
+        """
+        Initialize a compact list of completion dates.
+
+        Dates are stored as int64 microseconds since the epoch in an ``array('q')``
+        (8 bytes each instead of a 48-byte datetime plus a list slot) and converted
+        back to datetimes on access. Microseconds keep the ISO-8601 round trip exact.
+
+        :param dates: The initial completion dates.
+        """
+        self.timestamps = array('q', (to_timestamp(date) for date in dates))
+
+    @classmethod
+    def from_timestamps(cls, timestamps: Iterable[int]) -> 'CompletionLog':
+        """
+        Create a completion log from microsecond timestamps.
+
+        :param timestamps: Microseconds since the epoch, as integers or a buffer of int64.
+        :return: A CompletionLog object.
+        """
+        log = cls()
+        if isinstance(timestamps, (bytes, bytearray, memoryview)):
+            log.timestamps.frombytes(timestamps)
+        else:
+            log.timestamps.extend(timestamps)
+        return log
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[datetime, 'CompletionLog']:
+        if isinstance(index, slice):
+            return CompletionLog.from_timestamps(self.timestamps[index])
+        return from_timestamp(self.timestamps[index])
+
+    def __setitem__(self, index: Union[int, slice], value) -> None:
+        if isinstance(index, slice):
+            self.timestamps[index] = array('q', (to_timestamp(date) for date in value))
+        else:
+            self.timestamps[index] = to_timestamp(value)
+
+    def __delitem__(self, index: Union[int, slice]) -> None:
+        del self.timestamps[index]
+
+    def __iter__(self) -> Iterator[datetime]:
+        return (from_timestamp(timestamp) for timestamp in self.timestamps)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, CompletionLog):
+            return self.timestamps == other.timestamps
+        try:
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"CompletionLog({list(self)!r})"
+
+    def insert(self, index: int, date: datetime) -> None:
+        self.timestamps.insert(index, to_timestamp(date))
+
+    def append(self, date: datetime) -> None:
+        self.timestamps.append(to_timestamp(date))
+
+    def extend(self, dates: Iterable[datetime]) -> None:
+        if isinstance(dates, CompletionLog):
+            self.timestamps.extend(dates.timestamps)
+        else:
+            self.timestamps.extend(to_timestamp(date) for date in dates)
+
+    def sort(self) -> None:
+        self.timestamps = array('q', sorted(self.timestamps))
+
+    def sorted(self) -> 'CompletionLog':
+        """
+        Return a sorted copy without materializing the dates.
+
+        :return: A sorted CompletionLog.
+        """
+        return CompletionLog.from_timestamps(sorted(self.timestamps))
+
+    def nbytes(self) -> int:
+        """
+        Return the size of the timestamp buffer in bytes.
+        """
+        return self.timestamps.itemsize * len(self.timestamps)
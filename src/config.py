@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+# Settings that can be given as environment variables, which take precedence over the file
+ENVIRONMENT = {
+    'email_user': 'EMAIL_USER',
+    'email_pass': 'EMAIL_PASS',
+    'fcm_server_key': 'FCM_SERVER_KEY',
+    'smtp_host': 'SMTP_HOST',
+    'smtp_port': 'SMTP_PORT',
+    'smtp_ssl': 'SMTP_SSL',
+}
+
+class ConfigProvider:
+    def __init__(self, file_path: str = 'config.json', check_interval: float = 1.0):
+        """
+        Initialize a provider of the application configuration.
+
+        The file is parsed once and cached. It is checked for changes (by mtime and
+        size) at most every ``check_interval`` seconds and re-read only if it
+        changed, so building many reminders touches it once. A missing file is
+        treated as empty, so settings can come from the environment alone.
+
+        :param file_path: The path to the configuration file, relative to the working directory.
+        :param check_interval: The minimum number of seconds between checks for changes.
+        """
+        self.file_path = file_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._config: Dict = {}
+        self._signature: Optional[tuple] = None
+        self._checked_at: Optional[float] = None
+        self.reads = 0
+
+    def _file_signature(self, path: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (path, stat.st_mtime_ns, stat.st_size)
+
+    def load(self) -> Dict:
+        """
+        Get the settings from the configuration file, re-reading it if it changed.
+
+        :return: A dictionary of settings (not including environment overrides).
+        """
+        path = os.path.abspath(self.file_path)
+        with self._lock:
+            now = time.monotonic()
+            if (self._checked_at is not None and now - self._checked_at < self.check_interval
+                    and self._signature is not None and self._signature[0] == path):
+                return self._config
+            self._checked_at = now
+            signature = self._file_signature(path)
+            if signature is None:
+                self._config, self._signature = {}, (path, None, None)
+            elif signature != self._signature:
+                with open(path, 'r') as f:
+                    self._config = json.load(f)
+                self._signature = signature
+                self.reads += 1
+            return self._config
+
+    def get(self, key: str, default=None):
+        """
+        Get a setting, from its environment variable if set, else from the configuration file.
+
+        :param key: The name of the setting.
+        :param default: The value to return if the setting is not given.
+        """
+        variable = ENVIRONMENT.get(key)
+        if variable is not None and variable in os.environ:
+            return os.environ[variable]
+        return self.load().get(key, default)
+
+    def invalidate(self) -> None:
+        """
+        Force the next access to re-read the configuration file.
+        """
+        with self._lock:
+            self._signature = None
+            self._checked_at = None
+
+_provider = ConfigProvider()
+
+def get_config() -> ConfigProvider:
+    """
+    Get the configuration provider shared by the whole process.
+    """
+    return _provider
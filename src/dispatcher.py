@@ -0,0 +1,190 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.mime.text import MIMEText
+from typing import Callable, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+import requests
+from src.user import User
+from src.habit import Habit
+from src.scheduler import ReminderScheduler
+from src.reminder import (Reminder, SMTPConnectionPool, DeliveryResult, FCM_URL, DEVICE_TOKEN_PLACEHOLDER,
+                          create_push_session)
+
+# HTTP statuses worth retrying: rate limiting and server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+class DispatchReport(NamedTuple):
+    """
+    The outcome of a reminder run.
+    """
+    emails: List[DeliveryResult]
+    pushes: List[DeliveryResult]
+    # The (username, habit name) pairs with at least one delivered email or push notification
+    reminded: FrozenSet[Tuple[str, str]] = frozenset()
+
+    @property
+    def failures(self) -> List[DeliveryResult]:
+        return [result for result in self.emails + self.pushes if not result.success]
+
+def placeholder_device_tokens(user: User) -> List[str]:
+    """
+    Get the device tokens of a user until users register devices.
+
+    :param user: The user to send push notifications to.
+    """
+    return [DEVICE_TOKEN_PLACEHOLDER]
+
+class ReminderDispatcher:
+    def __init__(self, pool: SMTPConnectionPool, push_url: str = FCM_URL, email_concurrency: Optional[int] = None,
+                 push_concurrency: int = 20, timeout: float = 10.0, max_retries: int = 3, backoff: float = 0.5,
+                 digest: bool = False, device_tokens: Callable[[User], List[str]] = placeholder_device_tokens,
+                 session: Optional[requests.Session] = None):
+        """
+        Initialize a dispatcher that sends the reminders of many users concurrently.
+
+        Sends run on worker threads driven by an asyncio event loop. Semaphores
+        bound how many emails and push notifications are in flight at once, so a
+        run takes roughly as long as its slowest batch rather than the sum of
+        every send. Emails go through the pool, which reconnects and resends on
+        connection failures; push notifications that time out or get a 429/5xx
+        are retried with exponential backoff.
+
+        :param pool: The SMTP connection pool to send emails through.
+        :param push_url: The FCM endpoint.
+        :param email_concurrency: The maximum number of emails in flight (defaults to the pool size).
+        :param push_concurrency: The maximum number of push notifications in flight.
+        :param timeout: Seconds to wait for each push request.
+        :param max_retries: How many times to retry a failed push notification.
+        :param backoff: Seconds to wait before the first retry; doubled for each further retry.
+        :param digest: Whether to send one email and one push notification per user instead of one per habit.
+        :param device_tokens: A function returning the device tokens of a user.
+        :param session: The HTTP session to send push notifications over
+                        (defaults to a new one keeping up to ``push_concurrency`` connections alive).
+        """
+        self.pool = pool
+        self.push_url = push_url
+        self.email_concurrency = email_concurrency or pool.size
+        self.push_concurrency = push_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.digest = digest
+        self.device_tokens = device_tokens
+        self.session = session if session is not None else create_push_session(push_concurrency)
+
+    async def _run(self, function: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(function, *args, **kwargs))
+
+    async def send_email(self, msg: MIMEText) -> DeliveryResult:
+        """
+        Send an email once a slot is free.
+
+        :param msg: The message to send.
+        :return: The delivery result.
+        """
+        async with self._email_slots:
+            return await self._run(self.pool.send, msg)
+
+    async def send_push(self, headers: dict, payload: dict) -> DeliveryResult:
+        """
+        Send a push notification once a slot is free, retrying with backoff.
+
+        The slot is released while waiting to retry.
+
+        :param headers: The request headers.
+        :param payload: The FCM payload.
+        :return: The delivery result.
+        """
+        recipient = payload['to']
+        title = payload['notification']['title']
+        attempts = 0
+        while True:
+            attempts += 1
+            async with self._push_slots:
+                try:
+                    response = await self._run(self.session.post, self.push_url, headers=headers, json=payload,
+                                               timeout=self.timeout)
+                    if response.status_code < 400:
+                        return DeliveryResult(recipient, title, True, attempts)
+                    error = f"HTTP {response.status_code}"
+                    retry = response.status_code in RETRY_STATUSES
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    error = str(e)
+                    retry = True
+                except requests.exceptions.RequestException as e:
+                    error = str(e)
+                    retry = False
+            if not retry or attempts > self.max_retries:
+                return DeliveryResult(recipient, title, False, attempts, error)
+            await asyncio.sleep(self.backoff * 2 ** (attempts - 1))
+
+    async def dispatch(self, users: Iterable[User]) -> DispatchReport:
+        """
+        Send reminders about every habit of every user.
+
+        :param users: The users to send reminders to.
+        :return: The delivery results of every email and push notification.
+        """
+        return await self.dispatch_habits((user, user.get_habits()) for user in users)
+
+    async def dispatch_habits(self, reminders: Iterable[Tuple[User, List[Habit]]]) -> DispatchReport:
+        """
+        Send reminders about some habits of each user.
+
+        :param reminders: Pairs of a user and the habits to remind them about.
+        :return: The delivery results of every email and push notification.
+        """
+        self._email_slots = asyncio.Semaphore(self.email_concurrency)
+        self._push_slots = asyncio.Semaphore(self.push_concurrency)
+        email_sends = []
+        push_sends = []
+        # The (username, habits) each send reminds about, in the order of the sends
+        covered = []
+        with ThreadPoolExecutor(max_workers=self.email_concurrency + self.push_concurrency) as self._executor:
+            for user, habits in reminders:
+                reminder = Reminder(user, session=self.session, push_url=self.push_url, pool=self.pool)
+                if not habits:
+                    continue
+                groups = [habits] if self.digest else [[habit] for habit in habits]
+                email_sends.extend(self.send_email(msg) for msg in reminder.build_emails(habits, self.digest))
+                covered.extend((user.username, group) for group in groups)
+                headers = reminder.build_push_headers()
+                for device_token in self.device_tokens(user):
+                    push_sends.extend(self.send_push(headers, reminder.build_push_payload(group, device_token))
+                                      for group in groups)
+                    covered.extend((user.username, group) for group in groups)
+            results = await asyncio.gather(*email_sends, *push_sends)
+        reminded = frozenset((username, habit.name) for result, (username, group) in zip(results, covered)
+                             if result.success for habit in group)
+        return DispatchReport(results[:len(email_sends)], results[len(email_sends):], reminded)
+
+    def run(self, users: Iterable[User]) -> DispatchReport:
+        """
+        Send the reminders of every user from synchronous code.
+
+        :param users: The users to send reminders to.
+        :return: The delivery results of every email and push notification.
+        """
+        return asyncio.run(self.dispatch(users))
+
+    def run_due(self, scheduler: ReminderScheduler, now: Optional[datetime] = None) -> DispatchReport:
+        """
+        Send reminders about the habits that are due from synchronous code.
+
+        Habits with a delivered reminder are marked as reminded at ``now`` and
+        rescheduled; the others are put back to be retried at the next tick.
+
+        :param scheduler: The scheduler to pop due reminders from.
+        :param now: The current time (defaults to now).
+        :return: The delivery results of every email and push notification.
+        """
+        now = datetime.now() if now is None else now
+        reminders = scheduler.tick(now)
+        report = asyncio.run(self.dispatch_habits(reminders))
+        scheduler.mark_reminded([(user, [habit for habit in habits if (user.username, habit.name) in report.reminded])
+                                 for user, habits in reminders], now)
+        scheduler.retry([(user, [habit for habit in habits if (user.username, habit.name) not in report.reminded])
+                         for user, habits in reminders])
+        return report
@@ -0,0 +1,48 @@
+import json
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional, TextIO
+from src.storage import Storage
+
+def iter_records(storage: Storage, usernames: Optional[Iterable[str]] = None,
+                 habit_names: Optional[Iterable[str]] = None, start: Optional[datetime] = None,
+                 end: Optional[datetime] = None) -> Iterator[Dict]:
+    """
+    Generate one flat record per user, habit and completion.
+
+    Users are read one at a time, so memory use does not grow with the dataset.
+    Completion records have the layout ``bulk_import`` reads, so an export can
+    be imported again.
+
+    :param storage: The storage holding the users.
+    :param usernames: The users to export (defaults to every user).
+    :param habit_names: The habits to export (defaults to every habit).
+    :param start: The earliest completion to export.
+    :param end: The completion time to stop before.
+    :return: An iterator of records, each with a 'type' of 'user', 'habit' or 'completion'.
+    """
+    habit_names = set(habit_names) if habit_names else None
+    for user in storage.iter_users(usernames):
+        yield {'type': 'user', 'user': user.username, 'email': user.email}
+        for habit in user.get_habits():
+            if habit_names is not None and habit.name not in habit_names:
+                continue
+            yield {'type': 'habit', 'user': user.username, 'habit': habit.name, 'frequency': habit.frequency,
+                   'creation_date': habit.creation_date.isoformat()}
+            for date in habit.completions_between(start, end):
+                yield {'type': 'completion', 'user': user.username, 'habit': habit.name,
+                       'timestamp': date.isoformat()}
+
+def write_ndjson(records: Iterable[Dict], f: TextIO) -> int:
+    """
+    Write records as newline-delimited JSON.
+
+    :param records: The records.
+    :param f: The file to write to.
+    :return: The number of records written.
+    """
+    count = 0
+    for record in records:
+        f.write(json.dumps(record))
+        f.write('\n')
+        count += 1
+    return count
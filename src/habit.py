@@ -1,58 +1,315 @@
+import heapq
 import json
-from datetime import datetime, timedelta
-from typing import List, Dict
+import os
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Callable, Iterable, List, Dict, Optional, Sequence, Tuple
+from src.completions import CompletionLog, to_timestamp, from_timestamp
+from src.locking import atomic_write, file_version, lock_for
+from src.streaks import get_rule
+
+def _contains(sorted_values: list, value) -> bool:
+    index = bisect_left(sorted_values, value)
+    return index < len(sorted_values) and sorted_values[index] == value
 
 class Habit:
-    def __init__(self, name: str, frequency: str):
+    __slots__ = ('name', '_frequency', 'creation_date', 'compact', '_completion_dates',
+                 '_streak_count', '_current_streak', '_longest_streak', '_last_completion', '_listeners',
+                 '_sorted_dates', '_period_counts', '_counted', 'last_reminded',
+                 '_source')
+
+    # Streak lookups (get_longest_streak, get_current_streak) answered from the memoized state,
+    # including state restored on load, and those that had to recompute it, across every habit
+    # of the process. Internal uses such as saving the streak state are not counted
+    memo_hits = 0
+    memo_misses = 0
+
+    def __init__(self, name: str, frequency: str, compact: bool = False):
+        # Callbacks notified of completions and frequency changes; most habits have none
+        self._listeners: Optional[List[Callable[['Habit'], None]]] = None
+        # Sorted copy of the completion dates for range queries, built on first use
+        self._sorted_dates = None
+        # Completions per period of the habit's frequency, covering the first _counted completions
+        self._period_counts: Optional[Dict[int, int]] = None
+        self._counted = 0
         self.name = name
         self.frequency = frequency
         self.creation_date = datetime.now()
+        # Compact habits keep their completion dates in an int64 array instead of a list
+        self.compact = compact
         self.completion_dates: List[datetime] = []
+        # When a reminder about the habit was last delivered, so reminders aren't resent every run
+        self.last_reminded: Optional[datetime] = None
+        # The version of habits.json the habit was last loaded from or saved to
+        self._source = None
 
-    def complete_task(self):
-        self.completion_dates.append(datetime.now())
+    @property
+    def frequency(self) -> str:
+        return self._frequency
 
-    def get_longest_streak(self) -> int:
-        if not self.completion_dates:
-            return 0
+    @frequency.setter
+    def frequency(self, frequency: str) -> None:
+        self._frequency = frequency
+        self._period_counts = None
+        self._invalidate_streaks()
+        self._notify()
+
+    @property
+    def completion_dates(self) -> List[datetime]:
+        return self._completion_dates
+
+    @completion_dates.setter
+    def completion_dates(self, completion_dates: List[datetime]) -> None:
+        if self.compact and not isinstance(completion_dates, CompletionLog):
+            completion_dates = CompletionLog(completion_dates)
+        self._completion_dates = completion_dates
+        self._sorted_dates = None
+        self._period_counts = None
+        self._invalidate_streaks()
+        self._notify()
 
-        sorted_dates = sorted(self.completion_dates)
-        longest_streak = 1
-        current_streak = 1
+    def add_listener(self, listener: Callable[['Habit'], None]) -> None:
+        if self._listeners is None:
+            self._listeners = []
+        self._listeners.append(listener)
 
-        for i in range(1, len(sorted_dates)):
-            if self._is_within_frequency(sorted_dates[i - 1], sorted_dates[i]):
-                current_streak += 1
-                longest_streak = max(longest_streak, current_streak)
+    def remove_listener(self, listener: Callable[['Habit'], None]) -> None:
+        if self._listeners and listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self) -> None:
+        if self._listeners:
+            for listener in list(self._listeners):
+                listener(self)
+
+    def _invalidate_streaks(self) -> None:
+        # Streak state covers the first _streak_count completions; None forces a full recompute
+        self._streak_count = None
+        self._current_streak = 0
+        self._longest_streak = 0
+        self._last_completion: Optional[datetime] = None
+
+    def _ensure_streaks(self) -> bool:
+        # The memo is keyed on the completion count, so completions appended to the list directly
+        # are picked up too. Returns whether the memoized state was current
+        if self._streak_count != len(self._completion_dates):
+            self._recompute_streaks()
+            return False
+        return True
+
+    def _lookup_streaks(self) -> None:
+        if self._ensure_streaks():
+            Habit.memo_hits += 1
+        else:
+            Habit.memo_misses += 1
+
+    def _recompute_streaks(self) -> None:
+        # One pass over the distinct periods completed in, so unsorted histories need no sort
+        dates = self._completion_dates
+        if len(dates) > 1:
+            self._longest_streak, self._current_streak = get_rule(self.frequency).streaks(dates)
+        else:
+            # A lone completion is a streak of one whatever the frequency
+            self._longest_streak = self._current_streak = len(dates)
+        self._last_completion = self._latest_completion()
+        self._streak_count = len(dates)
+
+    def _latest_completion(self) -> Optional[datetime]:
+        dates = self._completion_dates
+        if not dates:
+            return None
+        if isinstance(dates, CompletionLog):
+            return from_timestamp(max(dates.timestamps))
+        return max(dates)
+
+    def complete_task(self) -> datetime:
+        completed_at = datetime.now()
+        self.add_completion(completed_at)
+        return completed_at
+
+    def add_completion(self, completed_at: datetime) -> None:
+        if self._streak_count != len(self._completion_dates):
+            self._recompute_streaks()
+        if self._sorted_dates is not None and len(self._sorted_dates) == len(self._completion_dates):
+            insort(self._sorted_dates, completed_at)
+        if self._period_counts is not None and self._counted == len(self._completion_dates):
+            period = get_rule(self.frequency).bucket(completed_at)
+            self._period_counts[period] = self._period_counts.get(period, 0) + 1
+            self._counted += 1
+        self._completion_dates.append(completed_at)
+        if self._last_completion is not None and completed_at < self._last_completion:
+            # Out-of-order insert: the streaks after it may merge or split
+            self._recompute_streaks()
+            self._notify()
+            return
+
+        self._extend_streaks(completed_at)
+        self._streak_count = len(self._completion_dates)
+        self._notify()
+
+    def _extend_streaks(self, completed_at: datetime) -> None:
+        # Folds in a completion no earlier than _last_completion
+        if self._last_completion is None:
+            self._current_streak = 1
+        else:
+            rule = get_rule(self.frequency)
+            gap = rule.bucket(completed_at) - rule.bucket(self._last_completion)
+            # A second completion in the same period counts once
+            if gap == 1:
+                self._current_streak += 1
+            elif gap > 1:
+                self._current_streak = 1
+        self._longest_streak = max(self._longest_streak, self._current_streak)
+        self._last_completion = completed_at
+
+    def sorted_completions(self) -> Sequence[datetime]:
+        # Kept in step by add_completion; other changes are caught by the length check like the streaks
+        if self._sorted_dates is None or len(self._sorted_dates) != len(self._completion_dates):
+            if isinstance(self._completion_dates, CompletionLog):
+                self._sorted_dates = self._completion_dates.sorted()
             else:
-                current_streak = 1
-
-        return longest_streak
-
-    def _is_within_frequency(self, date1: datetime, date2: datetime) -> bool:
-        if self.frequency == 'daily':
-            return date2 - date1 <= timedelta(days=1)
-        elif self.frequency == 'weekly':
-            return date2 - date1 <= timedelta(weeks=1)
-        elif self.frequency == 'monthly':
-            return (date2.year == date1.year and date2.month == date1.month + 1) or \
-                   (date2.year == date1.year + 1 and date2.month == 1 and date1.month == 12)
+                self._sorted_dates = sorted(self._completion_dates)
+        return self._sorted_dates
+
+    def completion_span(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Tuple[int, int]:
+        # The index range of sorted_completions() in [start, end), found by binary search
+        dates = self.sorted_completions()
+        if isinstance(dates, CompletionLog):
+            # Searching the int64 column avoids converting a datetime per probe
+            dates = dates.timestamps
+            start = to_timestamp(start) if start is not None else None
+            end = to_timestamp(end) if end is not None else None
+        low = bisect_left(dates, start) if start is not None else 0
+        high = bisect_left(dates, end) if end is not None else len(dates)
+        return low, max(low, high)
+
+    def completions_between(self, start: Optional[datetime] = None,
+                            end: Optional[datetime] = None) -> Sequence[datetime]:
+        # The completions in [start, end) in chronological order, in O(log n + k)
+        low, high = self.completion_span(start, end)
+        return self.sorted_completions()[low:high]
+
+    def period_counts(self) -> Dict[int, int]:
+        # Built on first use and kept in step by add_completion; other changes are caught by the length check
+        if self._period_counts is None or self._counted != len(self._completion_dates):
+            bucket = get_rule(self.frequency).bucket
+            counts: Dict[int, int] = {}
+            for date in self._completion_dates:
+                period = bucket(date)
+                counts[period] = counts.get(period, 0) + 1
+            self._period_counts = counts
+            self._counted = len(self._completion_dates)
+        return self._period_counts
+
+    def completions_in_period(self, date: datetime) -> int:
+        # The number of completions in the period (day, week, month, ...) containing date
+        return self.period_counts().get(get_rule(self.frequency).bucket(date), 0)
+
+    def is_done(self, now: Optional[datetime] = None) -> bool:
+        # Whether the habit has been completed in the current period
+        return self.completions_in_period(datetime.now() if now is None else now) > 0
+
+    def merge_completions(self, dates: Iterable[datetime]) -> List[datetime]:
+        # Merges a batch into the history in place; dates already recorded are skipped, so importing
+        # the same data twice is harmless. A batch later than every completion (the usual import) is
+        # appended and folded into the streaks, period counts and sorted copy without rebuilding them.
+        # Otherwise the history is replaced by one heapq.merge of the sorted runs and the streaks are
+        # recomputed on demand
+        compact = isinstance(self._completion_dates, CompletionLog)
+        existing = self.sorted_completions()
+        keys = existing.timestamps if compact else existing
+        batch = sorted(set(to_timestamp(date) for date in dates) if compact else set(dates))
+        added_keys = [key for key in batch if not _contains(keys, key)]
+        if not added_keys:
+            return []
+        added = [from_timestamp(key) for key in added_keys] if compact else added_keys
+        count = len(self._completion_dates)
+        if self._period_counts is not None and self._counted == count:
+            bucket = get_rule(self.frequency).bucket
+            for date in added:
+                period = bucket(date)
+                self._period_counts[period] = self._period_counts.get(period, 0) + 1
+            self._counted += len(added)
+
+        if not keys or added_keys[0] > keys[-1]:
+            if compact:
+                self._completion_dates.timestamps.extend(added_keys)
+                existing.timestamps.extend(added_keys)
+            else:
+                self._completion_dates.extend(added)
+                existing.extend(added)
+            if self._streak_count == count:
+                for date in added:
+                    self._extend_streaks(date)
+                self._streak_count = len(self._completion_dates)
         else:
-            raise ValueError("Unsupported frequency. Use 'daily', 'weekly', or 'monthly'.")
+            merged = list(heapq.merge(keys, added_keys))
+            if compact:
+                self._completion_dates.timestamps = array('q', merged)
+                self._sorted_dates = CompletionLog.from_timestamps(merged)
+            else:
+                self._completion_dates[:] = merged
+                self._sorted_dates = merged
+            self._invalidate_streaks()
+        self._notify()
+        return added
+
+    def get_longest_streak(self) -> int:
+        self._lookup_streaks()
+        return self._longest_streak
+
+    def get_last_completion(self) -> Optional[datetime]:
+        self._ensure_streaks()
+        return self._last_completion
+
+    def get_current_streak(self) -> int:
+        # The streak ending at the most recent completion
+        self._lookup_streaks()
+        return self._current_streak
+
+    def streak_state(self) -> Dict:
+        self._ensure_streaks()
+        return {
+            'current': self._current_streak,
+            'longest': self._longest_streak,
+            'last_completion': self._last_completion.isoformat() if self._last_completion else None,
+            'count': self._streak_count,
+            'frequency': self.frequency,
+        }
+
+    def restore_streak_state(self, streak: Optional[Dict]) -> None:
+        # Stale state (e.g. from a hand-edited file, or saved before streaks were counted
+        # per period) is ignored and recomputed on demand. Checking the latest completion
+        # costs one pass over the dates, a fraction of recomputing the streaks
+        if not streak or streak['count'] != len(self._completion_dates) or streak.get('frequency') != self.frequency:
+            return
+        last_completion = datetime.fromisoformat(streak['last_completion']) if streak['last_completion'] else None
+        if last_completion != self._latest_completion():
+            return
+        self._current_streak = streak['current']
+        self._longest_streak = streak['longest']
+        self._last_completion = last_completion
+        self._streak_count = streak['count']
 
     def to_dict(self):
         return {
             'name': self.name,
             'frequency': self.frequency,
             'creation_date': self.creation_date.isoformat(),
-            'completion_dates': [date.isoformat() for date in self.completion_dates]
+            'completion_dates': [date.isoformat() for date in self.completion_dates],
+            'streak': self.streak_state(),
+            'last_reminded': self.last_reminded.isoformat() if self.last_reminded else None
         }
 
     @classmethod
-    def from_dict(cls, data):
-        habit = cls(name=data['name'], frequency=data['frequency'])
+    def from_dict(cls, data, compact: bool = False):
+        habit = cls(name=data['name'], frequency=data['frequency'], compact=compact)
         habit.creation_date = datetime.fromisoformat(data['creation_date'])
         habit.completion_dates = [datetime.fromisoformat(date) for date in data['completion_dates']]
+        habit.restore_streak_state(data.get('streak'))
+        if data.get('last_reminded'):
+            habit.last_reminded = datetime.fromisoformat(data['last_reminded'])
         return habit
 
     @staticmethod
@@ -60,9 +317,13 @@ class Habit:
         try:
             with open('habits.json', 'r') as file:
                 data = json.load(file)
-                return [Habit.from_dict(habit_data) for habit_data in data]
+                version = file_version('habits.json', os.fstat(file.fileno()))
         except FileNotFoundError:
             return []
+        habits = [Habit.from_dict(habit_data) for habit_data in data]
+        for habit in habits:
+            habit._source = version
+        return habits
 
     @staticmethod
     def load(name: str) -> 'Habit':
@@ -74,5 +335,18 @@ class Habit:
 
     @staticmethod
     def save_all(habits: List['Habit']) -> None:
-        with open('habits.json', 'w') as file:
-            json.dump([habit.to_dict() for habit in habits], file, indent=4)
+        # Replaced atomically under the writers' lock, so a crash or a concurrent save never truncates it.
+        # If another writer saved the file since these habits were loaded, the completions it recorded
+        # are merged in first; other changes are last-writer-wins (use storage.JSONStorage to merge them)
+        with lock_for('habits.json'):
+            version = file_version('habits.json')
+            if version is not None and any(habit._source not in (None, version) for habit in habits):
+                saved = {habit.name: habit for habit in Habit.load_all()}
+                for habit in habits:
+                    if habit.name in saved:
+                        habit.merge_completions(saved[habit.name].completion_dates)
+            with atomic_write('habits.json') as file:
+                json.dump([habit.to_dict() for habit in habits], file, indent=4)
+            version = file_version('habits.json')
+        for habit in habits:
+            habit._source = version
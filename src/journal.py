@@ -0,0 +1,436 @@
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, MutableMapping, Optional, Set, Tuple
+from src.user import User
+from src.habit import Habit
+from src.store import LazyUserStore
+from src.locking import lock_for
+
+# Records that only add completions; merging them from other processes commutes with local changes
+COMPLETION_OPS = ('complete', 'merge_completions')
+
+class Journal:
+    def __init__(self, snapshot_path: str, journal_path: Optional[str] = None, compact_threshold: int = 1000,
+                 flush_delay: float = 0.0, serializer=None):
+        """
+        Initialize an append-only journal stored next to a users snapshot.
+
+        Every mutation is written as a single JSON line, so recording a change
+        costs O(1) I/O regardless of the snapshot size. Once the journal holds
+        ``compact_threshold`` records it is folded back into the snapshot on a
+        background thread.
+
+        With a ``flush_delay``, records are buffered in memory and written
+        together ``flush_delay`` seconds after the first unwritten one, so a burst
+        of changes costs a single write. Records still buffered when the process
+        crashes are lost.
+
+        Several processes can share a journal. Appends and compactions hold an
+        advisory lock on ``<snapshot_path>.lock``. The journal's size serves as a
+        version: before appending, records other processes wrote since the last
+        append are merged into the loaded users. Completions merge cleanly. Any
+        other change, or a compaction by another process, means the loaded users
+        may no longer match the files, so the next compaction rebuilds the
+        snapshot from the files rather than writing the loaded users.
+
+        :param snapshot_path: The path to the users JSON snapshot.
+        :param journal_path: The path to the journal file (defaults to ``<snapshot_path>.journal``).
+        :param compact_threshold: The number of records that triggers a background compaction.
+        :param flush_delay: Seconds to buffer records before writing them (0 writes each record immediately).
+        :param serializer: The serializer that reads and writes the snapshot, such as
+            ``serializers.BinarySerializer`` (defaults to the indexed JSON snapshot).
+        """
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or f"{snapshot_path}.journal"
+        self.compact_threshold = compact_threshold
+        self.users: MutableMapping[str, User] = {}
+        self._pending = 0
+        self._lock = threading.RLock()
+        self._compactor: Optional[threading.Thread] = None
+        self.flush_delay = flush_delay
+        self.serializer = serializer
+        self._buffer: List[str] = []
+        self._flusher: Optional[threading.Timer] = None
+        self._file_lock = lock_for(snapshot_path)
+        # The journal bytes reflected in self.users, and the snapshot they were loaded from
+        self._position = 0
+        self._snapshot_id: Optional[Tuple[int, int, int]] = None
+        # Whether self.users may disagree with the snapshot plus the journal
+        self._diverged = False
+        # Users with journaled changes that the snapshot does not reflect yet
+        self._dirty: Set[str] = set()
+
+    def load(self, lazy: bool = False) -> MutableMapping[str, User]:
+        """
+        Load the snapshot and replay the journal on top of it.
+
+        :param lazy: Whether to parse users on first access instead of up front.
+        :return: A dictionary of User objects reflecting every journaled mutation.
+        """
+        with self._file_lock:
+            self._snapshot_id = self._snapshot_stat()
+            if lazy and self.serializer is None:
+                users = LazyUserStore(self.snapshot_path)
+            else:
+                users = self._load_snapshot()
+            self._pending = self.replay(users)
+        self.users = users
+        self._diverged = False
+        return users
+
+    def _load_snapshot(self) -> Dict[str, User]:
+        try:
+            if self.serializer is not None:
+                return self.serializer.load(self.snapshot_path)
+            return User.load_all_from_json(self.snapshot_path)
+        except FileNotFoundError:
+            return {}
+
+    def _snapshot_stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.snapshot_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def replay(self, users: MutableMapping[str, User]) -> int:
+        """
+        Apply every record in the journal to a dictionary of users.
+
+        Records are idempotent, so replaying a journal that was already folded
+        into the snapshot (e.g. after a crash during compaction) is harmless.
+
+        :param users: The users to apply the records to.
+        :return: The number of records applied.
+        """
+        applied = 0
+        self._position = 0
+        try:
+            with open(self.journal_path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn line from an interrupted append; later appends start on a new line
+                        if line.endswith(b'\n'):
+                            self._position += len(line)
+                        continue
+                    self.apply(users, record)
+                    self._dirty.add(record['username'])
+                    applied += 1
+                    self._position += len(line)
+        except FileNotFoundError:
+            pass
+        return applied
+
+    @staticmethod
+    def apply(users: MutableMapping[str, User], record: Dict) -> None:
+        """
+        Apply a single journal record to a dictionary of users.
+
+        :param users: The users to apply the record to.
+        :param record: The journal record.
+        """
+        op = record['op']
+        if op == 'create_user':
+            if record['username'] not in users:
+                user = User(username=record['username'], email=record['email'])
+                for habit_data in record.get('habits', ()):
+                    user.add_habit(Habit.from_dict(habit_data))
+                users[record['username']] = user
+        elif op == 'remove_user':
+            if record['username'] in users:
+                del users[record['username']]
+        else:
+            user = users.get(record['username'])
+            if user is None:
+                return
+            if op == 'add_habit':
+                if not user.has_habit(record['habit']['name']):
+                    user.add_habit(Habit.from_dict(record['habit']))
+                return
+            try:
+                habit = user.get_habit_by_name(record['habit'])
+            except ValueError:
+                return
+            if op == 'remove_habit':
+                user.remove_habit(habit)
+            elif op == 'set_frequency':
+                habit.frequency = record['frequency']
+            elif op == 'merge_completions':
+                habit.merge_completions(datetime.fromisoformat(date) for date in record['completed_at'])
+            elif op == 'complete':
+                # Records are in append order, not time order (writers buffer and race), so a completion
+                # is skipped only if it is already recorded, e.g. by a snapshot compacted after it
+                habit.merge_completions([datetime.fromisoformat(record['completed_at'])])
+            elif op == 'remind':
+                reminded_at = datetime.fromisoformat(record['reminded_at'])
+                if habit.last_reminded is None or reminded_at > habit.last_reminded:
+                    habit.last_reminded = reminded_at
+            else:
+                raise ValueError(f"Unknown journal operation '{op}'.")
+
+    def append(self, record: Dict) -> None:
+        """
+        Append a record to the journal, compacting in the background when it grows too large.
+
+        :param record: The journal record.
+        """
+        self.append_many([record])
+
+    def append_many(self, records: List[Dict]) -> None:
+        """
+        Append several records to the journal with a single write.
+
+        :param records: The journal records.
+        """
+        lines = [json.dumps(record) + '\n' for record in records]
+        with self._lock:
+            self._dirty.update(record['username'] for record in records)
+            self._buffer.extend(lines)
+            if self.flush_delay <= 0:
+                self._write_buffer()
+            elif self._flusher is None:
+                # The timer thread is not a daemon, so buffered records are written before the process exits
+                self._flusher = threading.Timer(self.flush_delay, self.flush)
+                self._flusher.start()
+            self._pending += len(lines)
+            if self._pending >= self.compact_threshold:
+                self.compact_in_background()
+
+    def _write_buffer(self) -> None:
+        if self._buffer:
+            with self._file_lock:
+                torn = self._catch_up()
+                with open(self.journal_path, 'ab') as f:
+                    f.write((('\n' if torn else '') + ''.join(self._buffer)).encode('utf-8'))
+                    self._position = f.tell()
+            self._buffer = []
+
+    def _catch_up(self) -> bool:
+        # Called with the file lock held: merges the records other processes appended since
+        # self._position and returns whether the journal ends in a torn line
+        snapshot_id = self._snapshot_stat()
+        if snapshot_id != self._snapshot_id:
+            # Another process compacted; the records it folded into the snapshot were never merged
+            self._snapshot_id = snapshot_id
+            self._position = 0
+            self._diverged = True
+        try:
+            size = os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            size = 0
+        if size < self._position:
+            self._position = 0
+            self._diverged = True
+        if size == self._position:
+            return False
+        with open(self.journal_path, 'rb') as f:
+            f.seek(self._position)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    return True
+                self._position += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                self._merge(record)
+                self._pending += 1
+        return False
+
+    def _merge(self, record: Dict) -> None:
+        self._dirty.add(record['username'])
+        if record['op'] == 'remind':
+            # Reminder times only move forward, so they commute with local changes too
+            self.apply(self.users, record)
+            return
+        if record['op'] not in COMPLETION_OPS:
+            # Applied after local changes that the journal orders after it
+            self._diverged = True
+            self.apply(self.users, record)
+            return
+        user = self.users.get(record['username'])
+        if user is None or not user.has_habit(record['habit']):
+            return
+        completed_at = record['completed_at']
+        dates = completed_at if isinstance(completed_at, list) else [completed_at]
+        user.get_habit_by_name(record['habit']).merge_completions(datetime.fromisoformat(date) for date in dates)
+
+    def _cancel_flusher(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+
+    def flush(self) -> None:
+        """
+        Write any buffered records to the journal.
+        """
+        with self._lock:
+            self._cancel_flusher()
+            self._write_buffer()
+
+    def create_user(self, user: User) -> None:
+        """
+        Record the creation of a user, along with any habits it already has.
+
+        :param user: The new user.
+        """
+        record = {'op': 'create_user', 'username': user.username, 'email': user.email}
+        if user.get_habits():
+            record['habits'] = [habit.to_dict() for habit in user.get_habits()]
+        self.append(record)
+
+    def remove_user(self, username: str) -> None:
+        """
+        Record the removal of a user.
+
+        :param username: The username of the removed user.
+        """
+        self.append({'op': 'remove_user', 'username': username})
+
+    def add_habit(self, username: str, habit: Habit) -> None:
+        """
+        Record a habit being added to a user.
+
+        :param username: The username of the habit's owner.
+        :param habit: The new habit.
+        """
+        self.append({'op': 'add_habit', 'username': username, 'habit': habit.to_dict()})
+
+    def remove_habit(self, username: str, habit_name: str) -> None:
+        """
+        Record a habit being removed from a user.
+
+        :param username: The username of the habit's owner.
+        :param habit_name: The name of the removed habit.
+        """
+        self.append({'op': 'remove_habit', 'username': username, 'habit': habit_name})
+
+    def set_frequency(self, username: str, habit_name: str, frequency: str) -> None:
+        """
+        Record a change of a habit's frequency.
+
+        :param username: The username of the habit's owner.
+        :param habit_name: The name of the habit.
+        :param frequency: The new frequency.
+        """
+        self.append({'op': 'set_frequency', 'username': username, 'habit': habit_name, 'frequency': frequency})
+
+    def complete(self, username: str, habit_name: str, completed_at: datetime) -> None:
+        """
+        Record a habit completion.
+
+        :param username: The username of the habit's owner.
+        :param habit_name: The name of the habit.
+        :param completed_at: The completion time.
+        """
+        self.append({'op': 'complete', 'username': username, 'habit': habit_name,
+                     'completed_at': completed_at.isoformat()})
+
+    def record_reminders(self, reminders: Dict[Tuple[str, str], datetime]) -> None:
+        """
+        Record when habits were last reminded about.
+
+        :param reminders: The reminder time of each (username, habit name).
+        """
+        self.append_many([{'op': 'remind', 'username': username, 'habit': habit_name,
+                           'reminded_at': reminded_at.isoformat()}
+                          for (username, habit_name), reminded_at in reminders.items()])
+
+    def merge_completions(self, merges: Dict[Tuple[str, str], List[datetime]]) -> None:
+        """
+        Record batches of completions merged into habits.
+
+        :param merges: The completions added to each (username, habit name).
+        """
+        self.append_many([{'op': 'merge_completions', 'username': username, 'habit': habit_name,
+                           'completed_at': [date.isoformat() for date in dates]}
+                          for (username, habit_name), dates in merges.items() if dates])
+
+    def compact(self) -> None:
+        """
+        Fold the journal into the snapshot and truncate it.
+
+        The snapshot is written to a temporary file and renamed into place, so an
+        interrupted compaction leaves the previous snapshot and journal intact.
+        Normally the loaded users are written and buffered records, which they
+        already reflect, are dropped. If the loaded users may not match the files
+        (see ``__init__``), buffered records are written and the snapshot is
+        rebuilt from the files instead, so no other process's changes are lost.
+        """
+        with self._lock, self._file_lock:
+            self._cancel_flusher()
+            self._catch_up()
+            if self._diverged:
+                self._write_buffer()
+                self._rebuild()
+            else:
+                self._buffer = []
+                if self.serializer is not None:
+                    self.serializer.dump(self.users, self.snapshot_path)
+                elif isinstance(self.users, LazyUserStore):
+                    self.users.save(self.snapshot_path)
+                else:
+                    User.write_snapshot(self.snapshot_path, ((username, User.encode_user(user))
+                                                             for username, user in self.users.items()))
+                self._dirty.clear()
+            open(self.journal_path, 'w').close()
+            self._snapshot_id = self._snapshot_stat()
+            self._position = 0
+            self._pending = 0
+
+    def _rebuild(self) -> None:
+        # Folds the journal into the snapshot on disk, parsing only the users it touches
+        if self.serializer is not None:
+            users = self._load_snapshot()
+            self.replay(users)
+            self.serializer.dump(users, self.snapshot_path)
+            return
+        users = LazyUserStore(self.snapshot_path)
+        try:
+            self.replay(users)
+            users.save(self.snapshot_path)
+        finally:
+            users.close()
+
+    def release(self, usernames: Iterable[str]) -> Set[str]:
+        """
+        Drop parsed users from memory if the snapshot reflects them, so they can be parsed again.
+
+        Users with journaled changes are kept until a compaction writes them.
+        Only users parsed on demand can be dropped (see ``load(lazy=True)``).
+
+        :param usernames: The users to drop.
+        :return: The usernames that were dropped.
+        """
+        with self._lock:
+            if not isinstance(self.users, LazyUserStore):
+                return set()
+            return {username for username in usernames
+                    if username not in self._dirty and self.users.evict(username)}
+
+    def compact_in_background(self) -> threading.Thread:
+        """
+        Start a compaction on a background thread unless one is already running.
+
+        The thread is not a daemon, so a short-lived process waits for it before exiting.
+
+        :return: The compaction thread.
+        """
+        with self._lock:
+            if self._compactor is None or not self._compactor.is_alive():
+                self._compactor = threading.Thread(target=self.compact, name='journal-compactor')
+                self._compactor.start()
+            return self._compactor
+
+    def wait(self) -> None:
+        """
+        Write buffered records and block until a running background compaction has finished.
+        """
+        self.flush()
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
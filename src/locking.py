@@ -0,0 +1,159 @@
+import os
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import IO, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+class FileLock:
+    def __init__(self, lock_path: str):
+        """
+        Initialize an advisory lock shared by every process that uses the same lock file.
+
+        The lock is exclusive between processes and reentrant within one, so code
+        holding it can call other code that takes it too. Threads of the same
+        process wait for each other.
+
+        :param lock_path: The path to the lock file, created if missing.
+        """
+        self.lock_path = lock_path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    def acquire(self) -> None:
+        """
+        Block until the lock is held.
+        """
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    if fcntl is not None:
+                        fcntl.flock(fd, fcntl.LOCK_EX)
+                    else:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                except BaseException:
+                    os.close(fd)
+                    raise
+            except BaseException:
+                self._thread_lock.release()
+                raise
+            self._fd = fd
+        self._depth += 1
+
+    def release(self) -> None:
+        """
+        Release the lock once it has been released as many times as it was acquired.
+        """
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            finally:
+                os.close(fd)
+        self._thread_lock.release()
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+_locks: Dict[str, FileLock] = {}
+_locks_lock = threading.Lock()
+
+def lock_for(file_path: str) -> FileLock:
+    """
+    Return the lock guarding writes to a file, stored in ``<file_path>.lock``.
+
+    A process gets the same lock object for the same file, so nested use does
+    not deadlock on the process's own ``flock``.
+
+    :param file_path: The path to the file to guard.
+    """
+    lock_path = os.path.abspath(f"{file_path}.lock")
+    with _locks_lock:
+        if lock_path not in _locks:
+            _locks[lock_path] = FileLock(lock_path)
+        return _locks[lock_path]
+
+def file_version(file_path: str, stat_result: Optional[os.stat_result] = None) -> Optional[Tuple[int, int, int]]:
+    """
+    Identify a file's contents by inode, modification time and size.
+
+    ``atomic_write`` gives every save a new inode, so the version changes
+    whenever any writer saves the file.
+
+    :param file_path: The path to the file.
+    :param stat_result: The ``os.fstat`` of the file as it was read (defaults to stating the path).
+    :return: The version, or None if the file does not exist.
+    """
+    if stat_result is None:
+        try:
+            stat_result = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+    return stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size
+
+@contextmanager
+def atomic_write(file_path: str, mode: str = 'w') -> Iterator[IO]:
+    """
+    Write a file through a temporary file that replaces it once complete.
+
+    The temporary file is created next to the target, flushed and fsynced before
+    it is renamed over it, so readers and a crash at any point see either the
+    old or the new contents, never a truncated file. Concurrent writers each
+    get their own temporary file; the last rename wins.
+
+    :param file_path: The path to the file.
+    :param mode: 'w' for text or 'wb' for bytes.
+    :return: A context manager yielding the open temporary file.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(file_path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            # mkstemp creates the file readable by its owner only; keep the mode of the file being replaced
+            try:
+                os.chmod(tmp_path, stat.S_IMODE(os.stat(file_path).st_mode))
+            except FileNotFoundError:
+                os.chmod(tmp_path, 0o644)
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    fsync_directory(directory)
+
+def fsync_directory(directory: str) -> None:
+    """
+    Flush a directory entry change (such as a rename) to disk where the platform supports it.
+
+    :param directory: The directory.
+    """
+    if fcntl is None:
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
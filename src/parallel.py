@@ -0,0 +1,185 @@
+import heapq
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+import numpy as np
+from src.user import User
+from src.analytics import LeaderboardEntry
+from src.batch_analytics import BatchStreakEngine, to_datetime64
+from src.completions import to_timestamp
+from src.streaks import get_rule
+
+HabitKey = Tuple[str, str]
+
+class Shard(NamedTuple):
+    """
+    The habits of a group of users, packed into flat arrays for a worker process.
+
+    Completions of habit i are ``timestamps[offsets[i]:offsets[i] + lengths[i]]``,
+    as int64 microseconds since the epoch, so a shard pickles as a few buffers
+    rather than a graph of User, Habit and datetime objects.
+    """
+    keys: List[HabitKey]
+    frequencies: List[str]
+    lengths: np.ndarray
+    timestamps: np.ndarray
+
+class ShardResult(NamedTuple):
+    """
+    The analytics of one shard, in the order of the shard's habits.
+    """
+    longest: np.ndarray
+    rates: Optional[np.ndarray]
+    top: List[LeaderboardEntry]
+
+class AnalyticsSummary(NamedTuple):
+    """
+    The merged analytics of every shard.
+    """
+    longest: Dict[HabitKey, int]
+    rates: Dict[HabitKey, float]
+    leaderboard: List[LeaderboardEntry]
+
+def pack_shard(users: Iterable[User]) -> Shard:
+    """
+    Pack the habits of some users into a shard.
+
+    :param users: The users.
+    """
+    keys, frequencies, arrays = [], [], []
+    for user in users:
+        for habit in user.get_habits():
+            keys.append((user.username, habit.name))
+            frequencies.append(habit.frequency)
+            arrays.append(to_datetime64(habit.completion_dates).view(np.int64))
+    lengths = np.array([len(array) for array in arrays], dtype=np.int64)
+    timestamps = np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int64)
+    return Shard(keys, frequencies, lengths, timestamps)
+
+def period_numbers(dates: np.ndarray, frequency: str) -> np.ndarray:
+    """
+    Number the periods of a frequency (e.g. calendar days, weeks starting Monday, or months) that datetime64 values fall in.
+
+    :param dates: The dates, as datetime64.
+    :param frequency: The frequency whose periods to use (see ``streaks.get_rule``).
+    """
+    return get_rule(frequency).bucket_array(dates)
+
+def shard_rates(shard: Shard, start: int, end: int) -> np.ndarray:
+    """
+    Calculate ``analytics.get_completion_rate`` for every habit of a shard.
+
+    :param shard: The shard.
+    :param start: The start of the range, in microseconds since the epoch.
+    :param end: The end of the range (exclusive), in microseconds since the epoch.
+    """
+    rates = np.zeros(len(shard.keys), dtype=np.float64)
+    if end <= start:
+        return rates
+    habit_ids = np.repeat(np.arange(len(shard.keys)), shard.lengths)
+    in_range = (shard.timestamps >= start) & (shard.timestamps < end)
+    dates = shard.timestamps[in_range].view('datetime64[us]')
+    habit_ids = habit_ids[in_range]
+    bounds = np.array([start, end - 1], dtype=np.int64).view('datetime64[us]')
+    for frequency in set(shard.frequencies):
+        members = np.array([f == frequency for f in shard.frequencies])
+        first, last = period_numbers(bounds, frequency)
+        n_periods = last - first + 1
+        selected = members[habit_ids]
+        # Each (habit, period) pair with a completion counts once
+        pairs = np.unique(habit_ids[selected] * n_periods + (period_numbers(dates[selected], frequency) - first))
+        completed = np.bincount(pairs // n_periods, minlength=len(shard.keys))
+        rates[members] = completed[members] / n_periods
+    return rates
+
+def analyze_shard(shard: Shard, k: int = 10, start: Optional[int] = None, end: Optional[int] = None) -> ShardResult:
+    """
+    Calculate the longest streaks, completion rates and top K habits of a shard.
+
+    Runs in a worker process.
+
+    :param shard: The shard.
+    :param k: The number of leaderboard entries to return.
+    :param start: The start of the range for completion rates, in microseconds since the epoch.
+    :param end: The end of the range (exclusive); rates are skipped unless both are given.
+    """
+    engine = BatchStreakEngine()
+    dates = shard.timestamps.view('datetime64[us]')
+    offsets = np.cumsum(shard.lengths) - shard.lengths
+    for key, frequency, offset, length in zip(shard.keys, shard.frequencies, offsets, shard.lengths):
+        engine.add(key, dates[offset:offset + length], frequency)
+    longest = engine.longest_streaks()
+    rates = shard_rates(shard, start, end) if start is not None and end is not None else None
+    top = heapq.nlargest(k, (LeaderboardEntry(user, habit, streak)
+                             for (user, habit), streak in zip(shard.keys, longest.tolist())),
+                         key=lambda entry: entry.streak)
+    return ShardResult(longest, rates, top)
+
+class ParallelAnalytics:
+    def __init__(self, max_workers: Optional[int] = None, shard_size: int = 1000):
+        """
+        Initialize a runner that computes analytics for many users across processes.
+
+        Users are packed into shards of completion arrays as they are read, and
+        each shard is analyzed in a worker while the next ones are packed. At
+        most two shards per worker are in flight at a time.
+
+        :param max_workers: The number of worker processes (defaults to the number of CPUs).
+        :param shard_size: The number of users per shard.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.shard_size = shard_size
+
+    def shards(self, users: Iterable[User]) -> Iterator[Shard]:
+        """
+        Pack users into shards of ``shard_size`` users.
+
+        :param users: The users.
+        """
+        users = iter(users)
+        while True:
+            batch = [user for _, user in zip(range(self.shard_size), users)]
+            if not batch:
+                return
+            yield pack_shard(batch)
+
+    def run(self, users: Iterable[User], k: int = 10, start: Optional[datetime] = None,
+            end: Optional[datetime] = None, executor: Optional[Executor] = None) -> AnalyticsSummary:
+        """
+        Compute the longest streak and completion rate of every habit, and the top K habits.
+
+        :param users: The users, e.g. ``storage.iter_users()``.
+        :param k: The number of leaderboard entries.
+        :param start: The start of the range for completion rates.
+        :param end: The end of the range (exclusive); rates are skipped unless both are given.
+        :param executor: The executor to run shards on (defaults to a new process pool).
+        :return: The merged results.
+        """
+        if executor is None:
+            with ProcessPoolExecutor(self.max_workers) as executor:
+                return self.run(users, k, start, end, executor)
+        start_ts = to_timestamp(start) if start is not None else None
+        end_ts = to_timestamp(end) if end is not None else None
+        longest, rates, tops = {}, {}, []
+
+        def collect(keys: List[HabitKey], result: ShardResult) -> None:
+            longest.update(zip(keys, result.longest.tolist()))
+            if result.rates is not None:
+                rates.update(zip(keys, result.rates.tolist()))
+            tops.append(result.top)
+
+        pending = deque()
+        for shard in self.shards(users):
+            pending.append((shard.keys, executor.submit(analyze_shard, shard, k, start_ts, end_ts)))
+            if len(pending) >= 2 * self.max_workers:
+                keys, future = pending.popleft()
+                collect(keys, future.result())
+        while pending:
+            keys, future = pending.popleft()
+            collect(keys, future.result())
+        # Shards are merged in order, so ties keep the order the users were read in
+        leaderboard = heapq.nlargest(k, chain.from_iterable(tops), key=lambda entry: entry.streak)
+        return AnalyticsSummary(longest, rates, leaderboard)
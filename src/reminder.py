@@ -1,87 +1,535 @@
-import os
 import smtplib
+import threading
 import requests
-import json
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from email.mime.text import MIMEText
-from typing import List
+from queue import LifoQueue, Empty
+from typing import List, NamedTuple, Optional
 from src.user import User
 from src.habit import Habit
+from src.config import get_config
+
+# FCM endpoint
+FCM_URL = "https://fcm.googleapis.com/fcm/send"
+
+# Placeholder device token until users register devices
+DEVICE_TOKEN_PLACEHOLDER = "device_token_placeholder"
+
+# Seconds to wait for the FCM endpoint
+PUSH_TIMEOUT = 10.0
+
+def create_push_session(max_connections: int = 10) -> requests.Session:
+    """
+    Create an HTTP session that keeps connections to the push endpoint alive.
+
+    Requests reuse pooled connections, so only the first request to a host pays
+    for TCP and TLS setup. When every connection is busy, further requests wait
+    for one instead of opening more.
+
+    :param max_connections: The maximum number of open connections per host.
+    :return: The session.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections, pool_block=True)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+_push_session: Optional[requests.Session] = None
+_push_session_lock = threading.Lock()
+
+def get_push_session() -> requests.Session:
+    """
+    Get the push session shared by every Reminder of this process.
+    """
+    global _push_session
+    with _push_session_lock:
+        if _push_session is None:
+            _push_session = create_push_session()
+        return _push_session
+
+# SMTP server used unless smtp_host / smtp_port are configured
+SMTP_HOST = 'smtp.gmail.com'
+SMTP_PORT = 465
+
+def smtp_settings() -> dict:
+    """
+    Get the SMTP login and server from the configuration.
+
+    The server comes from the smtp_host, smtp_port and smtp_ssl settings (or the
+    SMTP_HOST, SMTP_PORT and SMTP_SSL environment variables), defaulting to
+    Gmail with implicit TLS.
+
+    :return: The keyword arguments of an SMTPConnectionPool.
+    """
+    config = get_config()
+    use_ssl = config.get('smtp_ssl', True)
+    if isinstance(use_ssl, str):
+        use_ssl = use_ssl.strip().lower() not in ('0', 'false', 'no', 'off')
+    return {
+        'email_user': config.get('email_user'),
+        'email_pass': config.get('email_pass'),
+        'host': config.get('smtp_host') or SMTP_HOST,
+        'port': int(config.get('smtp_port') or SMTP_PORT),
+        'use_ssl': bool(use_ssl),
+    }
+
+class DeliveryResult(NamedTuple):
+    """
+    The outcome of sending one message.
+    """
+    recipient: str
+    subject: str
+    success: bool
+    attempts: int
+    error: Optional[str] = None
+
+def is_connection_error(error: OSError) -> bool:
+    """
+    Check whether an SMTP error means the connection can't be trusted anymore.
+
+    Anything else (e.g. a refused recipient) is a failure of that message only.
+
+    :param error: The error raised while sending.
+    """
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code == 421
+    return not isinstance(error, smtplib.SMTPException)
+
+class SMTPConnectionPool:
+    def __init__(self, email_user: Optional[str], email_pass: Optional[str], host: str = SMTP_HOST,
+                 port: int = SMTP_PORT, use_ssl: bool = True, size: int = 1, max_retries: int = 2, timeout: float = 30.0):
+        """
+        Initialize a pool of authenticated SMTP connections.
+
+        Connections are opened lazily, logged in once and reused for every
+        message until they fail, at which point they are replaced.
+
+        :param email_user: The SMTP login (no login if None).
+        :param email_pass: The SMTP password.
+        :param host: The SMTP server.
+        :param port: The SMTP port.
+        :param use_ssl: Whether to connect with implicit TLS (SMTP_SSL).
+        :param size: The maximum number of open connections.
+        :param max_retries: How many times to reconnect and resend a message after a connection failure.
+        :param timeout: The socket timeout in seconds.
+        """
+        self.email_user = email_user
+        self.email_pass = email_pass
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.size = size
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._idle: LifoQueue = LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._open: List[smtplib.SMTP] = []
+
+    def __enter__(self) -> 'SMTPConnectionPool':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        server = smtp_class(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.email_user is not None:
+                server.login(self.email_user, self.email_pass)
+        except Exception:
+            server.close()
+            raise
+        with self._lock:
+            self._open.append(server)
+        return server
+
+    def _discard(self, server: smtplib.SMTP) -> None:
+        with self._lock:
+            if server in self._open:
+                self._open.remove(server)
+        try:
+            server.close()
+        except OSError:
+            pass
+
+    def send(self, msg: MIMEText) -> DeliveryResult:
+        """
+        Send a message over a pooled connection, reconnecting on connection failures.
+
+        :param msg: The message, with From, To and Subject headers set.
+        :return: The delivery result.
+        """
+        recipient = msg['To']
+        attempts = 0
+        self._slots.acquire()
+        try:
+            try:
+                server = self._idle.get_nowait()
+            except Empty:
+                server = None
+            while True:
+                attempts += 1
+                try:
+                    if server is None:
+                        server = self._connect()
+                    server.sendmail(msg['From'], [recipient], msg.as_string())
+                    return DeliveryResult(recipient, msg['Subject'], True, attempts)
+                except OSError as e:  # smtplib.SMTPException is an OSError
+                    if not is_connection_error(e):
+                        # The server rejected this message (or the login); an open connection is still usable
+                        if server is not None:
+                            try:
+                                server.rset()
+                            except OSError:
+                                self._discard(server)
+                                server = None
+                        return DeliveryResult(recipient, msg['Subject'], False, attempts, str(e))
+                    if server is not None:
+                        self._discard(server)
+                        server = None
+                    if attempts > self.max_retries:
+                        return DeliveryResult(recipient, msg['Subject'], False, attempts, str(e))
+        finally:
+            if server is not None:
+                self._idle.put(server)
+            self._slots.release()
+
+    def send_many(self, messages: List[MIMEText]) -> List[DeliveryResult]:
+        """
+        Send many messages, spreading them over up to ``size`` connections.
+
+        :param messages: The messages to send.
+        :return: The delivery results, in the order of the messages.
+        """
+        if self.size == 1 or len(messages) <= 1:
+            return [self.send(msg) for msg in messages]
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(self.send, messages))
+
+    def close(self) -> None:
+        """
+        Log out of and close every open connection.
+        """
+        while True:
+            try:
+                server = self._idle.get_nowait()
+            except Empty:
+                break
+            try:
+                server.quit()
+            except OSError:
+                pass
+        with self._lock:
+            servers, self._open = self._open, []
+        for server in servers:
+            try:
+                server.close()
+            except OSError:
+                pass
+
+_smtp_pool: Optional[SMTPConnectionPool] = None
+_smtp_settings: Optional[dict] = None
+_smtp_pool_lock = threading.Lock()
+
+def get_smtp_pool() -> SMTPConnectionPool:
+    """
+    Get the SMTP connection pool shared by every Reminder of this process.
+
+    The pool is replaced when the SMTP settings in the configuration change.
+    """
+    global _smtp_pool, _smtp_settings
+    settings = smtp_settings()
+    with _smtp_pool_lock:
+        if _smtp_pool is None or settings != _smtp_settings:
+            if _smtp_pool is not None:
+                _smtp_pool.close()
+            _smtp_pool = SMTPConnectionPool(**settings)
+            _smtp_settings = settings
+        return _smtp_pool
+
+def close_smtp_pool() -> None:
+    """
+    Close the shared SMTP connection pool; the next reminder opens a new one.
+    """
+    global _smtp_pool, _smtp_settings
+    with _smtp_pool_lock:
+        if _smtp_pool is not None:
+            _smtp_pool.close()
+        _smtp_pool = _smtp_settings = None
 
 class Reminder:
-    def __init__(self, user: User):
+    def __init__(self, user: User, session: Optional[requests.Session] = None, push_url: str = FCM_URL,
+                 push_timeout: float = PUSH_TIMEOUT, pool: Optional[SMTPConnectionPool] = None):
         """
         Initialize a new reminder for a user.
 
         :param user: The user to send reminders to.
+        :param session: The HTTP session to send push notifications over (defaults to one shared by every Reminder).
+        :param push_url: The FCM endpoint.
+        :param push_timeout: Seconds to wait for each push request.
+        :param pool: The SMTP connection pool to send emails through (defaults to one shared by every Reminder).
         """
         self.user = user
-        with open('config.json', 'r') as f:
-            config = json.load(f)
-        self.email_user = config['email_user']
-        self.email_pass = config['email_pass']
+        self._pool = pool
+        self.session = session if session is not None else get_push_session()
+        self.push_url = push_url
+        self.push_timeout = push_timeout
+        # Credentials come from config.json (parsed once per process) or the environment
+        config = get_config()
+        self.email_user = config.get('email_user')
+        self.email_pass = config.get('email_pass')
+
+    @property
+    def pool(self) -> SMTPConnectionPool:
+        # The shared pool is looked up on each send, so it follows configuration changes
+        return self._pool if self._pool is not None else get_smtp_pool()
 
-    def send_email_reminder(self, habit: Habit) -> None:
+    @staticmethod
+    def format_subject(habits: List[Habit]) -> str:
         """
-        Send an email reminder for a habit.
+        Format the reminder title for one or more habits.
 
-        :param habit: The habit to send a reminder for.
+        :param habits: The habits to remind about.
+        :return: The subject line.
         """
-        subject = f"Reminder: {habit.name}"
-        body = f"Don't forget to complete your habit: {habit.name} ({habit.frequency})"
-        msg = MIMEText(body)
-        msg['Subject'] = subject
-        msg['From'] = self.email_user
-        msg['To'] = self.user.email
+        return f"Reminder: {', '.join(habit.name for habit in habits)}"
 
-        # Email sending logic using Gmail's SMTP server
-        try:
-            with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-                server.login(self.email_user, self.email_pass)
-                server.sendmail(self.email_user, [self.user.email], msg.as_string())
-            print(f"Email reminder sent to {self.user.email} for habit '{habit.name}'")
-        except Exception as e:
-            print(f"Failed to send email reminder: {e}")
+    @staticmethod
+    def format_body(habits: List[Habit]) -> str:
+        """
+        Format the reminder text for one or more habits.
 
-    def send_push_notification(self, habit: Habit, device_token: str) -> None:
+        :param habits: The habits to remind about.
+        :return: The message body.
         """
-        Send a push notification reminder for a habit.
+        if len(habits) == 1:
+            return f"Don't forget to complete your habit: {habits[0].name} ({habits[0].frequency})"
+        lines = [f"- {habit.name} ({habit.frequency})" for habit in habits]
+        return "Don't forget to complete your habits:\n" + "\n".join(lines)
+
+    def build_email(self, habit: Habit) -> MIMEText:
+        """
+        Build the email reminder for a habit.
 
         :param habit: The habit to send a reminder for.
-        :param device_token: The device token to send the push notification to.
+        :return: The email message.
+        """
+        return self.build_digest_email([habit])
+
+    def build_digest_email(self, habits: List[Habit]) -> MIMEText:
+        """
+        Build a single email reminding about several habits.
+
+        :param habits: The habits to send a reminder for.
+        :return: The email message.
         """
-        # FCM endpoint
-        url = "https://fcm.googleapis.com/fcm/send"
+        msg = MIMEText(self.format_body(habits))
+        msg['Subject'] = self.format_subject(habits)
+        msg['From'] = self.email_user
+        msg['To'] = self.user.email
+        return msg
 
-        # FCM server key
-        server_key = os.getenv('FCM_SERVER_KEY')
+    @staticmethod
+    def build_push_headers() -> dict:
+        """
+        Build the HTTP headers of an FCM request, authorized with the FCM server key.
 
-        # Notification payload
-        headers = {
+        :return: The request headers.
+        """
+        # FCM server key, from the FCM_SERVER_KEY environment variable or config.json
+        server_key = get_config().get('fcm_server_key')
+        return {
             'Content-Type': 'application/json',
             'Authorization': f'key={server_key}',
         }
-        payload = {
+
+    def build_push_payload(self, habits: List[Habit], device_token: str) -> dict:
+        """
+        Build the FCM payload of a push notification reminding about one or more habits.
+
+        :param habits: The habits to send a reminder for.
+        :param device_token: The device token to send the push notification to.
+        :return: The JSON payload.
+        """
+        return {
             'to': device_token,
             'notification': {
-                'title': f"Reminder: {habit.name}",
-                'body': f"Don't forget to complete your habit: {habit.name} ({habit.frequency})",
+                'title': self.format_subject(habits),
+                'body': self.format_body(habits),
             },
         }
 
-        # Send the push notification
+    def create_smtp_pool(self, size: int = 1, **kwargs) -> SMTPConnectionPool:
+        """
+        Create an SMTP connection pool to the configured server, logged in with this reminder's credentials.
+
+        :param size: The maximum number of open connections.
+        :return: The connection pool.
+        """
+        settings = dict(smtp_settings(), email_user=self.email_user, email_pass=self.email_pass)
+        settings.update(kwargs)
+        return SMTPConnectionPool(size=size, **settings)
+
+    def send_email_reminder(self, habit: Habit) -> DeliveryResult:
+        """
+        Send an email reminder for a habit.
+
+        :param habit: The habit to send a reminder for.
+        :return: The delivery result.
+        """
+        return self.send_email_digest([habit])
+
+    def send_email_digest(self, habits: List[Habit]) -> DeliveryResult:
+        """
+        Send a single email reminding about several habits.
+
+        :param habits: The habits to send a reminder for.
+        :return: The delivery result.
+        """
+        # Sent over a pooled connection, so consecutive reminders log in once
+        result = self.pool.send(self.build_digest_email(habits))
+        if result.success:
+            print(f"Email reminder sent to {result.recipient}: '{result.subject}'")
+        else:
+            print(f"Failed to send email reminder: {result.error}")
+        return result
+
+    def send_push_notification(self, habit: Habit, device_token: str) -> DeliveryResult:
+        """
+        Send a push notification reminder for a habit.
+
+        :param habit: The habit to send a reminder for.
+        :param device_token: The device token to send the push notification to.
+        :return: The delivery result.
+        """
+        return self.send_push_digest([habit], device_token)
+
+    def send_push_digest(self, habits: List[Habit], device_token: str) -> DeliveryResult:
+        """
+        Send a single push notification reminding about several habits.
+
+        :param habits: The habits to send a reminder for.
+        :param device_token: The device token to send the push notification to.
+        :return: The delivery result.
+        """
+        result = self.post_push(self.build_push_headers(), self.build_push_payload(habits, device_token))
+        if result.success:
+            print(f"Push notification sent to {device_token}: '{result.subject}'")
+        else:
+            print(f"Failed to send push notification: {result.error}")
+        return result
+
+    def post_push(self, headers: dict, payload: dict) -> DeliveryResult:
+        """
+        Post a push notification over the session.
+
+        :param headers: The request headers.
+        :param payload: The FCM payload.
+        :return: The delivery result.
+        """
+        title = payload['notification']['title']
         try:
-            response = requests.post(url, headers=headers, json=payload)
+            response = self.session.post(self.push_url, headers=headers, json=payload, timeout=self.push_timeout)
             response.raise_for_status()
-            print(f"Push notification sent to {device_token} for habit '{habit.name}'")
+            return DeliveryResult(payload['to'], title, True, 1)
         except requests.exceptions.RequestException as e:
-            print(f"Failed to send push notification: {e}")
+            return DeliveryResult(payload['to'], title, False, 1, str(e))
+
+    def send_push_batch(self, habits: List[Habit], device_tokens: List[str],
+                        max_workers: int = 10) -> List[DeliveryResult]:
+        """
+        Send a push notification reminding about several habits to many devices.
 
-    def send_reminders(self) -> None:
+        Requests run on up to ``max_workers`` threads over the session's pooled connections.
+
+        :param habits: The habits to send a reminder for.
+        :param device_tokens: The device tokens to send the push notification to.
+        :param max_workers: The maximum number of requests in flight.
+        :return: The delivery result of each device, in the order of the tokens.
+        """
+        headers = self.build_push_headers()
+        payloads = [self.build_push_payload(habits, device_token) for device_token in device_tokens]
+        if max_workers == 1 or len(payloads) <= 1:
+            return [self.post_push(headers, payload) for payload in payloads]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda payload: self.post_push(headers, payload), payloads))
+
+    def build_emails(self, habits: Optional[List[Habit]] = None, digest: bool = False) -> List[MIMEText]:
+        """
+        Build the email reminders for several habits.
+
+        :param habits: The habits to send reminders for (defaults to all of the user's habits).
+        :param digest: Whether to build one email listing every habit instead of one per habit.
+        :return: The email messages.
+        """
+        habits = self.user.get_habits() if habits is None else habits
+        if not habits:
+            return []
+        if digest:
+            return [self.build_digest_email(habits)]
+        return [self.build_email(habit) for habit in habits]
+
+    def send_email_reminders(self, pool: SMTPConnectionPool, habits: Optional[List[Habit]] = None,
+                             digest: bool = False) -> List[DeliveryResult]:
         """
-        Send reminders for all habits of the user.
+        Send email reminders for many habits over pooled connections.
+
+        :param pool: The connection pool to send through.
+        :param habits: The habits to send reminders for (defaults to all of the user's habits).
+        :param digest: Whether to send one email listing every habit instead of one per habit.
+        :return: The delivery result of each reminder.
+        """
+        results = pool.send_many(self.build_emails(habits, digest))
+        for result in results:
+            if result.success:
+                print(f"Email reminder sent to {result.recipient}: '{result.subject}'")
+            else:
+                print(f"Failed to send email reminder to {result.recipient}: {result.error}")
+        return results
+
+    def send_reminders(self, digest: bool = False, habits: Optional[List[Habit]] = None) -> List[Habit]:
         """
-        for habit in self.user.get_habits():
-            # Placeholder device token
-            device_token = "device_token_placeholder"
-            self.send_email_reminder(habit)
-            self.send_push_notification(habit, device_token)
\ No newline at end of file
+        Send reminders for habits of the user.
+
+        :param digest: Whether to send one email and one push notification listing
+                       every habit instead of one of each per habit.
+        :param habits: The habits to send reminders for, e.g. those a ReminderScheduler
+                       reports as due (defaults to all of the user's habits).
+        :return: The habits with a delivered email or push notification, to pass to
+                 ``ReminderScheduler.mark_reminded``.
+        """
+        device_token = DEVICE_TOKEN_PLACEHOLDER
+        habits = self.user.get_habits() if habits is None else habits
+        if digest:
+            if not habits:
+                return []
+            email = self.send_email_digest(habits)
+            push = self.send_push_digest(habits, device_token)
+            return list(habits) if email.success or push.success else []
+        reminded = []
+        for habit in habits:
+            email = self.send_email_reminder(habit)
+            push = self.send_push_notification(habit, device_token)
+            if email.success or push.success:
+                reminded.append(habit)
+        return reminded
+
+def send_email_reminders(users: List[User], pool: SMTPConnectionPool, digest: bool = False) -> List[DeliveryResult]:
+    """
+    Send email reminders for every habit of many users over one connection pool.
+
+    :param users: The users to send reminders to.
+    :param pool: The connection pool to send through.
+    :param digest: Whether to send one email per user instead of one per habit.
+    :return: The delivery result of each reminder.
+    """
+    messages = []
+    for user in users:
+        messages.extend(Reminder(user).build_emails(digest=digest))
+    return pool.send_many(messages)
\ No newline at end of file
@@ -0,0 +1,278 @@
+import heapq
+import itertools
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from src.user import User
+from src.habit import Habit
+from src.streaks import get_rule
+
+PERIODS = {'daily': timedelta(days=1), 'weekly': timedelta(weeks=1)}
+
+def start_of_next_month(date: datetime) -> datetime:
+    """
+    Get midnight on the first day of the month after a date.
+
+    :param date: The date.
+    """
+    if date.month == 12:
+        return datetime(date.year + 1, 1, 1)
+    return datetime(date.year, date.month + 1, 1)
+
+def advance(due: datetime, frequency: str) -> datetime:
+    """
+    Get the due time one period after another.
+
+    Daily and weekly habits are due a day or a week later, and monthly habits
+    on the first of the next month. Other frequencies (such as 'weekdays' or
+    'every 3 days') are due at the start of their next period.
+
+    :param due: The due time.
+    :param frequency: The frequency of the habit (see ``streaks.get_rule``).
+    """
+    if frequency in PERIODS:
+        return due + PERIODS[frequency]
+    elif frequency == 'monthly':
+        return start_of_next_month(due)
+    rule = get_rule(frequency)
+    return rule.start(rule.bucket(due) + 1)
+
+def advance_past(due: datetime, frequency: str, after: datetime) -> datetime:
+    """
+    Advance a due time by whole periods until it is later than another time.
+
+    :param due: The due time.
+    :param frequency: The frequency of the habit (see ``streaks.get_rule``).
+    :param after: The time to advance past.
+    :return: The first due time after ``after`` (``due`` itself if it is already later).
+    """
+    if due > after:
+        return due
+    if frequency in PERIODS:
+        period = PERIODS[frequency]
+        return due + ((after - due) // period + 1) * period
+    # Other frequencies are due at the start of a period, so the next one after ``after`` is the answer
+    return advance(after, frequency)
+
+def next_due(habit: Habit) -> datetime:
+    """
+    Get the time a habit is due again.
+
+    A habit that was never completed is due from its creation. Otherwise a daily
+    or weekly habit is due one day or week after its last completion, and a
+    monthly habit on the first day of the following month. Once a reminder has
+    been delivered, the habit is not due again until the following period.
+
+    :param habit: The habit.
+    :return: The due time.
+    """
+    last_completion = habit.get_last_completion()
+    if last_completion is None:
+        due = habit.creation_date
+    else:
+        due = advance(last_completion, habit.frequency)
+    if habit.last_reminded is not None:
+        due = advance_past(due, habit.frequency, habit.last_reminded)
+    return due
+
+class ReminderScheduler:
+    def __init__(self):
+        """
+        Initialize an empty scheduler of habit reminders.
+
+        Keeps a min-heap of (next due time, user, habit) entries. Habits notify the
+        scheduler of completions and frequency changes, which reschedules them;
+        the entry they replace stays in the heap, marked as cancelled, and is
+        dropped when it reaches the top. Each tick only pops the entries that are
+        due, so it costs O(due * log n) instead of visiting every habit.
+
+        Popped habits are rescheduled only once the caller reports the outcome of
+        their reminders with ``mark_reminded`` or ``retry``.
+        """
+        self._heap: List[list] = []
+        self._entries: Dict[Tuple[str, str], list] = {}
+        self._listeners: Dict[Tuple[str, str], tuple] = {}
+        self._users: Dict[str, User] = {}
+        # Entries popped by tick whose outcome has not been reported yet
+        self._popped: Dict[Tuple[str, str], list] = {}
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return key in self._entries
+
+    def _entry(self, username: str, habit: Habit, due: datetime) -> list:
+        # The counter breaks ties so habits are never compared; the last field marks cancelled entries
+        entry = [due, next(self._counter), username, habit, True]
+        self._entries[(username, habit.name)] = entry
+        return entry
+
+    def _cancel(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry[-1] = False
+
+    def add_user(self, user: User) -> None:
+        """
+        Schedule reminders for every habit of a user.
+
+        :param user: The user.
+        """
+        self._users[user.username] = user
+        for habit in user.get_habits():
+            self.add_habit(user.username, habit)
+
+    def add_users(self, users: Iterable[User]) -> None:
+        """
+        Schedule reminders for every habit of many users, building the heap in linear time.
+
+        :param users: The users.
+        """
+        for user in users:
+            self._users[user.username] = user
+            for habit in user.get_habits():
+                self._cancel((user.username, habit.name))
+                self._heap.append(self._entry(user.username, habit, next_due(habit)))
+                self._subscribe(user.username, habit)
+        heapq.heapify(self._heap)
+
+    def _subscribe(self, username: str, habit: Habit) -> None:
+        self._unsubscribe((username, habit.name))
+        listener = lambda habit: self.reschedule(username, habit)
+        habit.add_listener(listener)
+        self._listeners[(username, habit.name)] = (habit, listener)
+
+    def _unsubscribe(self, key: Tuple[str, str]) -> None:
+        subscription = self._listeners.pop(key, None)
+        if subscription is not None:
+            habit, listener = subscription
+            habit.remove_listener(listener)
+
+    def add_habit(self, username: str, habit: Habit) -> None:
+        """
+        Schedule reminders for a habit.
+
+        :param username: The username of the habit's owner (added with ``add_user``).
+        :param habit: The habit.
+        """
+        self.reschedule(username, habit)
+        self._subscribe(username, habit)
+
+    def remove_habit(self, username: str, habit_name: str) -> None:
+        """
+        Stop reminding about a habit.
+
+        :param username: The username of the habit's owner.
+        :param habit_name: The name of the habit.
+        """
+        self._cancel((username, habit_name))
+        self._unsubscribe((username, habit_name))
+
+    def remove_user(self, username: str) -> None:
+        """
+        Stop reminding a user.
+
+        :param username: The username of the user.
+        """
+        for key in [key for key in self._entries if key[0] == username]:
+            self.remove_habit(*key)
+        self._users.pop(username, None)
+
+    def close(self) -> None:
+        """
+        Stop listening to every habit and drop the schedule.
+
+        Habits keep a reference to the scheduler through their listeners, so a
+        scheduler that is no longer used must be closed to be freed and to stop
+        being rescheduled by later completions.
+        """
+        for key in list(self._listeners):
+            self._unsubscribe(key)
+        self._heap.clear()
+        self._entries.clear()
+        self._popped.clear()
+        self._users.clear()
+
+    def reschedule(self, username: str, habit: Habit, due: Optional[datetime] = None) -> None:
+        """
+        Move a habit's reminder to a new due time.
+
+        :param username: The username of the habit's owner.
+        :param habit: The habit.
+        :param due: The new due time (defaults to when the habit is due again).
+        """
+        self._cancel((username, habit.name))
+        heapq.heappush(self._heap, self._entry(username, habit, next_due(habit) if due is None else due))
+
+    def next_due_time(self) -> Optional[datetime]:
+        """
+        Get the time of the earliest scheduled reminder.
+
+        :return: The due time, or None if nothing is scheduled.
+        """
+        while self._heap and not self._heap[0][-1]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def tick(self, now: Optional[datetime] = None) -> List[Tuple[User, List[Habit]]]:
+        """
+        Pop the reminders that are due.
+
+        Habits already completed in the current period are rescheduled without a
+        reminder. The others stay out of the heap until the caller reports whether
+        their reminders were delivered: ``mark_reminded`` reschedules a habit one
+        period later, so a habit that stays incomplete is reminded about once per
+        period, and ``retry`` makes it due again at the next tick.
+
+        :param now: The current time (defaults to now).
+        :return: The users with due habits, each with the habits to remind about.
+        """
+        now = datetime.now() if now is None else now
+        due_habits: Dict[str, List[Habit]] = {}
+        while self._heap and (not self._heap[0][-1] or self._heap[0][0] <= now):
+            entry = heapq.heappop(self._heap)
+            due, _, username, habit, active = entry
+            if not active:
+                continue
+            # A habit already completed in the current period (e.g. through another copy of it) is skipped
+            if habit.is_done(now):
+                heapq.heappush(self._heap, self._entry(username, habit, advance_past(due, habit.frequency, now)))
+            else:
+                # Still registered, so a completion or removal before the outcome is reported cancels it
+                self._popped[(username, habit.name)] = entry
+                due_habits.setdefault(username, []).append(habit)
+        return [(self._users[username], habits) for username, habits in due_habits.items()]
+
+    def mark_reminded(self, reminders: Iterable[Tuple[User, List[Habit]]], reminded_at: Optional[datetime] = None) -> None:
+        """
+        Record that reminders popped by ``tick`` were delivered and reschedule their habits.
+
+        Sets each habit's ``last_reminded``; save it with ``Storage.record_reminders``
+        so the next process does not remind again in the same period.
+
+        :param reminders: The users and habits that were reminded, as returned by ``tick``.
+        :param reminded_at: The time of delivery (defaults to now).
+        """
+        reminded_at = datetime.now() if reminded_at is None else reminded_at
+        for user, habits in reminders:
+            for habit in habits:
+                habit.last_reminded = reminded_at
+                self._requeue(user.username, habit, next_due(habit))
+
+    def retry(self, reminders: Iterable[Tuple[User, List[Habit]]]) -> None:
+        """
+        Put back reminders popped by ``tick`` that could not be delivered, so the next tick returns them again.
+
+        :param reminders: The users and habits whose reminders failed, as returned by ``tick``.
+        """
+        for user, habits in reminders:
+            for habit in habits:
+                self._requeue(user.username, habit)
+
+    def _requeue(self, username: str, habit: Habit, due: Optional[datetime] = None) -> None:
+        # Pushes a popped habit back, unless it was removed or rescheduled (e.g. completed) meanwhile
+        key = (username, habit.name)
+        entry = self._popped.pop(key, None)
+        if entry is not None and entry[-1] and self._entries.get(key) is entry:
+            self.reschedule(username, habit, entry[0] if due is None else due)
@@ -0,0 +1,305 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Optional, Union
+from src.user import User
+from src.habit import Habit
+from src.completions import CompletionLog, to_timestamp, from_timestamp
+from src.storage import SQLiteStorage, SQLITE_EXTENSIONS
+from src.journal import Journal
+from src.locking import atomic_write, lock_for
+
+class JSONSerializer:
+    """
+    Indented JSON with ISO-8601 dates, as written by ``User.save_all_to_json``.
+    """
+    name = 'json'
+    extensions = ('.json',)
+    # Whether the CLI journals changes next to files in this format
+    journaled = True
+
+    def dump(self, users: Dict[str, User], file_path: str) -> None:
+        """
+        Save all users to a JSON file.
+
+        :param users: A dictionary of users.
+        :param file_path: The path to the JSON file.
+        """
+        User.save_all_to_json(users, file_path)
+
+    def load(self, file_path: str, compact: bool = False) -> Dict[str, User]:
+        """
+        Load all users from a JSON file.
+
+        :param file_path: The path to the JSON file.
+        :param compact: Whether to store completion dates in CompletionLogs.
+        :return: A dictionary of User objects.
+        """
+        return User.load_all_from_json(file_path, compact=compact)
+
+class BinarySnapshot:
+    def __init__(self, file_path: str):
+        """
+        Open a binary snapshot through a read-only memory map.
+
+        :param file_path: The path to the binary snapshot.
+        """
+        self.file_path = file_path
+        with open(file_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(BinarySerializer.MAGIC)] != BinarySerializer.MAGIC:
+            self._mmap.close()
+            raise ValueError(f"'{file_path}' is not a binary habit snapshot.")
+        (header_size,) = struct.unpack_from('<Q', self._mmap, len(BinarySerializer.MAGIC))
+        header_start = len(BinarySerializer.MAGIC) + 8
+        self.header = json.loads(self._mmap[header_start:header_start + header_size])
+        self._data_start = BinarySerializer.align(header_start + header_size)
+        self._habits = {(user['username'], habit['name']): habit
+                        for user in self.header['users'] for habit in user['habits']}
+
+    def __enter__(self) -> 'BinarySnapshot':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close the memory map. Views returned by ``timestamps`` must be released first.
+        """
+        self._mmap.close()
+
+    def _span(self, habit: Dict) -> slice:
+        start = self._data_start + habit['offset'] * 8
+        return slice(start, start + habit['count'] * 8)
+
+    def timestamps(self, username: str, habit_name: str) -> Union[memoryview, array]:
+        """
+        Get a habit's completion timestamps without copying them.
+
+        :param username: The username of the habit's owner.
+        :param habit_name: The name of the habit.
+        :return: An int64 view of microseconds since the epoch (a copy on big-endian hosts).
+        """
+        span = self._span(self._habits[(username, habit_name)])
+        if sys.byteorder == 'little':
+            return memoryview(self._mmap)[span].cast('q')
+        timestamps = array('q', self._mmap[span])
+        timestamps.byteswap()
+        return timestamps
+
+    def load_users(self, compact: bool = False) -> Dict[str, User]:
+        """
+        Create User objects for every user in the snapshot.
+
+        :param compact: Whether to store completion dates in CompletionLogs.
+        :return: A dictionary of User objects.
+        """
+        users = {}
+        for user_data in self.header['users']:
+            user = User(username=user_data['username'], email=user_data['email'])
+            for habit_data in user_data['habits']:
+                habit = Habit(name=habit_data['name'], frequency=habit_data['frequency'], compact=compact)
+                habit.creation_date = from_timestamp(habit_data['creation_date'])
+                log = CompletionLog.from_timestamps(self._mmap[self._span(habit_data)])
+                if sys.byteorder != 'little':
+                    log.timestamps.byteswap()
+                habit.completion_dates = log if compact else list(log)
+                habit.restore_streak_state(habit_data['streak'])
+                if habit_data.get('last_reminded') is not None:
+                    habit.last_reminded = from_timestamp(habit_data['last_reminded'])
+                user.add_habit(habit)
+            users[user.username] = user
+        return users
+
+class BinarySerializer:
+    """
+    Columnar binary snapshot.
+
+    Layout: an 8-byte magic, the little-endian uint64 size of a JSON header
+    describing users and habits, padding to an 8-byte boundary, then one
+    little-endian int64 column holding every habit's completion timestamps
+    (microseconds since the epoch). Each habit records the offset and count
+    of its timestamps in the column, so they can be read through ``mmap``
+    without parsing any dates.
+    """
+    name = 'binary'
+    extensions = ('.bin',)
+    journaled = True
+    MAGIC = b'BTHSNAP1'
+
+    @staticmethod
+    def align(position: int) -> int:
+        return (position + 7) // 8 * 8
+
+    def dump(self, users: Dict[str, User], file_path: str) -> None:
+        """
+        Save all users to a binary snapshot.
+
+        :param users: A dictionary of users.
+        :param file_path: The path to the snapshot.
+        """
+        header_users = []
+        columns = []
+        offset = 0
+        for username, user in users.items():
+            habits = []
+            for habit in user.get_habits():
+                if isinstance(habit.completion_dates, CompletionLog):
+                    timestamps = habit.completion_dates.timestamps
+                else:
+                    timestamps = array('q', (to_timestamp(date) for date in habit.completion_dates))
+                habits.append({
+                    'name': habit.name,
+                    'frequency': habit.frequency,
+                    'creation_date': to_timestamp(habit.creation_date),
+                    'offset': offset,
+                    'count': len(timestamps),
+                    'streak': habit.streak_state(),
+                    'last_reminded': to_timestamp(habit.last_reminded) if habit.last_reminded else None,
+                })
+                columns.append(timestamps)
+                offset += len(timestamps)
+            header_users.append({'username': username, 'email': user.email, 'habits': habits})
+
+        header = json.dumps({'version': 1, 'users': header_users}).encode('utf-8')
+        header_end = len(self.MAGIC) + 8 + len(header)
+        # Readers may have the old snapshot mapped, so it is replaced rather than overwritten
+        with atomic_write(file_path, 'wb') as f:
+            f.write(self.MAGIC)
+            f.write(struct.pack('<Q', len(header)))
+            f.write(header)
+            f.write(b'\0' * (self.align(header_end) - header_end))
+            for timestamps in columns:
+                if sys.byteorder != 'little':
+                    timestamps = array('q', timestamps)
+                    timestamps.byteswap()
+                timestamps.tofile(f)
+
+    def load(self, file_path: str, compact: bool = False) -> Dict[str, User]:
+        """
+        Load all users from a binary snapshot.
+
+        :param file_path: The path to the snapshot.
+        :param compact: Whether to store completion dates in CompletionLogs.
+        :return: A dictionary of User objects.
+        """
+        with BinarySnapshot(file_path) as snapshot:
+            return snapshot.load_users(compact=compact)
+
+class SQLiteSerializer:
+    """
+    A SQLite database as used by ``storage.SQLiteStorage``.
+    """
+    name = 'sqlite'
+    extensions = SQLITE_EXTENSIONS
+    journaled = False
+
+    def dump(self, users: Dict[str, User], file_path: str) -> None:
+        """
+        Save all users to a new SQLite database, replacing any existing one.
+
+        :param users: A dictionary of users.
+        :param file_path: The path to the database.
+        """
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(file_path + suffix):
+                os.remove(file_path + suffix)
+        storage = SQLiteStorage(file_path)
+        try:
+            storage.import_users(users)
+        finally:
+            storage.close()
+
+    def load(self, file_path: str, compact: bool = False) -> Dict[str, User]:
+        """
+        Load all users from a SQLite database.
+
+        :param file_path: The path to the database.
+        :param compact: Whether to store completion dates in CompletionLogs.
+        :return: A dictionary of User objects.
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"No such database: '{file_path}'")
+        storage = SQLiteStorage(file_path)
+        try:
+            users = {}
+            for username in storage.load_users():
+                users[username] = storage.load_user(username, compact=compact)
+            return users
+        finally:
+            storage.close()
+
+SERIALIZERS = {serializer.name: serializer for serializer in (JSONSerializer(), BinarySerializer(), SQLiteSerializer())}
+
+def get_serializer(file_path: str, fmt: Optional[str] = None):
+    """
+    Get the serializer for a format name, or guess it from the file extension.
+
+    :param file_path: The path to the file.
+    :param fmt: The format name ('json', 'binary', 'sqlite').
+    :return: The serializer.
+    """
+    if fmt is not None:
+        if fmt not in SERIALIZERS:
+            raise ValueError(f"Unsupported format '{fmt}'. Use one of: {', '.join(SERIALIZERS)}.")
+        return SERIALIZERS[fmt]
+    extension = os.path.splitext(file_path)[1].lower()
+    for serializer in SERIALIZERS.values():
+        if extension in serializer.extensions:
+            return serializer
+    raise ValueError(f"Cannot tell the format of '{file_path}' from its extension.")
+
+def save_users(users: Dict[str, User], file_path: str, fmt: Optional[str] = None) -> None:
+    """
+    Save all users in the given format.
+
+    :param users: A dictionary of users.
+    :param file_path: The path to the file.
+    :param fmt: The format name (guessed from the extension if omitted).
+    """
+    get_serializer(file_path, fmt).dump(users, file_path)
+
+def load_users(file_path: str, fmt: Optional[str] = None, compact: bool = False) -> Dict[str, User]:
+    """
+    Load all users in the given format.
+
+    The journal next to a JSON or binary snapshot is replayed on top of it, so
+    changes that were not compacted into the snapshot yet are included.
+
+    :param file_path: The path to the file.
+    :param fmt: The format name (guessed from the extension if omitted).
+    :param compact: Whether to store completion dates in CompletionLogs.
+    :return: A dictionary of User objects.
+    """
+    serializer = get_serializer(file_path, fmt)
+    if not serializer.journaled:
+        return serializer.load(file_path, compact=compact)
+    journal = Journal(file_path)
+    with lock_for(file_path):
+        try:
+            users = serializer.load(file_path, compact=compact)
+        except FileNotFoundError:
+            # Data that has only been journaled so far
+            if not os.path.exists(journal.journal_path):
+                raise
+            users = {}
+        journal.replay(users)
+    return users
+
+def convert(source_path: str, target_path: str, source_fmt: Optional[str] = None, target_fmt: Optional[str] = None) -> int:
+    """
+    Convert a users file from one format to another.
+
+    :param source_path: The path to the file to read.
+    :param target_path: The path to the file to write.
+    :param source_fmt: The format of the source (guessed from the extension if omitted).
+    :param target_fmt: The format of the target (guessed from the extension if omitted).
+    :return: The number of users converted.
+    """
+    users = load_users(source_path, source_fmt, compact=True)
+    save_users(users, target_path, target_fmt)
+    return len(users)
@@ -0,0 +1,515 @@
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from collections.abc import MutableMapping
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from src.user import User
+from src.habit import Habit
+from src.journal import Journal
+from src.store import LazyUserStore
+from src.completions import CompletionLog, to_timestamp, from_timestamp
+
+class Storage(ABC):
+    """
+    Interface shared by the storage backends.
+
+    ``load_users`` returns the mapping of users that commands read and mutate in
+    memory; every mutation is then recorded with the matching method below.
+    Backends must implement the abstract methods; the others have defaults
+    built on ``load_users``.
+    """
+
+    @abstractmethod
+    def load_users(self) -> MutableMapping:
+        ...
+
+    @abstractmethod
+    def create_user(self, user: User) -> None:
+        ...
+
+    @abstractmethod
+    def remove_user(self, username: str) -> None:
+        ...
+
+    @abstractmethod
+    def add_habit(self, username: str, habit: Habit) -> None:
+        ...
+
+    @abstractmethod
+    def remove_habit(self, username: str, habit_name: str) -> None:
+        ...
+
+    @abstractmethod
+    def set_frequency(self, username: str, habit_name: str, frequency: str) -> None:
+        ...
+
+    @abstractmethod
+    def complete(self, username: str, habit_name: str, completed_at: datetime) -> None:
+        ...
+
+    @abstractmethod
+    def merge_completions(self, merges: Dict[Tuple[str, str], List[datetime]]) -> None:
+        """
+        Record a batch of completions merged into habits with ``Habit.merge_completions``.
+
+        :param merges: The completions added to each (username, habit name).
+        """
+
+    @abstractmethod
+    def record_reminders(self, reminders: Dict[Tuple[str, str], datetime]) -> None:
+        """
+        Record the ``last_reminded`` time of habits whose reminders were delivered.
+
+        :param reminders: The reminder time of each (username, habit name).
+        """
+
+    def completions(self, username: str, habit_name: str,
+                    start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[datetime]:
+        """
+        Get a habit's completion dates in ``[start, end)``, in chronological order.
+
+        :param username: The username of the habit's owner.
+        :param habit_name: The name of the habit.
+        :param start: The earliest completion to include.
+        :param end: The completion time to stop before.
+        :return: A list of completion dates.
+        """
+        habit = self.load_users()[username].get_habit_by_name(habit_name)
+        return list(habit.completions_between(start, end))
+
+    def find_habit(self, habit_name: str) -> Optional[Habit]:
+        """
+        Find the first habit with a given name, in the order of ``iter_habits``.
+
+        :param habit_name: The name of the habit.
+        :return: The habit, or None if no user has such a habit.
+        """
+        for _, habit in self.iter_habits():
+            if habit.name == habit_name:
+                return habit
+        return None
+
+    def iter_users(self, usernames: Optional[Iterable[str]] = None) -> Iterator[User]:
+        """
+        Iterate over users one at a time, without keeping users that were not loaded yet.
+
+        :param usernames: The usernames to include (defaults to every user); unknown ones are skipped.
+        :return: An iterator of User objects.
+        """
+        users = self.load_users()
+        for username in (users if usernames is None else usernames):
+            if username in users:
+                yield self._peek_user(username)
+
+    def _peek_user(self, username: str) -> User:
+        return self.load_users()[username]
+
+    def iter_habits(self) -> Iterator[Tuple[str, Habit]]:
+        """
+        Iterate over every habit of every user.
+
+        :return: An iterator of (username, habit) pairs.
+        """
+        users = self.load_users()
+        for username in users:
+            for habit in users[username].get_habits():
+                yield username, habit
+
+    def is_loaded(self, username: str) -> bool:
+        """
+        Check whether a user is held in memory.
+
+        :param username: The username of the user.
+        :return: True if the user is loaded (always, for backends that load every user up front).
+        """
+        return True
+
+    def release_users(self, usernames: Iterable[str]) -> Set[str]:
+        """
+        Drop users from memory if the backend can load them again unchanged.
+
+        Long-running operations such as imports use this so that memory does not
+        grow with every user they touch. Released User objects must not be used
+        afterwards; the mapping from ``load_users`` loads a fresh copy. Backends
+        that cannot reload users release none.
+
+        :param usernames: The users to release.
+        :return: The usernames released; the others can be released by a later call.
+        """
+        return set()
+
+    def set_flush_delay(self, delay: float) -> None:
+        """
+        Let the backend buffer mutations for up to ``delay`` seconds before writing them.
+
+        Backends that always write through ignore this.
+
+        :param delay: Seconds to buffer mutations (0 writes each mutation immediately).
+        """
+        pass
+
+    def flush(self) -> None:
+        """
+        Write any buffered mutations.
+        """
+        pass
+
+    def close(self) -> None:
+        pass
+
+class JSONStorage(Storage):
+    def __init__(self, file_path: str, lazy: bool = True, flush_delay: float = 0.0):
+        """
+        Initialize storage in a users JSON file with an append-only journal.
+
+        :param file_path: The path to the users JSON file.
+        :param lazy: Whether to parse users on first access.
+        :param flush_delay: Seconds to buffer journal records before writing them.
+        """
+        self.file_path = file_path
+        self.journal = Journal(file_path, flush_delay=flush_delay)
+        self._lazy = lazy
+        self._users: Optional[MutableMapping] = None
+
+    def load_users(self) -> MutableMapping:
+        if self._users is None:
+            self._users = self.journal.load(lazy=self._lazy)
+        return self._users
+
+    def create_user(self, user: User) -> None:
+        self.journal.create_user(user)
+
+    def remove_user(self, username: str) -> None:
+        self.journal.remove_user(username)
+
+    def add_habit(self, username: str, habit: Habit) -> None:
+        self.journal.add_habit(username, habit)
+
+    def remove_habit(self, username: str, habit_name: str) -> None:
+        self.journal.remove_habit(username, habit_name)
+
+    def set_frequency(self, username: str, habit_name: str, frequency: str) -> None:
+        self.journal.set_frequency(username, habit_name, frequency)
+
+    def complete(self, username: str, habit_name: str, completed_at: datetime) -> None:
+        self.journal.complete(username, habit_name, completed_at)
+
+    def merge_completions(self, merges: Dict[Tuple[str, str], List[datetime]]) -> None:
+        self.journal.merge_completions(merges)
+
+    def record_reminders(self, reminders: Dict[Tuple[str, str], datetime]) -> None:
+        self.journal.record_reminders(reminders)
+
+    def _peek_user(self, username: str) -> User:
+        users = self.load_users()
+        if isinstance(users, LazyUserStore):
+            return users.peek(username)
+        return users[username]
+
+    def is_loaded(self, username: str) -> bool:
+        users = self.load_users()
+        return not isinstance(users, LazyUserStore) or users.is_loaded(username)
+
+    def release_users(self, usernames: Iterable[str]) -> Set[str]:
+        # Users with journaled changes are released once a compaction has written them
+        self.load_users()
+        return self.journal.release(usernames)
+
+    def set_flush_delay(self, delay: float) -> None:
+        self.journal.flush()
+        self.journal.flush_delay = delay
+
+    def flush(self) -> None:
+        self.journal.flush()
+
+    def close(self) -> None:
+        self.journal.wait()
+        if isinstance(self._users, LazyUserStore):
+            self._users.close()
+
+class BinaryStorage(JSONStorage):
+    def __init__(self, file_path: str, flush_delay: float = 0.0):
+        """
+        Initialize storage in a binary snapshot with an append-only journal.
+
+        Mutations are journaled exactly as with JSONStorage; compactions write the
+        binary snapshot instead of JSON. The snapshot has no per-user index, so all
+        users are loaded up front.
+
+        :param file_path: The path to the binary snapshot.
+        :param flush_delay: Seconds to buffer journal records before writing them.
+        """
+        # Imported here because serializers builds on this module
+        from src.serializers import BinarySerializer
+        super().__init__(file_path, lazy=False, flush_delay=flush_delay)
+        self.journal = Journal(file_path, flush_delay=flush_delay, serializer=BinarySerializer())
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    email TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS habits (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    frequency TEXT NOT NULL,
+    creation_date INTEGER NOT NULL,
+    UNIQUE (user_id, name)
+);
+CREATE TABLE IF NOT EXISTS completions (
+    habit_id INTEGER NOT NULL REFERENCES habits(id) ON DELETE CASCADE,
+    completed_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS completions_habit_time ON completions (habit_id, completed_at);
+CREATE INDEX IF NOT EXISTS habits_name ON habits (name);
+CREATE TABLE IF NOT EXISTS reminders (
+    habit_id INTEGER PRIMARY KEY REFERENCES habits(id) ON DELETE CASCADE,
+    reminded_at INTEGER NOT NULL
+);
+"""
+
+class SQLiteUsers(MutableMapping):
+    def __init__(self, storage: 'SQLiteStorage'):
+        """
+        Initialize a dictionary of users that loads each user from SQLite on first access.
+
+        Assigning or deleting entries only changes the in-memory view; the storage
+        methods write the changes to the database.
+
+        :param storage: The storage to load users from.
+        """
+        self._storage = storage
+        self._users: Dict[str, User] = {}
+
+    def __getitem__(self, username: str) -> User:
+        user = self._users.get(username)
+        if user is None:
+            user = self._storage.load_user(username)
+            if user is None:
+                raise KeyError(username)
+            self._users[username] = user
+        return user
+
+    def __setitem__(self, username: str, user: User) -> None:
+        self._users[username] = user
+
+    def __delitem__(self, username: str) -> None:
+        self._users.pop(username, None)
+
+    def __contains__(self, username: object) -> bool:
+        return username in self._users or self._storage.user_id(username) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        usernames = [row[0] for row in self._storage.connection.execute("SELECT username FROM users ORDER BY id")]
+        return iter(usernames + [username for username in self._users if username not in usernames])
+
+    def __len__(self) -> int:
+        return len(list(iter(self)))
+
+    def is_loaded(self, username: str) -> bool:
+        return username in self._users
+
+    def evict(self, username: str) -> bool:
+        # Every change is already in the database, so the user is loaded from it again on next access
+        return self._users.pop(username, None) is not None
+
+class SQLiteStorage(Storage):
+    def __init__(self, file_path: str, timeout: float = 30.0):
+        """
+        Initialize storage in a SQLite database.
+
+        Completions live in their own table indexed on ``(habit_id, completed_at)``
+        (microseconds since the epoch), so per-habit streak and period queries are
+        index range scans. Every mutation is its own transaction, so concurrent CLI
+        invocations do not overwrite each other. Mutations naming a user or habit
+        that is not in the database raise ValueError.
+
+        :param file_path: The path to the database file.
+        :param timeout: Seconds to wait for a lock held by another process.
+        """
+        self.file_path = file_path
+        self.connection = sqlite3.connect(file_path, timeout=timeout)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(SCHEMA)
+        self._users: Optional[SQLiteUsers] = None
+
+    def load_users(self) -> MutableMapping:
+        if self._users is None:
+            self._users = SQLiteUsers(self)
+        return self._users
+
+    def _peek_user(self, username: str) -> User:
+        users = self.load_users()
+        if users.is_loaded(username):
+            return users[username]
+        return self.load_user(username)
+
+    def is_loaded(self, username: str) -> bool:
+        return self.load_users().is_loaded(username)
+
+    def release_users(self, usernames: Iterable[str]) -> Set[str]:
+        users = self.load_users()
+        return {username for username in usernames if users.evict(username)}
+
+    def user_id(self, username: str) -> Optional[int]:
+        row = self.connection.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+        return row[0] if row else None
+
+    def _habit_id(self, username: str, habit_name: str) -> Optional[int]:
+        row = self.connection.execute(
+            "SELECT habits.id FROM habits JOIN users ON users.id = habits.user_id "
+            "WHERE users.username = ? AND habits.name = ?", (username, habit_name)).fetchone()
+        return row[0] if row else None
+
+    def _require_user_id(self, username: str) -> int:
+        user_id = self.user_id(username)
+        if user_id is None:
+            raise ValueError(f"User '{username}' not found.")
+        return user_id
+
+    def _require_habit_id(self, username: str, habit_name: str) -> int:
+        habit_id = self._habit_id(username, habit_name)
+        if habit_id is None:
+            self._require_user_id(username)
+            raise ValueError(f"Habit with name '{habit_name}' not found.")
+        return habit_id
+
+    def find_habit(self, habit_name: str) -> Optional[Habit]:
+        row = self.connection.execute(
+            "SELECT users.username FROM habits JOIN users ON users.id = habits.user_id "
+            "WHERE habits.name = ? ORDER BY users.id LIMIT 1", (habit_name,)).fetchone()
+        if row is None:
+            return None
+        return self._peek_user(row[0]).get_habit_by_name(habit_name)
+
+    def load_user(self, username: str, compact: bool = False) -> Optional[User]:
+        """
+        Load a user and its habits from the database.
+
+        :param username: The username of the user.
+        :param compact: Whether to store completion dates in CompletionLogs.
+        :return: A User object, or None if there is no such user.
+        """
+        row = self.connection.execute("SELECT id, email FROM users WHERE username = ?", (username,)).fetchone()
+        if row is None:
+            return None
+        user_id, email = row
+        user = User(username=username, email=email)
+        for habit_id, name, frequency, creation_date, reminded_at in self.connection.execute(
+                "SELECT id, name, frequency, creation_date, reminded_at FROM habits "
+                "LEFT JOIN reminders ON reminders.habit_id = habits.id WHERE user_id = ? ORDER BY id", (user_id,)):
+            habit = Habit(name=name, frequency=frequency, compact=compact)
+            habit.creation_date = from_timestamp(creation_date)
+            if reminded_at is not None:
+                habit.last_reminded = from_timestamp(reminded_at)
+            timestamps = [completed_at for (completed_at,) in self.connection.execute(
+                "SELECT completed_at FROM completions WHERE habit_id = ? ORDER BY completed_at", (habit_id,))]
+            if compact:
+                habit.completion_dates = CompletionLog.from_timestamps(timestamps)
+            else:
+                habit.completion_dates = [from_timestamp(timestamp) for timestamp in timestamps]
+            user.add_habit(habit)
+        return user
+
+    def _insert_habit(self, user_id: int, habit: Habit) -> None:
+        cursor = self.connection.execute(
+            "INSERT INTO habits (user_id, name, frequency, creation_date) VALUES (?, ?, ?, ?)",
+            (user_id, habit.name, habit.frequency, to_timestamp(habit.creation_date)))
+        self.connection.executemany(
+            "INSERT INTO completions (habit_id, completed_at) VALUES (?, ?)",
+            ((cursor.lastrowid, to_timestamp(date)) for date in habit.completion_dates))
+        if habit.last_reminded is not None:
+            self.connection.execute("INSERT INTO reminders (habit_id, reminded_at) VALUES (?, ?)",
+                                    (cursor.lastrowid, to_timestamp(habit.last_reminded)))
+
+    def _insert_user(self, user: User) -> None:
+        cursor = self.connection.execute("INSERT INTO users (username, email) VALUES (?, ?)",
+                                         (user.username, user.email))
+        for habit in user.get_habits():
+            self._insert_habit(cursor.lastrowid, habit)
+
+    def create_user(self, user: User) -> None:
+        with self.connection:
+            self._insert_user(user)
+
+    def remove_user(self, username: str) -> None:
+        with self.connection:
+            self.connection.execute("DELETE FROM users WHERE id = ?", (self._require_user_id(username),))
+
+    def add_habit(self, username: str, habit: Habit) -> None:
+        with self.connection:
+            self._insert_habit(self._require_user_id(username), habit)
+
+    def remove_habit(self, username: str, habit_name: str) -> None:
+        with self.connection:
+            self.connection.execute("DELETE FROM habits WHERE id = ?", (self._require_habit_id(username, habit_name),))
+
+    def set_frequency(self, username: str, habit_name: str, frequency: str) -> None:
+        with self.connection:
+            self.connection.execute("UPDATE habits SET frequency = ? WHERE id = ?",
+                                    (frequency, self._require_habit_id(username, habit_name)))
+
+    def complete(self, username: str, habit_name: str, completed_at: datetime) -> None:
+        with self.connection:
+            self.connection.execute("INSERT INTO completions (habit_id, completed_at) VALUES (?, ?)",
+                                    (self._require_habit_id(username, habit_name), to_timestamp(completed_at)))
+
+    def merge_completions(self, merges: Dict[Tuple[str, str], List[datetime]]) -> None:
+        with self.connection:
+            for (username, habit_name), dates in merges.items():
+                habit_id = self._require_habit_id(username, habit_name)
+                self.connection.executemany("INSERT INTO completions (habit_id, completed_at) VALUES (?, ?)",
+                                            ((habit_id, to_timestamp(date)) for date in dates))
+
+    def record_reminders(self, reminders: Dict[Tuple[str, str], datetime]) -> None:
+        with self.connection:
+            for (username, habit_name), reminded_at in reminders.items():
+                # Kept only if later, so concurrent senders can't move a reminder time back
+                self.connection.execute(
+                    "INSERT INTO reminders (habit_id, reminded_at) VALUES (?, ?) ON CONFLICT (habit_id) "
+                    "DO UPDATE SET reminded_at = MAX(reminded_at, excluded.reminded_at)",
+                    (self._require_habit_id(username, habit_name), to_timestamp(reminded_at)))
+
+    def completions(self, username: str, habit_name: str,
+                    start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[datetime]:
+        habit_id = self._require_habit_id(username, habit_name)
+        low = to_timestamp(start) if start is not None else -2 ** 63
+        high = to_timestamp(end) if end is not None else 2 ** 63 - 1
+        rows = self.connection.execute(
+            "SELECT completed_at FROM completions WHERE habit_id = ? AND completed_at >= ? AND completed_at < ? "
+            "ORDER BY completed_at", (habit_id, low, high))
+        return [from_timestamp(completed_at) for (completed_at,) in rows]
+
+    def import_users(self, users: Dict[str, User]) -> None:
+        """
+        Insert users with all their habits and completions in a single transaction.
+
+        :param users: A dictionary of users.
+        """
+        with self.connection:
+            for username in users:
+                self._insert_user(users[username])
+
+    def close(self) -> None:
+        self.connection.close()
+
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+BINARY_EXTENSIONS = ('.bin',)
+
+def open_storage(file_path: str) -> Storage:
+    """
+    Open the storage backend for a data file, chosen by its extension.
+
+    :param file_path: The path to a users JSON file, a binary snapshot or a SQLite database.
+    :return: The storage backend.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in SQLITE_EXTENSIONS:
+        return SQLiteStorage(file_path)
+    if extension in BINARY_EXTENSIONS:
+        return BinaryStorage(file_path)
+    return JSONStorage(file_path)
@@ -0,0 +1,203 @@
+import json
+import os
+from collections.abc import MutableMapping
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+from src.user import User
+from src.locking import atomic_write
+
+class LazyUserStore(MutableMapping):
+    def __init__(self, file_path: str):
+        """
+        Initialize a dictionary of users backed by a users JSON file.
+
+        Only the byte-offset index is loaded up front; a user (and its habits) is
+        parsed from its span in the file the first time it is accessed.
+
+        :param file_path: The path to the users JSON file.
+        """
+        self.file_path = file_path
+        self._spans: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._users: Dict[str, User] = {}
+        # Users are read through the file the index was built from, even if another process replaces it
+        self._file: Optional[BinaryIO] = None
+        try:
+            self._file = open(file_path, 'rb')
+            self._spans = dict(self._load_index())
+        except FileNotFoundError:
+            pass
+
+    def _load_index(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Load the byte-offset index, rebuilding it if it is missing or stale.
+
+        :return: A dictionary mapping usernames to the byte spans of their data.
+        """
+        stat = os.fstat(self._file.fileno())
+        try:
+            with open(f"{self.file_path}.idx", 'r') as f:
+                index = json.load(f)
+            if index['size'] == stat.st_size and index['mtime_ns'] == stat.st_mtime_ns:
+                return {username: tuple(span) for username, span in index['offsets'].items()}
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        self._file.seek(0)
+        offsets = self.parse_offsets(self._file.read(), self.file_path)
+        try:
+            with atomic_write(f"{self.file_path}.idx") as f:
+                json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'offsets': offsets}, f)
+        except OSError:
+            pass
+        return offsets
+
+    @staticmethod
+    def scan_offsets(file_path: str) -> Dict[str, Tuple[int, int]]:
+        """
+        Build the byte-offset index of a users JSON file by scanning it once.
+
+        The values are tokenized but no User or Habit objects are created.
+
+        :param file_path: The path to the users JSON file.
+        :return: A dictionary mapping usernames to the byte spans of their data.
+        """
+        with open(file_path, 'rb') as f:
+            return LazyUserStore.parse_offsets(f.read(), file_path)
+
+    @staticmethod
+    def parse_offsets(raw: bytes, file_path: str = '<bytes>') -> Dict[str, Tuple[int, int]]:
+        """
+        Build the byte-offset index of the contents of a users JSON file.
+
+        :param raw: The contents of the file.
+        :param file_path: The path to name in errors.
+        :return: A dictionary mapping usernames to the byte spans of their data.
+        """
+        text = raw.decode('utf-8')
+        ascii_only = len(raw) == len(text)
+        decoder = json.JSONDecoder()
+        whitespace = ' \t\n\r'
+
+        def skip(pos: int) -> int:
+            while pos < len(text) and text[pos] in whitespace:
+                pos += 1
+            return pos
+
+        def to_bytes(pos: int) -> int:
+            return pos if ascii_only else len(text[:pos].encode('utf-8'))
+
+        offsets = {}
+        pos = skip(0)
+        if text[pos] != '{':
+            raise ValueError(f"'{file_path}' does not contain a JSON object.")
+        pos = skip(pos + 1)
+        while text[pos] != '}':
+            username, pos = decoder.raw_decode(text, pos)
+            pos = skip(pos)
+            pos = skip(pos + 1)  # ':'
+            _, end = decoder.raw_decode(text, pos)
+            offsets[username] = (to_bytes(pos), to_bytes(end))
+            pos = skip(end)
+            if text[pos] == ',':
+                pos = skip(pos + 1)
+        return offsets
+
+    def _read_raw(self, username: str) -> bytes:
+        start, end = self._spans[username]
+        self._file.seek(start)
+        return self._file.read(end - start)
+
+    def __getitem__(self, username: str) -> User:
+        user = self._users.get(username)
+        if user is None:
+            if self._spans.get(username) is None:
+                raise KeyError(username)
+            user = User.from_dict(json.loads(self._read_raw(username)))
+            self._users[username] = user
+        return user
+
+    def __setitem__(self, username: str, user: User) -> None:
+        if username not in self._spans:
+            self._spans[username] = None
+        self._users[username] = user
+
+    def __delitem__(self, username: str) -> None:
+        del self._spans[username]
+        self._users.pop(username, None)
+
+    def __contains__(self, username: object) -> bool:
+        return username in self._spans
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._spans)
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def peek(self, username: str) -> User:
+        """
+        Get a user without keeping it in memory if it was not loaded yet.
+
+        :param username: The username of the user.
+        :return: The User object.
+        """
+        user = self._users.get(username)
+        if user is not None:
+            return user
+        if self._spans.get(username) is None:
+            raise KeyError(username)
+        return User.from_dict(json.loads(self._read_raw(username)))
+
+    def evict(self, username: str) -> bool:
+        """
+        Drop a parsed user from memory; it is parsed from the file again on next access.
+
+        Only call this for users whose changes the file already holds.
+
+        :param username: The username of the user.
+        :return: True if the user was held in memory and is in the file.
+        """
+        if username not in self._users or self._spans.get(username) is None:
+            return False
+        del self._users[username]
+        return True
+
+    def is_loaded(self, username: str) -> bool:
+        """
+        Check whether a user has already been parsed.
+
+        :param username: The username to check.
+        :return: True if the user is held in memory.
+        """
+        return username in self._users
+
+    def save(self, file_path: Optional[str] = None) -> None:
+        """
+        Save all users to a JSON file.
+
+        Users that were never accessed are copied byte-for-byte from the current
+        file instead of being parsed and re-serialized. The file is written to a
+        temporary path and renamed into place.
+
+        :param file_path: The path to save to (defaults to the backing file).
+        """
+        file_path = file_path or self.file_path
+
+        def entries():
+            for username in self._spans:
+                if username in self._users:
+                    yield username, User.encode_user(self._users[username])
+                else:
+                    yield username, self._read_raw(username)
+
+        offsets = User.write_snapshot(file_path, entries(), index=file_path == self.file_path)
+        if file_path == self.file_path:
+            self.close()
+            self._file = open(file_path, 'rb')
+            self._spans = dict(offsets)
+
+    def close(self) -> None:
+        """
+        Close the backing file. Users that were not loaded can no longer be read.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
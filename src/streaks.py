@@ -0,0 +1,170 @@
+import re
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# date(1970, 1, 1).toordinal(): converts days since the epoch to proleptic Gregorian ordinals
+EPOCH_ORDINAL = 719163
+
+EVERY_N_DAYS = re.compile(r'every (\d+) days?')
+
+class Streaks(NamedTuple):
+    """
+    The streaks in a habit's history.
+    """
+    longest: int
+    # The streak that ends in the period of the last completion
+    current: int
+
+class FrequencyRule:
+    def __init__(self, name: str, bucket: Callable[[datetime], int],
+                 bucket_array: Optional[Callable[['np.ndarray'], 'np.ndarray']] = None,
+                 start: Optional[Callable[[int], datetime]] = None):
+        """
+        Initialize a frequency from a function numbering the periods a habit is tracked in.
+
+        Completions in the same period count once, and a streak is a run of
+        completions in consecutive periods. Periods must be numbered so that
+        consecutive periods get consecutive integers.
+
+        :param name: The name of the frequency, as stored on habits.
+        :param bucket: Maps a completion time to the number of its period.
+        :param bucket_array: The same mapping for a datetime64 array (defaults to calling ``bucket`` per element).
+        :param start: Maps a period number to the time the period starts, if known.
+        """
+        self.name = name
+        self.bucket = bucket
+        self._bucket_array = bucket_array
+        self._start = start
+
+    def periods(self, dates: Iterable[datetime]) -> List[int]:
+        """
+        Return the distinct periods that dates fall in, in ascending order.
+
+        :param dates: The dates, in any order.
+        """
+        return sorted(set(map(self.bucket, dates)))
+
+    def bucket_array(self, dates: 'np.ndarray') -> 'np.ndarray':
+        """
+        Number the periods of a datetime64 array.
+
+        :param dates: The dates, as datetime64.
+        :return: An int64 array of period numbers.
+        """
+        if self._bucket_array is not None:
+            return self._bucket_array(dates)
+        # Only the array analytics need numpy; importing it here keeps it off the CLI's startup path
+        import numpy as np
+        values = dates.astype('datetime64[us]').tolist()
+        return np.fromiter((self.bucket(value) for value in values), dtype=np.int64, count=len(values))
+
+    def start(self, period: int) -> datetime:
+        """
+        Return the time a period starts.
+
+        :param period: The number of the period.
+        """
+        if self._start is None:
+            raise ValueError(f"Frequency '{self.name}' does not define when its periods start.")
+        return self._start(period)
+
+    def streaks(self, dates: Iterable[datetime]) -> Streaks:
+        """
+        Calculate the longest and current streak of completion dates.
+
+        :param dates: The completion dates, in any order.
+        """
+        return count_streaks(self.periods(dates))
+
+def count_streaks(periods: Sequence[int]) -> Streaks:
+    """
+    Calculate the longest and current run of consecutive periods in one pass.
+
+    :param periods: Distinct period numbers in ascending order.
+    """
+    longest = current = 0
+    previous = None
+    for period in periods:
+        current = current + 1 if previous is not None and period == previous + 1 else 1
+        longest = max(longest, current)
+        previous = period
+    return Streaks(longest, current)
+
+def _days(dates: 'np.ndarray') -> 'np.ndarray':
+    return dates.astype('datetime64[D]').astype('int64') + EPOCH_ORDINAL
+
+def _weekday_number(ordinal: int) -> int:
+    # Weekend days share the number of the Friday before, so they neither break nor extend a streak
+    week, day = divmod(ordinal - 1, 7)
+    return week * 5 + min(day, 4)
+
+def _weekday_numbers(dates: 'np.ndarray') -> 'np.ndarray':
+    week, day = divmod(_days(dates) - 1, 7)
+    return week * 5 + day.clip(None, 4)
+
+def _weekday_start(period: int) -> datetime:
+    week, day = divmod(period, 5)
+    return datetime.fromordinal(week * 7 + day + 1)
+
+def every_n_days(n: int) -> FrequencyRule:
+    """
+    Create a frequency with periods of ``n`` days.
+
+    :param n: The number of days per period.
+    """
+    if n < 1:
+        raise ValueError("A period must be at least one day long.")
+    return FrequencyRule(f"every {n} days", lambda date: date.toordinal() // n,
+                         lambda dates: _days(dates) // n, lambda period: datetime.fromordinal(max(period * n, 1)))
+
+FREQUENCIES: Dict[str, FrequencyRule] = {}
+
+def register_frequency(rule: FrequencyRule) -> FrequencyRule:
+    """
+    Make a frequency available to habits by its name, replacing any rule of the same name.
+
+    :param rule: The frequency rule.
+    :return: The rule.
+    """
+    FREQUENCIES[rule.name] = rule
+    return rule
+
+def get_rule(frequency: str) -> FrequencyRule:
+    """
+    Return the rule for a frequency.
+
+    Names of the form 'every N days' are compiled and registered on first use.
+
+    :param frequency: The name of the frequency.
+    """
+    rule = FREQUENCIES.get(frequency)
+    if rule is None:
+        match = EVERY_N_DAYS.fullmatch(frequency) if isinstance(frequency, str) else None
+        if match is None or int(match.group(1)) < 1:
+            raise ValueError(f"Unsupported frequency '{frequency}'. Use one of: {', '.join(FREQUENCIES)}, "
+                             f"or 'every N days'.")
+        rule = register_frequency(every_n_days(int(match.group(1))))
+        FREQUENCIES[frequency] = rule
+    return rule
+
+def calculate_streaks(dates: Iterable[datetime], frequency: str) -> Streaks:
+    """
+    Calculate the longest and current streak of completion dates.
+
+    :param dates: The completion dates, in any order.
+    :param frequency: The name of the habit's frequency.
+    """
+    return get_rule(frequency).streaks(dates)
+
+register_frequency(FrequencyRule('daily', datetime.toordinal, _days, datetime.fromordinal))
+register_frequency(FrequencyRule('weekly', lambda date: (date.toordinal() - 1) // 7,
+                                 lambda dates: (_days(dates) - 1) // 7,
+                                 lambda period: datetime.fromordinal(period * 7 + 1)))
+register_frequency(FrequencyRule('monthly', lambda date: date.year * 12 + date.month - 1,
+                                 lambda dates: dates.astype('datetime64[M]').astype('int64') + 1970 * 12,
+                                 lambda period: datetime(period // 12, period % 12 + 1, 1)))
+register_frequency(FrequencyRule('weekdays', lambda date: _weekday_number(date.toordinal()),
+                                 _weekday_numbers, _weekday_start))
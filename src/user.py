@@ -1,6 +1,45 @@
 import json
+import os
 from .habit import Habit  # Adjust the import path as necessary
-from typing import List, Dict
+from .locking import atomic_write, file_version, lock_for
+from collections.abc import Sequence
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+class HabitList(Sequence):
+    """
+    A read-only view of a user's habits, in the order they were added.
+
+    Habits are added and removed through ``User.add_habit`` and
+    ``User.remove_habit``; the view reflects those changes without copying
+    the user's habits. Indexing walks the habits, so iterate rather than
+    index in loops.
+    """
+    __slots__ = ('_habits',)
+
+    def __init__(self, habits: Dict[str, Habit]):
+        self._habits = habits
+
+    def __len__(self) -> int:
+        return len(self._habits)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Habit, List[Habit]]:
+        return list(self._habits.values())[index]
+
+    def __iter__(self) -> Iterator[Habit]:
+        return iter(self._habits.values())
+
+    def __contains__(self, habit: object) -> bool:
+        return isinstance(habit, Habit) and self._habits.get(habit.name) is habit
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, HabitList):
+            other = list(other)
+        return list(self) == other
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return repr(list(self))
 
 class User:
     def __init__(self, username: str, email: str):
@@ -12,15 +51,42 @@ class User:
         """
         self.username = username
         self.email = email
-        self.habits: List[Habit] = []
+        # Habits keyed by name, in the order they were added
+        self._habits: Dict[str, Habit] = {}
+        # The users JSON file (absolute path and version) the user was last loaded from or saved to
+        self._source: Optional[Tuple[str, tuple]] = None
+
+    @property
+    def habits(self) -> HabitList:
+        """
+        The user's habits, in the order they were added.
+
+        :return: A read-only view of the habits; use ``add_habit`` and ``remove_habit`` to change them.
+        """
+        return HabitList(self._habits)
+
+    @habits.setter
+    def habits(self, habits: List[Habit]) -> None:
+        """
+        Replace the user's habits.
+
+        :param habits: The new list of habits.
+        :raises ValueError: If two habits share the same name.
+        """
+        self._habits = {}
+        for habit in habits:
+            self.add_habit(habit)
 
     def add_habit(self, habit: Habit) -> None:
         """
         Add a habit to the user's list of habits.
 
         :param habit: The habit to add.
+        :raises ValueError: If the user already has a habit with the same name.
         """
-        self.habits.append(habit)
+        if habit.name in self._habits:
+            raise ValueError(f"Habit with name '{habit.name}' already exists.")
+        self._habits[habit.name] = habit
 
     def remove_habit(self, habit: Habit) -> None:
         """
@@ -28,16 +94,25 @@ class User:
 
         :param habit: The habit to remove.
         """
-        if habit in self.habits:
-            self.habits.remove(habit)
+        if self._habits.get(habit.name) is habit:
+            del self._habits[habit.name]
         else:
             print(f"Habit '{habit.name}' not found in user's habits.")
 
-    def get_habits(self) -> List[Habit]:
+    def has_habit(self, name: str) -> bool:
+        """
+        Check whether the user has a habit with the given name.
+
+        :param name: The name of the habit.
+        :return: True if the habit exists.
+        """
+        return name in self._habits
+
+    def get_habits(self) -> HabitList:
         """
         Get the list of habits for the user.
 
-        :return: A list of habits.
+        :return: A read-only view of the habits.
         """
         return self.habits
 
@@ -48,10 +123,10 @@ class User:
         :param name: The name of the habit.
         :return: The habit with the specified name.
         """
-        for habit in self.habits:
-            if habit.name == name:
-                return habit
-        raise ValueError(f"Habit with name '{name}' not found.")
+        habit = self._habits.get(name)
+        if habit is None:
+            raise ValueError(f"Habit with name '{name}' not found.")
+        return habit
 
     def save_to_json(self, file_path: str) -> None:
         """
@@ -64,7 +139,7 @@ class User:
             'email': self.email,
             'habits': [habit.to_dict() for habit in self.habits]
         }
-        with open(file_path, 'w') as f:
+        with atomic_write(file_path) as f:
             json.dump(data, f, indent=4)
 
     @classmethod
@@ -86,24 +161,115 @@ class User:
         """
         Save all users' data to a JSON file.
 
+        Writers in other processes are locked out while the file is written, and
+        the file is replaced atomically (see ``write_snapshot``). No byte-offset
+        index is written; ``LazyUserStore`` builds one when it first opens the file.
+
+        If users were loaded from this file and another writer has saved it since,
+        completions it recorded for the same habits are merged into ``users``
+        first, so they are not lost. Any other change (users, habits, frequencies)
+        is last-writer-wins; processes that change the same data concurrently
+        should go through ``storage.JSONStorage``, whose journal merges them.
+
         :param users: A dictionary of users.
         :param file_path: The path to the JSON file.
         """
-        data = {username: user.to_dict() for username, user in users.items()}
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+        path = os.path.abspath(file_path)
+        with lock_for(file_path):
+            version = file_version(file_path)
+            if version is not None and any(user._source is not None and user._source[0] == path
+                                           and user._source[1] != version for user in users.values()):
+                User.merge_completions_from_json(users, file_path)
+            User.write_snapshot(file_path, ((username, User.encode_user(user)) for username, user in users.items()),
+                                index=False)
+            source = (path, file_version(file_path))
+        for user in users.values():
+            user._source = source
+
+    @staticmethod
+    def merge_completions_from_json(users: Dict[str, 'User'], file_path: str) -> None:
+        """
+        Merge the completions saved in a JSON file into the matching habits of users.
+
+        Users and habits missing on either side are left as they are.
+
+        :param users: A dictionary of users.
+        :param file_path: The path to the JSON file.
+        """
+        saved = User.load_all_from_json(file_path)
+        for username, user in users.items():
+            saved_user = saved.get(username)
+            if saved_user is None:
+                continue
+            for habit in user.get_habits():
+                if saved_user.has_habit(habit.name):
+                    habit.merge_completions(saved_user.get_habit_by_name(habit.name).completion_dates)
+
+    @staticmethod
+    def encode_user(user: 'User') -> bytes:
+        """
+        Serialize a user the way it appears as a value inside a users JSON file.
+
+        :param user: The user to serialize.
+        :return: The indented JSON encoding of the user.
+        """
+        return json.dumps(user.to_dict(), indent=4).replace('\n', '\n    ').encode('utf-8')
+
+    @staticmethod
+    def write_snapshot(file_path: str, entries: Iterable[Tuple[str, bytes]],
+                       index: bool = True) -> Dict[str, Tuple[int, int]]:
+        """
+        Write encoded users to a JSON file, along with a byte-offset index for the live snapshot.
+
+        The file has the same layout as ``json.dump(data, f, indent=4)``. The index
+        is written to ``<file_path>.idx`` and maps each username to the byte span of
+        its value, so a single user can be read without parsing the whole file.
+        Other copies, such as exports, are written without one.
+
+        Both files are written to temporary files, fsynced and renamed into place,
+        so a crash never leaves a truncated snapshot. The index records the size
+        and modification time of the snapshot it describes and is ignored if the
+        snapshot is replaced by another writer.
+
+        :param file_path: The path to the JSON file.
+        :param entries: Pairs of username and encoded user (see ``encode_user``).
+        :param index: Whether to write ``<file_path>.idx``.
+        :return: The byte-offset index.
+        """
+        offsets = {}
+        with atomic_write(file_path, 'wb') as f:
+            f.write(b'{')
+            for username, encoded in entries:
+                f.write(b'\n' if not offsets else b',\n')
+                f.write(b'    ' + json.dumps(username).encode('utf-8') + b': ')
+                start = f.tell()
+                f.write(encoded)
+                offsets[username] = (start, f.tell())
+            f.write(b'\n}' if offsets else b'}')
+            f.flush()
+            # Renaming keeps the size and modification time
+            stat = os.fstat(f.fileno())
+        if not index:
+            return offsets
+        with atomic_write(f"{file_path}.idx") as f:
+            json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'offsets': offsets}, f)
+        return offsets
 
     @staticmethod
-    def load_all_from_json(file_path: str) -> Dict[str, 'User']:
+    def load_all_from_json(file_path: str, compact: bool = False) -> Dict[str, 'User']:
         """
         Load all users' data from a JSON file.
 
         :param file_path: The path to the JSON file.
+        :param compact: Whether to store completion dates in CompletionLogs.
         :return: A dictionary of User objects.
         """
         with open(file_path, 'r') as f:
             data = json.load(f)
-        users = {username: User.from_dict(user_data) for username, user_data in data.items()}
+            source = (os.path.abspath(file_path), file_version(file_path, os.fstat(f.fileno())))
+        users = {username: User.from_dict(user_data, compact=compact) for username, user_data in data.items()}
+        for user in users.values():
+            user._source = source
         return users
 
     def to_dict(self) -> Dict:
@@ -119,13 +285,27 @@ class User:
         }
 
     @classmethod
-    def from_dict(cls, data: Dict) -> 'User':
+    def from_dict(cls, data: Dict, compact: bool = False) -> 'User':
         """
         Create a User object from a dictionary.
 
+        Files written before habit names were unique can hold several habits
+        of the same name. Commands only ever found the first, so the others'
+        completions are merged into it.
+
         :param data: A dictionary representation of a user.
+        :param compact: Whether to store completion dates in CompletionLogs.
         :return: A User object.
         """
         user = cls(username=data['username'], email=data['email'])
-        user.habits = [Habit.from_dict(habit_data) for habit_data in data['habits']]
+        for habit_data in data['habits']:
+            habit = Habit.from_dict(habit_data, compact=compact)
+            first = user._habits.get(habit.name)
+            if first is None:
+                user.add_habit(habit)
+                continue
+            first.merge_completions(habit.completion_dates)
+            if habit.last_reminded is not None and (first.last_reminded is None
+                                                   or habit.last_reminded > first.last_reminded):
+                first.last_reminded = habit.last_reminded
         return user
\ No newline at end of file
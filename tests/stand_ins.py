@@ -0,0 +1,149 @@
+"""
+Local stand-in servers for testing reminder delivery without the network.
+"""
+import json
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode('ascii'))
+
+    def handle(self) -> None:
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        sent_on_connection = 0
+        self.reply("220 localhost stand-in SMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.wfile.write(b"250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250 OK\r\n")
+            elif verb == 'AUTH':
+                with server.lock:
+                    server.logins += 1
+                self.reply("235 Authentication successful")
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply("250 OK")
+            elif verb == 'RCPT':
+                address = command.split(':', 1)[1].strip('<> ')
+                if 'reject' in address:
+                    self.reply("550 No such user")
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif verb == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if data_line in (b".\r\n", b""):
+                        break
+                    lines.append(data_line.decode('utf-8'))
+                with server.lock:
+                    server.messages.append({'recipients': recipients, 'data': ''.join(lines)})
+                self.reply("250 OK")
+                sent_on_connection += 1
+                if server.drop_after and sent_on_connection >= server.drop_after:
+                    return
+            elif verb in ('RSET', 'NOOP'):
+                self.reply("250 OK")
+            elif verb == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    A minimal plain-text SMTP server on localhost that records what it receives.
+
+    :param drop_after: Close each connection after this many messages (0 = never).
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    # Accept as many pending connections as benchmarks open concurrently
+    request_queue_size = 128
+
+    def __init__(self, drop_after: int = 0):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.logins = 0
+        self.messages = []
+        self.drop_after = drop_after
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def __enter__(self) -> 'LocalSMTPServer':
+        threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        self.server_close()
+
+class _PushHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with server.lock:
+            server.requests.append({'path': self.path, 'headers': dict(self.headers), 'json': json.loads(body)})
+            server.clients.add(self.client_address)
+            fail = server.failures_left > 0
+            if fail:
+                server.failures_left -= 1
+        if server.delay:
+            time.sleep(server.delay)
+        status = 503 if fail else 200
+        payload = json.dumps({'success': 0 if fail else 1}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+class LocalPushServer(ThreadingHTTPServer):
+    """
+    A local HTTP/1.1 stand-in for the FCM endpoint that records what it receives.
+
+    :param delay: Seconds to wait before answering each request.
+    :param failures: The number of initial requests to answer with 503.
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, delay: float = 0.0, failures: int = 0):
+        super().__init__(('127.0.0.1', 0), _PushHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.clients = set()
+        self.delay = delay
+        self.failures_left = failures
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/fcm/send"
+
+    def __enter__(self) -> 'LocalPushServer':
+        threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        self.server_close()
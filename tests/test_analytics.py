@@ -1,5 +1,7 @@
+import os
+import tempfile
 import unittest
-from datetime import datetime
+from datetime import datetime, timedelta
 from src.habit import Habit
 from src.user import User
 from src.analytics import (
@@ -8,8 +10,21 @@ from src.analytics import (
     get_longest_streak,
     get_longest_streak_all,
     get_user_longest_streak,
-    get_user_longest_streak_all
+    get_user_longest_streak_all,
+    calculate_streak,
+    period_start,
+    count_completions,
+    get_completions_between,
+    get_histogram,
+    get_period_histogram,
+    get_completion_rate,
+    get_current_streak,
+    get_cache_info,
+    reset_cache_info,
+    get_leaderboard
 )
+from src.storage import JSONStorage
+from src.completions import CompletionLog
 
 # Predefined habit data for testing
 daily_habit_full_streak = [
@@ -97,5 +112,171 @@ class TestAnalytics(unittest.TestCase):
         longest_streak_habit = get_user_longest_streak_all(self.user)
         self.assertEqual(longest_streak_habit, "Exercise")
 
+    def test_calculate_streak_compact(self):
+        self.assertEqual(calculate_streak(CompletionLog(daily_habit_full_streak), "daily"), 28)
+        self.assertEqual(calculate_streak(CompletionLog(), "daily"), 0)
+
+class TestRangeQueries(unittest.TestCase):
+
+    def setUp(self):
+        self.habit = Habit("Exercise", "daily")
+        self.habit.creation_date = datetime(2023, 1, 1)
+        # Out of order, with a gap on the 4th and two completions on the 5th
+        self.habit.completion_dates = [datetime(2023, 1, 5, 20), datetime(2023, 1, 1), datetime(2023, 1, 2),
+                                       datetime(2023, 1, 3), datetime(2023, 1, 5, 8), datetime(2023, 1, 9)]
+
+    def test_period_start(self):
+        date = datetime(2023, 3, 15, 13, 30)  # A Wednesday
+        self.assertEqual(period_start(date, 'day'), datetime(2023, 3, 15))
+        self.assertEqual(period_start(date, 'week'), datetime(2023, 3, 13))
+        self.assertEqual(period_start(date, 'month'), datetime(2023, 3, 1))
+        with self.assertRaises(ValueError):
+            period_start(date, 'year')
+
+    def test_completions_between(self):
+        self.assertEqual(count_completions(self.habit, datetime(2023, 1, 2), datetime(2023, 1, 5, 20)), 3)
+        self.assertEqual(get_completions_between(self.habit, datetime(2023, 1, 5)),
+                         [datetime(2023, 1, 5, 8), datetime(2023, 1, 5, 20), datetime(2023, 1, 9)])
+        self.assertEqual(get_completions_between(self.habit, datetime(2023, 2, 1), datetime(2023, 1, 1)), [])
+
+    def test_completions_between_compact(self):
+        habit = Habit("Exercise", "daily", compact=True)
+        habit.completion_dates = self.habit.completion_dates
+        self.assertEqual(count_completions(habit, datetime(2023, 1, 5)), 3)
+        self.assertEqual(get_completions_between(habit, end=datetime(2023, 1, 2)), [datetime(2023, 1, 1)])
+
+    def test_sees_new_completions(self):
+        count_completions(self.habit)
+        self.habit.add_completion(datetime(2023, 1, 4))
+        self.assertEqual(count_completions(self.habit, datetime(2023, 1, 4), datetime(2023, 1, 5)), 1)
+
+    def test_get_histogram(self):
+        histogram = get_histogram(self.habit, datetime(2023, 1, 1), datetime(2023, 1, 6))
+        self.assertEqual([count for _, count in histogram], [1, 1, 1, 0, 2])
+        self.assertEqual(histogram[0][0], datetime(2023, 1, 1))
+        weekly = get_histogram(self.habit, datetime(2023, 1, 1), datetime(2023, 1, 15), 'week')
+        self.assertEqual(weekly, [(datetime(2022, 12, 26), 1), (datetime(2023, 1, 2), 4), (datetime(2023, 1, 9), 1)])
+
+    def test_get_period_histogram(self):
+        histogram = get_period_histogram(self.habit, datetime(2023, 1, 3), datetime(2023, 1, 6))
+        self.assertEqual(histogram, [(datetime(2023, 1, 3), 1), (datetime(2023, 1, 4), 0), (datetime(2023, 1, 5), 2)])
+        self.habit.frequency = "weekly"
+        self.assertEqual(get_period_histogram(self.habit, datetime(2023, 1, 1), datetime(2023, 1, 15)),
+                         [(datetime(2022, 12, 26), 1), (datetime(2023, 1, 2), 4), (datetime(2023, 1, 9), 1)])
+        self.assertEqual(get_period_histogram(self.habit, datetime(2023, 1, 10), datetime(2023, 1, 10)), [])
+
+    def test_get_completion_rate(self):
+        self.assertEqual(get_completion_rate(self.habit, datetime(2023, 1, 1), datetime(2023, 1, 6)), 0.8)
+        self.assertEqual(get_completion_rate(self.habit, datetime(2023, 1, 10), datetime(2023, 1, 10)), 0.0)
+
+    def test_get_current_streak(self):
+        self.assertEqual(get_current_streak(self.habit, datetime(2023, 1, 9, 22)), 1)
+        self.assertEqual(get_current_streak(self.habit, datetime(2023, 1, 12)), 0)
+        monthly = Habit("Budget", "monthly")
+        monthly.completion_dates = [datetime(2023, 1, 31), datetime(2023, 2, 1)]
+        self.assertEqual(get_current_streak(monthly, datetime(2023, 2, 20)), 2)
+        self.assertEqual(get_current_streak(monthly, datetime(2023, 3, 20)), 2)
+        self.assertEqual(get_current_streak(monthly, datetime(2023, 4, 2)), 0)
+        self.assertEqual(get_current_streak(Habit("Read", "weekly")), 0)
+
+class TestStreakMemo(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.habit = Habit("Exercise", "daily")
+        self.habit.completion_dates = daily_habit_full_streak[:]
+        self.user = User("test_user", "test_user@example.com")
+        self.user.add_habit(self.habit)
+        reset_cache_info()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_hits_until_the_habit_changes(self):
+        get_user_longest_streak_all(self.user)
+        get_user_longest_streak_all(self.user)
+        self.assertEqual(get_user_longest_streak(self.user, "Exercise"), len(daily_habit_full_streak))
+        self.assertEqual(get_cache_info(), (2, 1))
+
+        self.habit.complete_task()
+        get_user_longest_streak_all(self.user)
+        self.habit.frequency = "weekly"
+        get_user_longest_streak_all(self.user)
+        # Appending to the list directly is caught by the completion count
+        self.habit.completion_dates.append(datetime(2023, 6, 1))
+        get_user_longest_streak_all(self.user)
+        self.assertEqual(get_cache_info(), (3, 3))
+
+    def test_reloaded_habits_hit(self):
+        file_path = os.path.join(self.tmp_dir.name, 'users_data.json')
+        User.save_all_to_json({"test_user": self.user}, file_path)
+        storage = JSONStorage(file_path)
+        try:
+            reset_cache_info()
+            self.assertEqual(get_longest_streak("Exercise", storage), len(daily_habit_full_streak))
+            self.assertEqual(get_longest_streak_all(storage), "Exercise")
+        finally:
+            storage.close()
+        # The streaks saved with the habit are restored, so nothing is recomputed
+        self.assertEqual(get_cache_info(), (2, 0))
+
+    def test_saving_is_not_counted(self):
+        get_user_longest_streak_all(self.user)
+        self.user.to_dict()
+        User.save_all_to_json({"test_user": self.user}, os.path.join(self.tmp_dir.name, 'users_data.json'))
+        self.assertEqual(get_cache_info(), (0, 1))
+
+    def test_reset(self):
+        get_user_longest_streak_all(self.user)
+        reset_cache_info()
+        self.assertEqual(get_cache_info(), (0, 0))
+
+class TestLeaderboard(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, 'users_data.json')
+        start = datetime(2023, 1, 1)
+        users = {}
+        # (user, habit, consecutive days completed from Jan 1)
+        for username, habit_name, days in (("alice", "Exercise", 5), ("alice", "Read", 9), ("bob", "Exercise", 7),
+                                           ("carol", "Exercise", 2), ("dave", None, 0)):
+            user = users.setdefault(username, User(username, f"{username}@example.com"))
+            if habit_name:
+                habit = Habit(habit_name, "daily")
+                habit.completion_dates = [start + timedelta(days=day) for day in range(days)]
+                user.add_habit(habit)
+        User.save_all_to_json(users, self.file_path)
+        self.storage = JSONStorage(self.file_path)
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp_dir.cleanup()
+
+    def test_top_habits(self):
+        self.assertEqual(get_leaderboard(self.storage, k=3),
+                         [("alice", "Read", 9), ("bob", "Exercise", 7), ("alice", "Exercise", 5)])
+
+    def test_top_users(self):
+        self.assertEqual(get_leaderboard(self.storage, k=10, by_user=True),
+                         [("alice", "Read", 9), ("bob", "Exercise", 7), ("carol", "Exercise", 2)])
+
+    def test_current_streak(self):
+        # On Jan 9 every run but alice's Read (Jan 1-9) is broken
+        leaderboard = get_leaderboard(self.storage, metric='current', now=datetime(2023, 1, 9, 12))
+        self.assertEqual(leaderboard[0], ("alice", "Read", 9))
+        self.assertEqual([entry.streak for entry in leaderboard[1:]], [0, 0, 0])
+        with self.assertRaises(ValueError):
+            get_leaderboard(self.storage, metric='average')
+
+    def test_users_are_not_kept_in_memory(self):
+        get_leaderboard(self.storage)
+        users = self.storage.load_users()
+        self.assertFalse(any(users.is_loaded(username) for username in users))
+
+    def test_user_without_habits(self):
+        user = User("dave", "dave@example.com")
+        self.assertIsNone(get_user_longest_streak_all(user))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
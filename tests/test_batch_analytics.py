@@ -0,0 +1,58 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+from src.habit import Habit
+from src.analytics import calculate_streak
+from src.batch_analytics import BatchStreakEngine, batch_longest_streaks
+
+class TestBatchStreakEngine(unittest.TestCase):
+
+    def test_matches_calculate_streak(self):
+        rng = random.Random(42)
+        engine = BatchStreakEngine()
+        expected = []
+        for i in range(300):
+            frequency = ['daily', 'weekly', 'monthly', 'weekdays', 'every 3 days'][i % 5]
+            date = datetime(2022, 11, 1) + timedelta(minutes=rng.randrange(60 * 24 * 30))
+            dates = []
+            for _ in range(rng.randrange(0, 40)):
+                dates.append(date)
+                date += timedelta(hours=rng.choice([0, 12, 24, 25, 24 * 7, 24 * 8, 24 * 31, 24 * 60]))
+            rng.shuffle(dates)
+            engine.add(i, dates, frequency)
+            expected.append(calculate_streak(dates, frequency))
+        self.assertEqual(engine.longest_streaks().tolist(), expected)
+
+    def test_month_boundaries(self):
+        engine = BatchStreakEngine()
+        dates = [datetime(2022, 11, 30), datetime(2022, 12, 1), datetime(2023, 1, 31), datetime(2023, 3, 1)]
+        engine.add("monthly", dates, "monthly")
+        # Consecutive calendar days, even though more than 24 hours apart
+        engine.add("daily", [datetime(2023, 1, 1), datetime(2023, 1, 2, 23, 59)], "daily")
+        engine.add("same_month", [datetime(2023, 1, 1), datetime(2023, 1, 20), datetime(2023, 2, 1)], "monthly")
+        self.assertEqual(engine.results(), {"monthly": 3, "daily": 2, "same_month": 2})
+
+    def test_empty_and_single(self):
+        engine = BatchStreakEngine()
+        engine.add("empty", [], "daily")
+        engine.add("single", [datetime(2023, 1, 1)], "weekly")
+        engine.add("empty_too", [], "monthly")
+        self.assertEqual(engine.results(), {"empty": 0, "single": 1, "empty_too": 0})
+
+    def test_unsupported_frequency(self):
+        engine = BatchStreakEngine()
+        engine.add("single", [datetime(2023, 1, 1)], "hourly")
+        self.assertEqual(engine.results(), {"single": 1})
+        engine.add("pair", [datetime(2023, 1, 1), datetime(2023, 1, 2)], "hourly")
+        with self.assertRaises(ValueError):
+            engine.longest_streaks()
+
+    def test_batch_longest_streaks(self):
+        exercise = Habit(name="Exercise", frequency="daily")
+        exercise.completion_dates = [datetime(2023, 1, day) for day in (1, 2, 3, 5)]
+        read = Habit(name="Read", frequency="weekly")
+        read.completion_dates = [datetime(2023, 1, day) for day in (1, 8, 15)]
+        self.assertEqual(batch_longest_streaks([exercise, read]), {"Exercise": 3, "Read": 3})
+
+if __name__ == '__main__':
+    unittest.main()
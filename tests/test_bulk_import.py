@@ -0,0 +1,170 @@
+import io
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from src.user import User
+from src.habit import Habit
+from src.storage import JSONStorage, SQLiteStorage
+from src.bulk_import import bulk_import, bulk_import_file, read_records, batched, parse_timestamp
+from src.serializers import save_users
+
+class BulkImportTests:
+    """
+    Tests run against every storage backend.
+    """
+    file_name = None
+    storage_class = None
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, self.file_name)
+        self.storage = self.storage_class(self.file_path)
+        user = User("test_user", "test_user@example.com")
+        self.storage.load_users()["test_user"] = user
+        self.storage.create_user(user)
+        for habit in (Habit("Exercise", "daily"), Habit("Read", "weekly")):
+            user.add_habit(habit)
+            self.storage.add_habit("test_user", habit)
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp_dir.cleanup()
+
+    def reopen(self):
+        self.storage.close()
+        self.storage = self.storage_class(self.file_path)
+        return self.storage.load_users()["test_user"]
+
+    def test_import(self):
+        start = datetime(2023, 1, 1)
+        records = [("test_user", "Exercise", start + timedelta(days=day)) for day in reversed(range(10))]
+        records += [("test_user", "Read", start), ("test_user", "Meditate", start), ("nobody", "Exercise", start)]
+        report = bulk_import(self.storage, records, batch_size=4)
+        self.assertEqual(report, (13, 11, 0, 2))
+
+        user = self.reopen()
+        exercise = user.get_habit_by_name("Exercise")
+        self.assertEqual(list(exercise.completion_dates), [start + timedelta(days=day) for day in range(10)])
+        self.assertEqual(exercise.get_longest_streak(), 10)
+        self.assertEqual(list(user.get_habit_by_name("Read").completion_dates), [start])
+
+    def test_merges_with_existing_completions(self):
+        habit = self.storage.load_users()["test_user"].get_habit_by_name("Exercise")
+        habit.add_completion(datetime(2023, 1, 5))
+        self.storage.complete("test_user", "Exercise", datetime(2023, 1, 5))
+        records = [("test_user", "Exercise", datetime(2023, 1, day)) for day in (3, 4, 5, 6)]
+        report = bulk_import(self.storage, records)
+        self.assertEqual((report.added, report.duplicates), (3, 1))
+        user = self.reopen()
+        self.assertEqual(list(user.get_habit_by_name("Exercise").completion_dates),
+                         [datetime(2023, 1, day) for day in (3, 4, 5, 6)])
+
+    def test_reimport_is_harmless(self):
+        records = [("test_user", "Exercise", datetime(2023, 1, day)) for day in range(1, 6)]
+        bulk_import(self.storage, records)
+        report = bulk_import(self.storage, records)
+        self.assertEqual((report.added, report.duplicates), (0, 5))
+        user = self.reopen()
+        self.assertEqual(len(user.get_habit_by_name("Exercise").completion_dates), 5)
+
+    def save_many_users(self, count):
+        # Writes the users straight to the data file, so the storage loads them on demand
+        self.storage.close()
+        users = {}
+        for i in range(count):
+            user = User(f"user{i}", f"user{i}@example.com")
+            habit = Habit("Exercise", "daily")
+            habit.completion_dates = [datetime(2023, 1, 1)]
+            user.add_habit(habit)
+            users[user.username] = user
+        save_users(users, self.file_path)
+        self.storage = self.storage_class(self.file_path)
+        return [(f"user{i}", "Exercise", datetime(2023, 1, 1)) for i in range(count)]
+
+    def test_releases_users_it_loaded(self):
+        records = self.save_many_users(20)
+        preloaded = self.storage.load_users()["user0"]
+        report = bulk_import(self.storage, records, batch_size=3)
+        self.assertEqual(report.duplicates, 20)
+        # Users loaded before the import stay loaded; the others are released after their batch
+        self.assertIs(self.storage.load_users()["user0"], preloaded)
+        self.assertEqual([i for i in range(20) if self.storage.is_loaded(f"user{i}")], [0])
+
+    def test_import_file(self):
+        csv_path = os.path.join(self.tmp_dir.name, 'completions.csv')
+        with open(csv_path, 'w') as f:
+            f.write("user,habit,timestamp\n")
+            for day in range(1, 4):
+                f.write(f"test_user,Exercise,2023-01-0{day}T08:00:00\n")
+        report = bulk_import_file(self.storage, csv_path)
+        self.assertEqual(report.added, 3)
+        user = self.reopen()
+        self.assertEqual(user.get_habit_by_name("Exercise").get_longest_streak(), 3)
+
+class TestJSONBulkImport(BulkImportTests, unittest.TestCase):
+    file_name = 'users_data.json'
+    storage_class = JSONStorage
+
+    def test_one_journal_record_per_habit_and_batch(self):
+        records = [("test_user", "Exercise", datetime(2023, 1, 1) + timedelta(days=day)) for day in range(100)]
+        bulk_import(self.storage, records, batch_size=50)
+        self.storage.flush()
+        with open(self.storage.journal.journal_path) as f:
+            # The user's creation, two habits and two merges
+            self.assertEqual(len(f.readlines()), 5)
+
+    def test_journaled_users_are_released_after_compaction(self):
+        records = self.save_many_users(5)
+        bulk_import(self.storage, [(username, habit, date + timedelta(days=1)) for username, habit, date in records])
+        # The snapshot does not hold the new completions yet, so the users stay loaded
+        self.assertTrue(all(self.storage.is_loaded(username) for username, _, _ in records))
+        self.storage.journal.compact()
+        self.assertEqual(self.storage.release_users([username for username, _, _ in records]),
+                         {username for username, _, _ in records})
+        habit = self.storage.load_users()["user3"].get_habit_by_name("Exercise")
+        self.assertEqual(len(habit.completion_dates), 2)
+
+class TestSQLiteBulkImport(BulkImportTests, unittest.TestCase):
+    file_name = 'users_data.db'
+    storage_class = SQLiteStorage
+
+    def test_releases_users_with_new_completions(self):
+        records = self.save_many_users(5)
+        report = bulk_import(self.storage, [(username, habit, date + timedelta(days=1))
+                                            for username, habit, date in records])
+        self.assertEqual(report.added, 5)
+        self.assertFalse(any(self.storage.is_loaded(username) for username, _, _ in records))
+        habit = self.storage.load_users()["user3"].get_habit_by_name("Exercise")
+        self.assertEqual(len(habit.completion_dates), 2)
+
+class TestReaders(unittest.TestCase):
+
+    def test_read_csv(self):
+        f = io.StringIO("user,habit,timestamp\nalice,Exercise,2023-01-01T08:00:00\n")
+        self.assertEqual(list(read_records(f, 'csv')), [("alice", "Exercise", datetime(2023, 1, 1, 8))])
+
+    def test_read_ndjson(self):
+        f = io.StringIO('{"user": "alice", "habit": "Exercise", "timestamp": "2023-01-01T08:00:00"}\n\n')
+        self.assertEqual(list(read_records(f, 'ndjson')), [("alice", "Exercise", datetime(2023, 1, 1, 8))])
+
+    def test_invalid_record(self):
+        f = io.StringIO('{"user": "alice", "habit": "Exercise", "timestamp": "2023-01-01T08:00:00"}\n{"user": "bob"}\n')
+        with self.assertRaisesRegex(ValueError, "line 2"):
+            list(read_records(f, 'ndjson'))
+
+    def test_aware_timestamps_become_local(self):
+        date = parse_timestamp("2023-01-01T08:00:00+00:00")
+        self.assertIsNone(date.tzinfo)
+        self.assertEqual(date, datetime(2023, 1, 1, 8, tzinfo=timezone.utc).astimezone().replace(tzinfo=None))
+
+    def test_batched_is_lazy(self):
+        def records():
+            for day in range(1, 8):
+                yield "alice", "Exercise", datetime(2023, 1, day)
+        batches = batched(records(), 3)
+        self.assertEqual(len(next(batches)), 3)
+        self.assertEqual([len(batch) for batch in batches], [3, 1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestShell(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, 'users_data.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_shell(self, script: str) -> str:
+        env = dict(os.environ, HABIT_DATA_FILE=self.file_path, PYTHONPATH=ROOT)
+        result = subprocess.run([sys.executable, '-m', 'src.cli', 'shell', '--flush-delay', '60'], input=script,
+                                env=env, cwd=self.tmp_dir.name, capture_output=True, text=True, check=True)
+        return result.stdout
+
+    def test_commands_share_state(self):
+        output = self.run_shell("create-user alice alice@example.com\n"
+                                "change-user alice\n"
+                                "create-habit Exercise daily\n"
+                                "complete-task Exercise\n"
+                                "no-such-command\n"
+                                "list-habits\n")
+        self.assertIn("Habit 'Exercise' marked as completed.", output)
+        self.assertIn("Error: No such command 'no-such-command'.", output)
+        self.assertIn("Habit: Exercise, Frequency: daily", output)
+
+        # Buffered changes are written when the shell exits
+        with open(f"{self.file_path}.journal") as f:
+            self.assertEqual(len(f.readlines()), 3)
+        output = self.run_shell("change-user alice\nlist-habits\n")
+        self.assertIn("Habit: Exercise, Frequency: daily", output)
+
+    def test_leaderboard(self):
+        output = self.run_shell("create-user alice alice@example.com\n"
+                                "create-user bob bob@example.com\n"
+                                "change-user bob\n"
+                                "longest-streak-all\n"
+                                "create-habit Exercise daily\n"
+                                "complete-task Exercise\n"
+                                "leaderboard --users\n")
+        self.assertIn("User 'bob' has no habits.", output)
+        self.assertRegex(output, r"1\. bob +Exercise +1")
+
+    def test_complete_task_once_per_period(self):
+        output = self.run_shell("create-user alice alice@example.com\n"
+                                "change-user alice\n"
+                                "create-habit Exercise daily\n"
+                                "complete-task Exercise\n"
+                                "complete-task Exercise\n"
+                                "complete-task Exercise --again\n")
+        self.assertEqual(output.count("Habit 'Exercise' marked as completed."), 2)
+        self.assertIn("Habit 'Exercise' is already completed for this period.", output)
+
+    def test_export_to_stdout(self):
+        self.run_shell("create-user alice alice@example.com\n")
+        env = dict(os.environ, HABIT_DATA_FILE=self.file_path, PYTHONPATH=ROOT)
+        result = subprocess.run([sys.executable, '-W', 'error::DeprecationWarning', '-m', 'src.cli', 'export'],
+                                env=env, cwd=self.tmp_dir.name, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout, '{"type": "user", "user": "alice", "email": "alice@example.com"}\n')
+        self.assertEqual(result.stderr, '')
+
+if __name__ == '__main__':
+    unittest.main()
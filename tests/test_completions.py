@@ -0,0 +1,51 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from src.completions import CompletionLog, to_timestamp, from_timestamp
+
+class TestCompletionLog(unittest.TestCase):
+
+    def setUp(self):
+        self.dates = [datetime(2023, 1, 2, 8, 30, 0, 123456), datetime(2023, 1, 1), datetime(1969, 12, 31, 23, 59)]
+        self.log = CompletionLog(self.dates)
+
+    def test_timestamp_round_trip(self):
+        for date in self.dates:
+            self.assertEqual(from_timestamp(to_timestamp(date)), date)
+        self.assertEqual(to_timestamp(datetime(1970, 1, 1, 0, 0, 1)), 1_000_000)
+
+    def test_aware_datetimes_use_local_time(self):
+        aware = datetime(2023, 1, 2, 8, 30, tzinfo=timezone(timedelta(hours=5)))
+        self.assertEqual(from_timestamp(to_timestamp(aware)), aware.astimezone().replace(tzinfo=None))
+        log = CompletionLog([aware])
+        self.assertEqual(log[0], aware.astimezone().replace(tzinfo=None))
+
+    def test_sequence_api(self):
+        self.assertEqual(len(self.log), 3)
+        self.assertEqual(self.log[0], self.dates[0])
+        self.assertEqual(self.log[-1], self.dates[-1])
+        self.assertEqual(list(self.log), self.dates)
+        self.assertEqual(self.log, self.dates)
+        self.assertEqual(self.log[1:], self.dates[1:])
+        self.assertIn(datetime(2023, 1, 1), self.log)
+
+    def test_mutation(self):
+        self.log.append(datetime(2023, 1, 3))
+        self.log.insert(0, datetime(2022, 12, 31))
+        del self.log[1]
+        self.assertEqual(self.log, [datetime(2022, 12, 31)] + self.dates[1:] + [datetime(2023, 1, 3)])
+        self.log.extend(CompletionLog([datetime(2023, 1, 4)]))
+        self.assertEqual(self.log[-1], datetime(2023, 1, 4))
+
+    def test_sort(self):
+        self.assertEqual(self.log.sorted(), sorted(self.dates))
+        self.assertEqual(self.log, self.dates)
+        self.log.sort()
+        self.assertEqual(self.log, sorted(self.dates))
+
+    def test_from_timestamps(self):
+        self.assertEqual(CompletionLog.from_timestamps(self.log.timestamps.tobytes()), self.log)
+        self.assertEqual(CompletionLog.from_timestamps(list(self.log.timestamps)), self.log)
+        self.assertEqual(self.log.nbytes(), 24)
+
+if __name__ == '__main__':
+    unittest.main()
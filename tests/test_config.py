@@ -0,0 +1,64 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from src.user import User
+from src.reminder import Reminder
+from src.config import ConfigProvider
+
+class TestConfigProvider(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, 'config.json')
+        self.write({'email_user': "sender@example.com", 'email_pass': "secret"})
+        self.config = ConfigProvider(self.file_path, check_interval=0)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, config, mtime_ns=None):
+        with open(self.file_path, 'w') as f:
+            json.dump(config, f)
+        if mtime_ns is not None:
+            os.utime(self.file_path, ns=(mtime_ns, mtime_ns))
+
+    def test_loads_once(self):
+        for _ in range(100):
+            self.assertEqual(self.config.get('email_user'), "sender@example.com")
+        self.assertEqual(self.config.reads, 1)
+
+    def test_reloads_when_file_changes(self):
+        self.config.get('email_user')
+        self.write({'email_user': "other@example.com", 'email_pass': "secret"}, mtime_ns=2 * 10 ** 18)
+        self.assertEqual(self.config.get('email_user'), "other@example.com")
+        self.assertEqual(self.config.reads, 2)
+
+    def test_check_interval(self):
+        config = ConfigProvider(self.file_path, check_interval=3600)
+        config.get('email_user')
+        self.write({'email_user': "other@example.com"}, mtime_ns=2 * 10 ** 18)
+        self.assertEqual(config.get('email_user'), "sender@example.com")
+        config.invalidate()
+        self.assertEqual(config.get('email_user'), "other@example.com")
+
+    def test_missing_file(self):
+        config = ConfigProvider(os.path.join(self.tmp_dir.name, 'missing.json'), check_interval=0)
+        self.assertIsNone(config.get('email_user'))
+        self.assertEqual(config.get('email_user', "default"), "default")
+
+    def test_environment_overrides_file(self):
+        with patch.dict(os.environ, {'EMAIL_USER': "env@example.com", 'FCM_SERVER_KEY': "key"}):
+            self.assertEqual(self.config.get('email_user'), "env@example.com")
+            self.assertEqual(self.config.get('fcm_server_key'), "key")
+            self.assertEqual(self.config.get('email_pass'), "secret")
+
+    def test_reminders_share_one_read(self):
+        with patch('src.reminder.get_config', return_value=self.config):
+            reminders = [Reminder(User(f"user{i}", f"user{i}@example.com")) for i in range(1000)]
+        self.assertTrue(all(reminder.email_user == "sender@example.com" for reminder in reminders))
+        self.assertEqual(self.config.reads, 1)
+
+if __name__ == '__main__':
+    unittest.main()
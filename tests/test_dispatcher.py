@@ -0,0 +1,128 @@
+import os
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from src.user import User
+from src.habit import Habit
+from src.reminder import SMTPConnectionPool
+from src.dispatcher import ReminderDispatcher
+from src.scheduler import ReminderScheduler
+from stand_ins import LocalSMTPServer, LocalPushServer
+
+CREDENTIALS = {'EMAIL_USER': "sender@example.com", 'EMAIL_PASS': "secret"}
+
+def make_users(n_users: int, n_habits: int = 2):
+    users = []
+    for i in range(n_users):
+        user = User(username=f"user{i}", email=f"user{i}@example.com")
+        for j in range(n_habits):
+            user.add_habit(Habit(name=f"Habit{j}", frequency="daily"))
+        users.append(user)
+    return users
+
+@patch.dict(os.environ, CREDENTIALS)
+class TestReminderDispatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.smtp = LocalSMTPServer().__enter__()
+        self.pool = SMTPConnectionPool("sender@example.com", "secret", host='127.0.0.1', port=self.smtp.port,
+                                       use_ssl=False, size=4, timeout=5)
+
+    def tearDown(self):
+        self.pool.close()
+        self.smtp.__exit__(None, None, None)
+
+    def test_sends_to_all_users(self):
+        with LocalPushServer() as push:
+            report = ReminderDispatcher(self.pool, push_url=push.url).run(make_users(5))
+        self.assertEqual(len(report.emails), 10)
+        self.assertEqual(len(report.pushes), 10)
+        self.assertEqual(report.failures, [])
+        self.assertEqual(len(self.smtp.messages), 10)
+        self.assertEqual(len(push.requests), 10)
+        self.assertLessEqual(self.smtp.connections, 4)
+
+    def test_digest(self):
+        with LocalPushServer() as push:
+            report = ReminderDispatcher(self.pool, push_url=push.url, digest=True).run(make_users(5))
+        self.assertEqual(len(report.emails), 5)
+        self.assertEqual(len(report.pushes), 5)
+        self.assertEqual(push.requests[0]['json']['notification']['title'], "Reminder: Habit0, Habit1")
+
+    def test_sends_concurrently(self):
+        with LocalPushServer(delay=0.2) as push:
+            start = time.perf_counter()
+            report = ReminderDispatcher(self.pool, push_url=push.url, push_concurrency=20).run(make_users(10))
+            elapsed = time.perf_counter() - start
+        self.assertEqual(len(report.pushes), 20)
+        self.assertEqual(report.failures, [])
+        # 20 serial requests would take 4 seconds
+        self.assertLess(elapsed, 2.0)
+
+    def test_concurrency_bounded(self):
+        with LocalPushServer(delay=0.1) as push:
+            start = time.perf_counter()
+            ReminderDispatcher(self.pool, push_url=push.url, push_concurrency=2).run(make_users(2))
+            elapsed = time.perf_counter() - start
+        # 4 requests, 2 at a time
+        self.assertGreaterEqual(elapsed, 0.2)
+
+    def test_retries_with_backoff(self):
+        with LocalPushServer(failures=2) as push:
+            report = ReminderDispatcher(self.pool, push_url=push.url, backoff=0.01).run(make_users(1, n_habits=1))
+        self.assertTrue(report.pushes[0].success)
+        self.assertEqual(report.pushes[0].attempts, 3)
+        self.assertEqual(len(push.requests), 3)
+
+    def test_gives_up_after_retries(self):
+        with LocalPushServer(failures=10) as push:
+            report = ReminderDispatcher(self.pool, push_url=push.url, max_retries=1,
+                                        backoff=0.01).run(make_users(1, n_habits=1))
+        self.assertFalse(report.pushes[0].success)
+        self.assertEqual(report.pushes[0].attempts, 2)
+        self.assertEqual(report.pushes[0].error, "HTTP 503")
+        self.assertEqual(len(report.failures), 1)
+
+    def test_timeout(self):
+        with LocalPushServer(delay=0.5) as push:
+            report = ReminderDispatcher(self.pool, push_url=push.url, timeout=0.1, max_retries=0).run(
+                make_users(1, n_habits=1))
+        self.assertFalse(report.pushes[0].success)
+        self.assertTrue(report.emails[0].success)
+
+    def test_run_due(self):
+        users = make_users(3)
+        now = datetime.now()
+        users[0].get_habit_by_name("Habit0").add_completion(now)
+        scheduler = ReminderScheduler()
+        scheduler.add_users(users)
+        with LocalPushServer() as push:
+            report = ReminderDispatcher(self.pool, push_url=push.url).run_due(scheduler, now)
+        self.assertEqual(len(report.emails), 5)
+        self.assertEqual(len(report.pushes), 5)
+        self.assertEqual(scheduler.tick(now), [])
+        self.assertEqual(users[1].get_habit_by_name("Habit0").last_reminded, now)
+        self.assertIsNone(users[0].get_habit_by_name("Habit0").last_reminded)
+
+    def test_run_due_retries_undelivered(self):
+        users = make_users(2, n_habits=1)
+        users[1].email = "reject@example.com"
+        now = datetime.now()
+        scheduler = ReminderScheduler()
+        scheduler.add_users(users)
+        with LocalPushServer(failures=10) as push:
+            report = ReminderDispatcher(self.pool, push_url=push.url, max_retries=0).run_due(scheduler, now)
+        self.assertEqual(report.reminded, {("user0", "Habit0")})
+        self.assertEqual(users[0].get_habit_by_name("Habit0").last_reminded, now)
+        self.assertIsNone(users[1].get_habit_by_name("Habit0").last_reminded)
+        self.assertEqual(scheduler.tick(now), [(users[1], users[1].get_habits())])
+
+    def test_no_habits(self):
+        with LocalPushServer() as push:
+            report = ReminderDispatcher(self.pool, push_url=push.url).run(make_users(3, n_habits=0))
+        self.assertEqual(report.emails, [])
+        self.assertEqual(report.pushes, [])
+
+if __name__ == '__main__':
+    unittest.main()
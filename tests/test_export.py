@@ -0,0 +1,92 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from src.user import User
+from src.habit import Habit
+from src.storage import JSONStorage, SQLiteStorage
+from src.export import iter_records, write_ndjson
+from src.bulk_import import bulk_import, read_records
+
+START = datetime(2023, 1, 1)
+
+def make_users():
+    users = {}
+    for i in range(3):
+        user = User(f"user{i}", f"user{i}@example.com")
+        for name, frequency in (("Exercise", "daily"), ("Read", "weekly")):
+            habit = Habit(name, frequency)
+            habit.creation_date = START
+            habit.completion_dates = [START + timedelta(days=day) for day in range(10)]
+            user.add_habit(habit)
+        users[user.username] = user
+    return users
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, 'users_data.json')
+        User.save_all_to_json(make_users(), self.file_path)
+        self.storage = JSONStorage(self.file_path)
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp_dir.cleanup()
+
+    def test_records(self):
+        records = list(iter_records(self.storage))
+        self.assertEqual(len(records), 3 * (1 + 2 * 11))
+        self.assertEqual(records[0], {'type': 'user', 'user': "user0", 'email': "user0@example.com"})
+        self.assertEqual(records[1], {'type': 'habit', 'user': "user0", 'habit': "Exercise", 'frequency': "daily",
+                                      'creation_date': START.isoformat()})
+        self.assertEqual(records[2], {'type': 'completion', 'user': "user0", 'habit': "Exercise",
+                                      'timestamp': START.isoformat()})
+
+    def test_filters(self):
+        records = list(iter_records(self.storage, usernames=["user1", "nobody"], habit_names=["Read"],
+                                    start=START + timedelta(days=2), end=START + timedelta(days=5)))
+        self.assertEqual([record['type'] for record in records], ['user', 'habit'] + ['completion'] * 3)
+        self.assertEqual(records[2]['timestamp'], (START + timedelta(days=2)).isoformat())
+        self.assertTrue(all(record['user'] == "user1" for record in records))
+
+    def test_users_are_not_kept_in_memory(self):
+        for _ in iter_records(self.storage):
+            pass
+        users = self.storage.load_users()
+        self.assertFalse(any(users.is_loaded(username) for username in users))
+
+    def test_includes_journaled_changes(self):
+        users = self.storage.load_users()
+        users["user0"].get_habit_by_name("Exercise").add_completion(START + timedelta(days=20))
+        self.storage.complete("user0", "Exercise", START + timedelta(days=20))
+        self.storage.close()
+        records = list(iter_records(JSONStorage(self.file_path), usernames=["user0"], habit_names=["Exercise"]))
+        self.assertEqual(records[-1]['timestamp'], (START + timedelta(days=20)).isoformat())
+
+    def test_write_ndjson(self):
+        f = io.StringIO()
+        count = write_ndjson(iter_records(self.storage, usernames=["user2"]), f)
+        lines = f.getvalue().splitlines()
+        self.assertEqual(count, len(lines))
+        self.assertEqual(json.loads(lines[0])['user'], "user2")
+
+    def test_round_trip_through_bulk_import(self):
+        f = io.StringIO()
+        write_ndjson(iter_records(self.storage), f)
+        f.seek(0)
+        target = SQLiteStorage(os.path.join(self.tmp_dir.name, 'users_data.db'))
+        for user in make_users().values():
+            for habit in user.get_habits():
+                habit.completion_dates = []
+            target.create_user(user)
+        report = bulk_import(target, read_records(f, 'ndjson'))
+        self.assertEqual(report.added, 3 * 2 * 10)
+        self.assertEqual(target.load_user("user1").get_habit_by_name("Read").completion_dates,
+                         [START + timedelta(days=day) for day in range(10)])
+        target.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
 from datetime import datetime
+from unittest.mock import patch
 from src.habit import Habit
+from src.completions import CompletionLog
 
 # Predefined habit data for testing
 daily_habit_full_streak = [
@@ -149,5 +151,182 @@ class TestHabit(unittest.TestCase):
         self.assertEqual(habit.creation_date, datetime(2023, 1, 1))
         self.assertEqual(habit.completion_dates, [datetime(2023, 1, 2)])
 
+    def test_incremental_streak_matches_full_scan(self):
+        habit = Habit(name="Exercise", frequency="daily")
+        for date in daily_habit_missed_days:
+            habit.add_completion(date)
+        self.assertEqual(habit.get_longest_streak(), 3)
+        self.assertEqual(habit.get_current_streak(), 3)
+        habit.add_completion(datetime(2023, 1, 28))
+        self.assertEqual(habit.get_current_streak(), 4)
+        self.assertEqual(habit.get_longest_streak(), 4)
+
+    def test_out_of_order_completion(self):
+        habit = Habit(name="Exercise", frequency="daily")
+        for date in [datetime(2023, 1, 1), datetime(2023, 1, 2), datetime(2023, 1, 4), datetime(2023, 1, 5)]:
+            habit.add_completion(date)
+        self.assertEqual(habit.get_longest_streak(), 2)
+        habit.add_completion(datetime(2023, 1, 3))
+        self.assertEqual(habit.get_longest_streak(), 5)
+        self.assertEqual(habit.get_current_streak(), 5)
+
+    def test_direct_append_is_picked_up(self):
+        habit = Habit(name="Exercise", frequency="daily")
+        habit.add_completion(datetime(2023, 1, 1))
+        habit.completion_dates.append(datetime(2023, 1, 2))
+        self.assertEqual(habit.get_longest_streak(), 2)
+
+    def test_frequency_change_resets_streak(self):
+        habit = Habit(name="Exercise", frequency="monthly")
+        habit.completion_dates = list(weekly_habit_full_streak)
+        self.assertEqual(habit.get_longest_streak(), 1)
+        habit.frequency = "weekly"
+        self.assertEqual(habit.get_longest_streak(), 5)
+
+    def test_streak_state_round_trip(self):
+        habit = Habit(name="Exercise", frequency="daily")
+        for date in daily_habit_missed_days:
+            habit.add_completion(date)
+        habit_dict = habit.to_dict()
+        self.assertEqual(habit_dict['streak']['longest'], 3)
+
+        with patch.object(Habit, '_recompute_streaks') as recompute:
+            loaded = Habit.from_dict(habit_dict)
+            self.assertEqual(loaded.get_longest_streak(), 3)
+            self.assertEqual(loaded.get_current_streak(), 3)
+            loaded.add_completion(datetime(2023, 1, 28))
+            self.assertEqual(loaded.get_current_streak(), 4)
+            recompute.assert_not_called()
+
+    def test_stale_streak_state_is_recomputed(self):
+        habit = Habit(name="Exercise", frequency="daily")
+        habit.completion_dates = list(daily_habit_full_streak)
+        habit_dict = habit.to_dict()
+        habit_dict['completion_dates'] = habit_dict['completion_dates'][:3]
+        self.assertEqual(Habit.from_dict(habit_dict).get_longest_streak(), 3)
+
+    def test_edited_last_completion_is_recomputed(self):
+        habit = Habit(name="Exercise", frequency="daily")
+        habit.completion_dates = list(daily_habit_full_streak)
+        habit_dict = habit.to_dict()
+        # Same number of completions, but the last one moved a week later
+        habit_dict['completion_dates'][-1] = datetime(2023, 2, 4).isoformat()
+        loaded = Habit.from_dict(habit_dict)
+        self.assertEqual(loaded.get_longest_streak(), 27)
+        self.assertEqual(loaded.get_current_streak(), 1)
+        self.assertEqual(loaded.get_last_completion(), datetime(2023, 2, 4))
+
+    def test_period_counts(self):
+        habit = Habit(name="Exercise", frequency="daily", compact=True)
+        habit.completion_dates = [datetime(2023, 1, 1, 8), datetime(2023, 1, 1, 20), datetime(2023, 1, 3)]
+        self.assertEqual(habit.completions_in_period(datetime(2023, 1, 1, 23)), 2)
+        self.assertFalse(habit.is_done(datetime(2023, 1, 2)))
+        habit.add_completion(datetime(2023, 1, 2, 9))
+        self.assertTrue(habit.is_done(datetime(2023, 1, 2, 23)))
+        # Kept in step without a rebuild, and dropped when the periods change
+        self.assertEqual(habit.period_counts(), {datetime(2023, 1, day).toordinal(): count
+                                                 for day, count in ((1, 2), (2, 1), (3, 1))})
+        habit.frequency = "monthly"
+        self.assertEqual(habit.completions_in_period(datetime(2023, 1, 31)), 4)
+        habit.completion_dates.append(datetime(2023, 1, 4))
+        self.assertEqual(habit.completions_in_period(datetime(2023, 1, 31)), 5)
+
+    def test_compact_completion_dates(self):
+        habit = Habit(name="Exercise", frequency="daily", compact=True)
+        habit.completion_dates = daily_habit_missed_days
+        self.assertIsInstance(habit.completion_dates, CompletionLog)
+        self.assertEqual(habit.get_longest_streak(), 3)
+        completed_at = habit.complete_task()
+        self.assertEqual(habit.completion_dates[-1], completed_at)
+
+    def test_compact_round_trip(self):
+        habit = Habit(name="Exercise", frequency="weekly")
+        habit.completion_dates = weekly_habit_missed_weeks
+        loaded = Habit.from_dict(habit.to_dict(), compact=True)
+        self.assertIsInstance(loaded.completion_dates, CompletionLog)
+        self.assertEqual(loaded.completion_dates, weekly_habit_missed_weeks)
+        self.assertEqual(loaded.to_dict(), habit.to_dict())
+
+    def test_slots(self):
+        habit = Habit(name="Exercise", frequency="daily")
+        with self.assertRaises(AttributeError):
+            habit.note = "no per-instance __dict__"
+
+    def test_listeners(self):
+        habit = Habit(name="Exercise", frequency="daily")
+        notified = []
+        habit.add_listener(notified.append)
+        habit.complete_task()
+        habit.frequency = "weekly"
+        self.assertEqual(notified, [habit, habit])
+        habit.remove_listener(notified.append)
+        habit.complete_task()
+        self.assertEqual(len(notified), 2)
+
+    def test_merge_completions(self):
+        for compact in (False, True):
+            habit = Habit(name="Exercise", frequency="daily", compact=compact)
+            habit.completion_dates = [datetime(2024, 1, 2), datetime(2024, 1, 5)]
+            self.assertEqual(habit.get_longest_streak(), 1)
+            added = habit.merge_completions([datetime(2024, 1, 4), datetime(2024, 1, 3), datetime(2024, 1, 5),
+                                             datetime(2024, 1, 3)])
+            self.assertEqual(added, [datetime(2024, 1, 3), datetime(2024, 1, 4)])
+            self.assertEqual(list(habit.completion_dates), [datetime(2024, 1, day) for day in range(2, 6)])
+            self.assertEqual(habit.get_longest_streak(), 4)
+            self.assertEqual(habit.merge_completions([datetime(2024, 1, 2)]), [])
+
+    def test_merge_completions_in_place(self):
+        for compact in (False, True):
+            habit = Habit(name="Exercise", frequency="daily", compact=compact)
+            habit.completion_dates = [datetime(2024, 1, 1), datetime(2024, 1, 2)]
+            dates = habit.completion_dates
+            sorted_dates = habit.sorted_completions()
+            counts = habit.period_counts()
+            self.assertEqual(habit.get_longest_streak(), 2)
+            # A batch after every completion is folded into the caches without recomputing them
+            with patch.object(Habit, '_recompute_streaks', side_effect=AssertionError):
+                added = habit.merge_completions([datetime(2024, 1, 4), datetime(2024, 1, 3), datetime(2024, 1, 2)])
+                self.assertEqual(added, [datetime(2024, 1, 3), datetime(2024, 1, 4)])
+                self.assertEqual((habit.get_longest_streak(), habit.get_current_streak()), (4, 4))
+            self.assertIs(habit.completion_dates, dates)
+            self.assertIs(habit.sorted_completions(), sorted_dates)
+            self.assertIs(habit.period_counts(), counts)
+            self.assertEqual(len(counts), 4)
+            # An earlier batch is merged into the same list
+            habit.merge_completions([datetime(2023, 12, 31), datetime(2024, 1, 10)])
+            self.assertIs(habit.completion_dates, dates)
+            self.assertEqual(list(habit.sorted_completions()), list(dates))
+            self.assertEqual(list(dates)[0], datetime(2023, 12, 31))
+            self.assertEqual((habit.get_longest_streak(), habit.get_current_streak()), (5, 1))
+            self.assertEqual(habit.completions_in_period(datetime(2024, 1, 10, 12)), 1)
+
+    def test_sorted_completions(self):
+        for compact in (False, True):
+            habit = Habit(name="Exercise", frequency="daily", compact=compact)
+            habit.completion_dates = [datetime(2024, 1, 5), datetime(2024, 1, 2)]
+            self.assertEqual(list(habit.sorted_completions()), [datetime(2024, 1, 2), datetime(2024, 1, 5)])
+            habit.add_completion(datetime(2024, 1, 3))
+            habit.add_completion(datetime(2024, 1, 7))
+            self.assertEqual(list(habit.sorted_completions()),
+                             [datetime(2024, 1, 2), datetime(2024, 1, 3), datetime(2024, 1, 5), datetime(2024, 1, 7)])
+            habit.completion_dates = [datetime(2024, 2, 1)]
+            self.assertEqual(list(habit.sorted_completions()), [datetime(2024, 2, 1)])
+
+    def test_completions_between(self):
+        for compact in (False, True):
+            habit = Habit(name="Exercise", frequency="daily", compact=compact)
+            habit.completion_dates = [datetime(2024, 1, day) for day in (5, 1, 3, 2)]
+            self.assertEqual(habit.completion_span(datetime(2024, 1, 2), datetime(2024, 1, 5)), (1, 3))
+            self.assertEqual(list(habit.completions_between(datetime(2024, 1, 2), datetime(2024, 1, 5))),
+                             [datetime(2024, 1, 2), datetime(2024, 1, 3)])
+            self.assertEqual(list(habit.completions_between(end=datetime(2024, 1, 2))), [datetime(2024, 1, 1)])
+            self.assertEqual(list(habit.completions_between(datetime(2024, 2, 1), datetime(2024, 1, 1))), [])
+
+    def test_last_completion(self):
+        habit = Habit(name="Exercise", frequency="daily")
+        self.assertIsNone(habit.get_last_completion())
+        habit.completion_dates = [datetime(2024, 1, 3), datetime(2024, 1, 1)]
+        self.assertEqual(habit.get_last_completion(), datetime(2024, 1, 3))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,253 @@
+import os
+import json
+import multiprocessing
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from src.user import User
+from src.habit import Habit
+from src.journal import Journal
+from src.storage import JSONStorage
+
+def complete_many(file_path: str, habit_name: str, count: int) -> None:
+    storage = JSONStorage(file_path)
+    storage.journal.compact_threshold = 7
+    habit = storage.load_users()["test_user"].get_habit_by_name(habit_name)
+    for day in range(count):
+        completed_at = datetime(2023, 1, 1) + timedelta(days=day)
+        habit.add_completion(completed_at)
+        storage.complete("test_user", habit_name, completed_at)
+    storage.close()
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.snapshot_path = os.path.join(self.tmp_dir.name, 'users_data.json')
+        user = User("test_user", "test_user@example.com")
+        user.add_habit(Habit("Exercise", "daily"))
+        User.save_all_to_json({"test_user": user}, self.snapshot_path)
+        self.journal = Journal(self.snapshot_path)
+        self.users = self.journal.load()
+
+    def tearDown(self):
+        self.journal.wait()
+        self.tmp_dir.cleanup()
+
+    def test_append_does_not_rewrite_snapshot(self):
+        with open(self.snapshot_path) as f:
+            before = f.read()
+        self.journal.complete("test_user", "Exercise", datetime(2023, 1, 1))
+        with open(self.snapshot_path) as f:
+            self.assertEqual(f.read(), before)
+        with open(self.journal.journal_path) as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+    def test_replay(self):
+        self.journal.create_user(User("other_user", "other_user@example.com"))
+        self.journal.add_habit("other_user", Habit("Read", "weekly"))
+        self.journal.set_frequency("test_user", "Exercise", "weekly")
+        self.journal.complete("test_user", "Exercise", datetime(2023, 1, 1))
+        self.journal.complete("test_user", "Exercise", datetime(2023, 1, 2))
+
+        users = Journal(self.snapshot_path).load()
+        self.assertIn("other_user", users)
+        self.assertEqual(users["other_user"].get_habit_by_name("Read").frequency, "weekly")
+        habit = users["test_user"].get_habit_by_name("Exercise")
+        self.assertEqual(habit.frequency, "weekly")
+        self.assertEqual(habit.completion_dates, [datetime(2023, 1, 1), datetime(2023, 1, 2)])
+
+    def test_replay_out_of_order_completions(self):
+        # A buffering writer can journal an earlier completion after another writer's later one
+        other = Journal(self.snapshot_path)
+        other.load()
+        other.complete("test_user", "Exercise", datetime(2023, 1, 2))
+        self.journal.complete("test_user", "Exercise", datetime(2023, 1, 1))
+        self.journal.complete("test_user", "Exercise", datetime(2023, 1, 1))
+
+        habit = Journal(self.snapshot_path).load()["test_user"].get_habit_by_name("Exercise")
+        self.assertEqual(habit.completion_dates, [datetime(2023, 1, 1), datetime(2023, 1, 2)])
+        self.assertEqual(habit.get_longest_streak(), 2)
+
+    def test_remove_records(self):
+        self.journal.create_user(User("other_user", "other_user@example.com"))
+        self.journal.remove_habit("test_user", "Exercise")
+        self.journal.remove_user("other_user")
+
+        users = Journal(self.snapshot_path).load()
+        self.assertNotIn("other_user", users)
+        self.assertEqual(users["test_user"].get_habits(), [])
+
+    def test_torn_last_line_is_ignored(self):
+        self.journal.complete("test_user", "Exercise", datetime(2023, 1, 1))
+        with open(self.journal.journal_path, 'a') as f:
+            f.write('{"op": "complete", "usern')
+
+        users = Journal(self.snapshot_path).load()
+        habit = users["test_user"].get_habit_by_name("Exercise")
+        self.assertEqual(habit.completion_dates, [datetime(2023, 1, 1)])
+
+    def test_compact(self):
+        habit = self.users["test_user"].get_habit_by_name("Exercise")
+        habit.completion_dates.append(datetime(2023, 1, 1))
+        self.journal.complete("test_user", "Exercise", datetime(2023, 1, 1))
+        self.journal.compact()
+
+        self.assertEqual(os.path.getsize(self.journal.journal_path), 0)
+        with open(self.snapshot_path) as f:
+            data = json.load(f)
+        self.assertEqual(data["test_user"]["habits"][0]["completion_dates"], [datetime(2023, 1, 1).isoformat()])
+
+    def test_replay_after_compaction_is_idempotent(self):
+        habit = self.users["test_user"].get_habit_by_name("Exercise")
+        habit.completion_dates.append(datetime(2023, 1, 1))
+        self.journal.complete("test_user", "Exercise", datetime(2023, 1, 1))
+        with open(self.journal.journal_path) as f:
+            records = f.read()
+        self.journal.compact()
+        # Simulate a crash between writing the snapshot and truncating the journal
+        with open(self.journal.journal_path, 'w') as f:
+            f.write(records)
+
+        users = Journal(self.snapshot_path).load()
+        habit = users["test_user"].get_habit_by_name("Exercise")
+        self.assertEqual(habit.completion_dates, [datetime(2023, 1, 1)])
+
+    def test_background_compaction_at_threshold(self):
+        self.journal.compact_threshold = 3
+        habit = self.users["test_user"].get_habit_by_name("Exercise")
+        for day in range(1, 4):
+            completed_at = datetime(2023, 1, day)
+            habit.completion_dates.append(completed_at)
+            self.journal.complete("test_user", "Exercise", completed_at)
+        self.journal.wait()
+
+        self.assertEqual(os.path.getsize(self.journal.journal_path), 0)
+        users = User.load_all_from_json(self.snapshot_path)
+        self.assertEqual(len(users["test_user"].get_habit_by_name("Exercise").completion_dates), 3)
+
+    def journal_lines(self):
+        if not os.path.exists(self.journal.journal_path):
+            return 0
+        with open(self.journal.journal_path) as f:
+            return len(f.readlines())
+
+    def test_flush_delay_buffers_records(self):
+        self.journal.flush_delay = 60
+        for day in range(1, 4):
+            self.journal.complete("test_user", "Exercise", datetime(2023, 1, day))
+        self.assertEqual(self.journal_lines(), 0)
+        self.journal.flush()
+        self.assertEqual(self.journal_lines(), 3)
+
+    def test_flush_after_delay(self):
+        self.journal.flush_delay = 0.05
+        self.journal.complete("test_user", "Exercise", datetime(2023, 1, 1))
+        flusher = self.journal._flusher
+        self.journal.complete("test_user", "Exercise", datetime(2023, 1, 2))
+        flusher.join()
+        self.assertEqual(self.journal_lines(), 2)
+        self.assertIsNone(self.journal._flusher)
+
+    def test_wait_flushes(self):
+        self.journal.flush_delay = 60
+        self.journal.complete("test_user", "Exercise", datetime(2023, 1, 1))
+        self.journal.wait()
+        users = Journal(self.snapshot_path).load()
+        self.assertEqual(len(users["test_user"].get_habit_by_name("Exercise").completion_dates), 1)
+
+    def test_compact_drops_buffered_records(self):
+        self.journal.flush_delay = 60
+        habit = self.users["test_user"].get_habit_by_name("Exercise")
+        habit.add_completion(datetime(2023, 1, 1))
+        self.journal.complete("test_user", "Exercise", datetime(2023, 1, 1))
+        self.journal.compact()
+        self.journal.flush()
+        self.assertEqual(self.journal_lines(), 0)
+        users = Journal(self.snapshot_path).load()
+        self.assertEqual(len(users["test_user"].get_habit_by_name("Exercise").completion_dates), 1)
+
+    def completions(self, users, habit_name="Exercise"):
+        return list(users["test_user"].get_habit_by_name(habit_name).completion_dates)
+
+    def test_merges_completions_from_other_writers(self):
+        other = Journal(self.snapshot_path)
+        other_users = other.load()
+        self.journal.complete("test_user", "Exercise", datetime(2023, 1, 2))
+        other_users["test_user"].get_habit_by_name("Exercise").add_completion(datetime(2023, 1, 1))
+        other.complete("test_user", "Exercise", datetime(2023, 1, 1))
+        # The first writer's record is merged into the other writer's users before it appends
+        self.assertEqual(self.completions(other_users), [datetime(2023, 1, 1), datetime(2023, 1, 2)])
+        other.compact()
+        users = Journal(self.snapshot_path).load()
+        self.assertEqual(self.completions(users), [datetime(2023, 1, 1), datetime(2023, 1, 2)])
+
+    def test_merges_reminders_from_other_writers(self):
+        other = Journal(self.snapshot_path)
+        other_users = other.load()
+        self.journal.record_reminders({("test_user", "Exercise"): datetime(2023, 1, 2, 9)})
+        other.complete("test_user", "Exercise", datetime(2023, 1, 1))
+        self.assertEqual(other_users["test_user"].get_habit_by_name("Exercise").last_reminded, datetime(2023, 1, 2, 9))
+        # Reminder times commute with local changes, so the loaded users can still be written as they are
+        self.assertFalse(other._diverged)
+        other.compact()
+        habit = Journal(self.snapshot_path).load()["test_user"].get_habit_by_name("Exercise")
+        self.assertEqual(habit.last_reminded, datetime(2023, 1, 2, 9))
+
+    def test_other_changes_rebuild_from_files(self):
+        other = Journal(self.snapshot_path)
+        other.load()
+        self.journal.add_habit("test_user", Habit("Read", "weekly"))
+        self.journal.set_frequency("test_user", "Exercise", "weekly")
+        other.set_frequency("test_user", "Exercise", "monthly")
+        other.compact()
+        users = Journal(self.snapshot_path).load()
+        self.assertTrue(users["test_user"].has_habit("Read"))
+        # The journal's order decides between conflicting changes
+        self.assertEqual(users["test_user"].get_habit_by_name("Exercise").frequency, "monthly")
+
+    def test_compaction_by_another_writer_is_not_undone(self):
+        other = Journal(self.snapshot_path)
+        habit = Habit("Read", "weekly")
+        other.load()["test_user"].add_habit(habit)
+        other.add_habit("test_user", habit)
+        other.compact()
+        self.users["test_user"].get_habit_by_name("Exercise").add_completion(datetime(2023, 1, 1))
+        self.journal.complete("test_user", "Exercise", datetime(2023, 1, 1))
+        self.journal.compact()
+        users = Journal(self.snapshot_path).load()
+        self.assertTrue(users["test_user"].has_habit("Read"))
+        self.assertEqual(self.completions(users), [datetime(2023, 1, 1)])
+
+    def test_appends_after_a_torn_line(self):
+        with open(self.journal.journal_path, 'a') as f:
+            f.write('{"op": "complete", "usern')
+        Journal(self.snapshot_path).complete("test_user", "Exercise", datetime(2023, 1, 1))
+        users = Journal(self.snapshot_path).load()
+        self.assertEqual(self.completions(users), [datetime(2023, 1, 1)])
+
+    def test_create_user_records_habits(self):
+        user = User("other_user", "other_user@example.com")
+        user.add_habit(Habit("Read", "weekly"))
+        self.journal.create_user(user)
+        users = Journal(self.snapshot_path).load()
+        self.assertTrue(users["other_user"].has_habit("Read"))
+
+    def test_concurrent_writers(self):
+        user = User("test_user", "test_user@example.com")
+        for name in ("habit0", "habit1", "habit2"):
+            user.add_habit(Habit(name, "daily"))
+        User.save_all_to_json({"test_user": user}, self.snapshot_path)
+        processes = [multiprocessing.Process(target=complete_many, args=(self.snapshot_path, f"habit{i}", 40))
+                     for i in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+        users = Journal(self.snapshot_path).load()
+        for i in range(3):
+            self.assertEqual(len(self.completions(users, f"habit{i}")), 40)
+
+if __name__ == '__main__':
+    unittest.main()
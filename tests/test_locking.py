@@ -0,0 +1,150 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime
+from src.habit import Habit
+from src.locking import FileLock, atomic_write, file_version, lock_for
+from src.user import User
+
+class TestFileLock(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, 'users_data.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_reentrant(self):
+        lock = lock_for(self.file_path)
+        self.assertIs(lock, lock_for(self.file_path))
+        with lock:
+            with lock_for(self.file_path):
+                pass
+        self.assertTrue(os.path.exists(f"{self.file_path}.lock"))
+
+    @unittest.skipIf(sys.platform == 'win32', "uses fcntl")
+    def test_excludes_other_processes(self):
+        script = ("import fcntl, os, sys\n"
+                  "fd = os.open(sys.argv[1], os.O_RDWR)\n"
+                  "try:\n"
+                  "    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)\n"
+                  "    print('acquired')\n"
+                  "except BlockingIOError:\n"
+                  "    print('blocked')\n")
+        lock = FileLock(f"{self.file_path}.lock")
+        with lock:
+            result = subprocess.run([sys.executable, '-c', script, lock.lock_path], capture_output=True, text=True)
+            self.assertEqual(result.stdout.strip(), 'blocked')
+        result = subprocess.run([sys.executable, '-c', script, lock.lock_path], capture_output=True, text=True)
+        self.assertEqual(result.stdout.strip(), 'acquired')
+
+    def test_threads_wait(self):
+        lock = FileLock(f"{self.file_path}.lock")
+        events = []
+
+        def worker():
+            with lock:
+                events.append('worker')
+
+        with lock:
+            thread = threading.Thread(target=worker)
+            thread.start()
+            time.sleep(0.05)
+            events.append('main')
+        thread.join()
+        self.assertEqual(events, ['main', 'worker'])
+
+class TestAtomicWrite(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, 'habits.json')
+        with open(self.file_path, 'w') as f:
+            f.write('old')
+        os.chmod(self.file_path, 0o640)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_replaces_file(self):
+        with atomic_write(self.file_path) as f:
+            f.write('new')
+            # Readers see the old contents until the write completes
+            with open(self.file_path) as reader:
+                self.assertEqual(reader.read(), 'old')
+        with open(self.file_path) as f:
+            self.assertEqual(f.read(), 'new')
+        self.assertEqual(os.stat(self.file_path).st_mode & 0o777, 0o640)
+
+    def test_failed_write_keeps_old_file(self):
+        with self.assertRaises(RuntimeError):
+            with atomic_write(self.file_path) as f:
+                f.write('partial')
+                raise RuntimeError("crash")
+        with open(self.file_path) as f:
+            self.assertEqual(f.read(), 'old')
+        self.assertEqual(os.listdir(self.tmp_dir.name), ['habits.json'])
+
+class TestConcurrentSaves(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, 'users_data.json')
+        user = User("test_user", "test_user@example.com")
+        user.add_habit(Habit("Exercise", "daily"))
+        User.save_all_to_json({"test_user": user}, self.file_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_file_version(self):
+        self.assertIsNone(file_version(os.path.join(self.tmp_dir.name, 'missing.json')))
+        version = file_version(self.file_path)
+        User.save_all_to_json(User.load_all_from_json(self.file_path), self.file_path)
+        self.assertNotEqual(file_version(self.file_path), version)
+
+    def test_save_merges_completions_saved_since_load(self):
+        first = User.load_all_from_json(self.file_path)
+        second = User.load_all_from_json(self.file_path)
+        first["test_user"].get_habit_by_name("Exercise").add_completion(datetime(2024, 1, 1))
+        second["test_user"].get_habit_by_name("Exercise").add_completion(datetime(2024, 1, 2))
+        User.save_all_to_json(first, self.file_path)
+        User.save_all_to_json(second, self.file_path)
+        saved = User.load_all_from_json(self.file_path)["test_user"].get_habit_by_name("Exercise")
+        self.assertEqual(saved.completion_dates, [datetime(2024, 1, 1), datetime(2024, 1, 2)])
+        # Saving again does not merge the writer's own save back in
+        second["test_user"].get_habit_by_name("Exercise").add_completion(datetime(2024, 1, 3))
+        User.save_all_to_json(second, self.file_path)
+        saved = User.load_all_from_json(self.file_path)["test_user"].get_habit_by_name("Exercise")
+        self.assertEqual(len(saved.completion_dates), 3)
+
+    def test_structural_changes_are_last_writer_wins(self):
+        first = User.load_all_from_json(self.file_path)
+        second = User.load_all_from_json(self.file_path)
+        first["test_user"].add_habit(Habit("Read", "weekly"))
+        User.save_all_to_json(first, self.file_path)
+        User.save_all_to_json(second, self.file_path)
+        saved = User.load_all_from_json(self.file_path)["test_user"]
+        self.assertFalse(saved.has_habit("Read"))
+
+    def test_habits_save_all_merges_completions(self):
+        cwd = os.getcwd()
+        os.chdir(self.tmp_dir.name)
+        try:
+            Habit.save_all([Habit("Exercise", "daily")])
+            first, second = Habit.load_all(), Habit.load_all()
+            first[0].add_completion(datetime(2024, 1, 1))
+            second[0].add_completion(datetime(2024, 1, 2))
+            Habit.save_all(first)
+            Habit.save_all(second)
+            self.assertEqual(Habit.load_all()[0].completion_dates, [datetime(2024, 1, 1), datetime(2024, 1, 2)])
+        finally:
+            os.chdir(cwd)
+
+if __name__ == '__main__':
+    unittest.main()
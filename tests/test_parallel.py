@@ -0,0 +1,84 @@
+import os
+import pickle
+import random
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import numpy as np
+from src.user import User
+from src.habit import Habit
+from src.storage import JSONStorage
+from src.analytics import get_completion_rate, get_leaderboard
+from src.parallel import ParallelAnalytics, pack_shard, analyze_shard, period_numbers
+
+def make_users(n_users: int, seed: int = 42) -> dict:
+    rng = random.Random(seed)
+    users = {}
+    for i in range(n_users):
+        user = User(f"user{i}", f"user{i}@example.com")
+        for j, frequency in enumerate(['daily', 'weekly', 'monthly']):
+            habit = Habit(f"habit{j}", frequency, compact=bool(i % 2))
+            date = datetime(2022, 11, 1) + timedelta(minutes=rng.randrange(60 * 24 * 30))
+            dates = []
+            for _ in range(rng.randrange(0, 30)):
+                dates.append(date)
+                date += timedelta(hours=rng.choice([0, 12, 24, 25, 24 * 7, 24 * 8, 24 * 31, 24 * 60]))
+            habit.completion_dates = dates
+            user.add_habit(habit)
+        users[user.username] = user
+    return users
+
+class TestParallelAnalytics(unittest.TestCase):
+
+    def setUp(self):
+        self.users = make_users(50)
+        self.start, self.end = datetime(2022, 12, 3, 12), datetime(2023, 6, 1)
+
+    def test_matches_single_process_analytics(self):
+        with ThreadPoolExecutor(2) as executor:
+            summary = ParallelAnalytics(2, shard_size=7).run(self.users.values(), 5, self.start, self.end, executor)
+        for user in self.users.values():
+            for habit in user.get_habits():
+                key = (user.username, habit.name)
+                self.assertEqual(summary.longest[key], habit.get_longest_streak())
+                self.assertAlmostEqual(summary.rates[key], get_completion_rate(habit, self.start, self.end))
+
+    def test_leaderboard_matches_streaming_leaderboard(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, 'users_data.json')
+            User.save_all_to_json(self.users, file_path)
+            storage = JSONStorage(file_path)
+            summary = ParallelAnalytics(2, shard_size=7).run(storage.iter_users(), k=8)
+            self.assertEqual(summary.leaderboard, get_leaderboard(storage, k=8))
+            self.assertEqual(summary.rates, {})
+            storage.close()
+
+    def test_empty(self):
+        summary = ParallelAnalytics(2).run([])
+        self.assertEqual(summary, ({}, {}, []))
+
+    def test_shards_are_flat_arrays(self):
+        shard = pack_shard(list(self.users.values())[:10])
+        self.assertEqual(len(shard.keys), 30)
+        self.assertEqual(shard.timestamps.dtype, np.int64)
+        self.assertEqual(shard.lengths.sum(), len(shard.timestamps))
+        self.assertLess(len(pickle.dumps(shard)), len(pickle.dumps(list(self.users.values())[:10])) / 2)
+
+    def test_unsupported_frequency(self):
+        user = User("test_user", "test_user@example.com")
+        habit = Habit("Exercise", "hourly")
+        habit.completion_dates = [datetime(2023, 1, 1), datetime(2023, 1, 2)]
+        user.add_habit(habit)
+        with self.assertRaises(ValueError):
+            analyze_shard(pack_shard([user]))
+
+    def test_period_numbers(self):
+        dates = np.array(['2023-01-01T23:00', '2023-01-02T00:00', '2023-01-31', '2023-02-01'], dtype='datetime64[us]')
+        # Jan 1 2023 was a Sunday
+        self.assertEqual(np.diff(period_numbers(dates, 'daily')).tolist(), [1, 29, 1])
+        self.assertEqual(np.diff(period_numbers(dates, 'weekly')).tolist(), [1, 4, 0])
+        self.assertEqual(np.diff(period_numbers(dates, 'monthly')).tolist(), [0, 0, 1])
+
+if __name__ == '__main__':
+    unittest.main()
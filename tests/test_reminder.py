@@ -1,9 +1,14 @@
 import os
 import unittest
+from email.mime.text import MIMEText
 from unittest.mock import patch, MagicMock
 from src.user import User
 from src.habit import Habit
-from src.reminder import Reminder
+from src.reminder import (Reminder, SMTPConnectionPool, PUSH_TIMEOUT, SMTP_HOST, SMTP_PORT, close_smtp_pool,
+                          create_push_session, get_smtp_pool, send_email_reminders, smtp_settings)
+from stand_ins import LocalSMTPServer, LocalPushServer
+
+CREDENTIALS = {'EMAIL_USER': "sender@example.com", 'EMAIL_PASS': "secret"}
 
 class TestReminder(unittest.TestCase):
 
@@ -15,6 +20,10 @@ class TestReminder(unittest.TestCase):
         self.user.add_habit(self.habit2)
         self.reminder = Reminder(self.user)
 
+    def tearDown(self):
+        close_smtp_pool()
+
+    @patch.dict(os.environ, CREDENTIALS)
     @patch('smtplib.SMTP_SSL')
     def test_send_email_reminder(self, mock_smtp):
         mock_server = MagicMock()
@@ -22,11 +31,11 @@ class TestReminder(unittest.TestCase):
 
         self.reminder.send_email_reminder(self.habit1)
 
-        mock_smtp.assert_called_once_with('smtp.gmail.com', 465)
-        mock_server.login.assert_called_once_with(os.getenv('EMAIL_USER'), os.getenv('EMAIL_PASS'))
+        mock_smtp.assert_called_once_with(SMTP_HOST, SMTP_PORT, timeout=30.0)
+        mock_server.login.assert_called_once_with("sender@example.com", "secret")
         mock_server.sendmail.assert_called_once()
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_send_push_notification(self, mock_post):
         mock_response = MagicMock()
         mock_response.raise_for_status = MagicMock()
@@ -47,11 +56,12 @@ class TestReminder(unittest.TestCase):
                     'title': f"Reminder: {self.habit1.name}",
                     'body': f"Don't forget to complete your habit: {self.habit1.name} ({self.habit1.frequency})",
                 },
-            }
+            },
+            timeout=PUSH_TIMEOUT,
         )
 
     @patch('smtplib.SMTP_SSL')
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_send_reminders(self, mock_post, mock_smtp):
         mock_server = MagicMock()
         mock_smtp.return_value = mock_server
@@ -62,8 +72,232 @@ class TestReminder(unittest.TestCase):
 
         self.reminder.send_reminders()
 
-        self.assertEqual(mock_smtp.call_count, 2)
+        # Both emails go over one pooled connection
+        self.assertEqual(mock_smtp.call_count, 1)
+        self.assertEqual(mock_server.sendmail.call_count, 2)
         self.assertEqual(mock_post.call_count, 2)
 
+class TestDigest(unittest.TestCase):
+
+    @patch.dict(os.environ, CREDENTIALS)
+    def setUp(self):
+        self.user = User(username="test_user", email="test_user@example.com")
+        self.habit1 = Habit(name="Exercise", frequency="daily")
+        self.habit2 = Habit(name="Read", frequency="weekly")
+        self.user.add_habit(self.habit1)
+        self.user.add_habit(self.habit2)
+        self.reminder = Reminder(self.user)
+
+    def tearDown(self):
+        close_smtp_pool()
+
+    def test_single_habit_format_unchanged(self):
+        msg = self.reminder.build_email(self.habit1)
+        self.assertEqual(msg['Subject'], "Reminder: Exercise")
+        self.assertEqual(msg.get_payload(), "Don't forget to complete your habit: Exercise (daily)")
+        self.assertEqual(self.reminder.build_push_payload([self.habit1], "token")['notification'],
+                         {'title': "Reminder: Exercise", 'body': "Don't forget to complete your habit: Exercise (daily)"})
+
+    def test_digest_email(self):
+        msg = self.reminder.build_digest_email([self.habit1, self.habit2])
+        self.assertEqual(msg['Subject'], "Reminder: Exercise, Read")
+        self.assertEqual(msg['To'], "test_user@example.com")
+        self.assertEqual(msg.get_payload(), "Don't forget to complete your habits:\n- Exercise (daily)\n- Read (weekly)")
+
+    def test_build_emails(self):
+        self.assertEqual(len(self.reminder.build_emails()), 2)
+        self.assertEqual(len(self.reminder.build_emails(digest=True)), 1)
+        self.assertEqual(self.reminder.build_emails([], digest=True), [])
+
+    @patch('smtplib.SMTP_SSL')
+    @patch('requests.Session.post')
+    def test_send_reminders_digest(self, mock_post, mock_smtp):
+        mock_server = MagicMock()
+        mock_smtp.return_value = mock_server
+
+        self.reminder.send_reminders(digest=True)
+
+        self.assertEqual(mock_smtp.call_count, 1)
+        self.assertEqual(mock_server.sendmail.call_count, 1)
+        self.assertEqual(mock_post.call_count, 1)
+        notification = mock_post.call_args.kwargs['json']['notification']
+        self.assertEqual(notification['title'], "Reminder: Exercise, Read")
+
+    @patch('smtplib.SMTP_SSL')
+    @patch('requests.Session.post')
+    def test_send_reminders_digest_no_habits(self, mock_post, mock_smtp):
+        self.reminder.user = User(username="idle_user", email="idle_user@example.com")
+        self.reminder.send_reminders(digest=True)
+        mock_smtp.assert_not_called()
+        mock_post.assert_not_called()
+
+class TestSMTPConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalSMTPServer().__enter__()
+
+    def tearDown(self):
+        self.server.__exit__(None, None, None)
+
+    def make_pool(self, **kwargs) -> SMTPConnectionPool:
+        return SMTPConnectionPool("sender@example.com", "secret", host='127.0.0.1', port=self.server.port,
+                                  use_ssl=False, timeout=5, **kwargs)
+
+    def make_message(self, recipient: str, subject: str = "Reminder: Exercise") -> MIMEText:
+        msg = MIMEText("Don't forget to complete your habit: Exercise (daily)")
+        msg['Subject'] = subject
+        msg['From'] = "sender@example.com"
+        msg['To'] = recipient
+        return msg
+
+    def test_connection_reused(self):
+        with self.make_pool() as pool:
+            results = pool.send_many([self.make_message(f"user{i}@example.com") for i in range(20)])
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual(len(self.server.messages), 20)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.server.logins, 1)
+
+    def test_reconnect_on_failure(self):
+        self.server.drop_after = 2
+        with self.make_pool() as pool:
+            results = pool.send_many([self.make_message(f"user{i}@example.com") for i in range(5)])
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual(len(self.server.messages), 5)
+        self.assertEqual(self.server.connections, 3)
+        self.assertEqual([result.attempts for result in results], [1, 1, 2, 1, 2])
+
+    def test_per_message_outcomes(self):
+        with self.make_pool() as pool:
+            results = pool.send_many([self.make_message("a@example.com"), self.make_message("reject@example.com"),
+                                      self.make_message("b@example.com")])
+        self.assertEqual([result.success for result in results], [True, False, True])
+        self.assertEqual(results[1].recipient, "reject@example.com")
+        self.assertIn("550", results[1].error)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_unreachable_server(self):
+        pool = SMTPConnectionPool(None, None, host='127.0.0.1', port=1, use_ssl=False, timeout=1, max_retries=1)
+        result = pool.send(self.make_message("a@example.com"))
+        self.assertFalse(result.success)
+        self.assertEqual(result.attempts, 2)
+
+    def test_pool_size(self):
+        with self.make_pool(size=3) as pool:
+            results = pool.send_many([self.make_message(f"user{i}@example.com") for i in range(30)])
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual(len(self.server.messages), 30)
+        self.assertLessEqual(self.server.connections, 3)
+
+    @patch.dict(os.environ, CREDENTIALS)
+    def test_send_email_reminders_for_many_users(self):
+        users = []
+        for i in range(3):
+            user = User(f"user{i}", f"user{i}@example.com")
+            user.add_habit(Habit("Exercise", "daily"))
+            user.add_habit(Habit("Read", "weekly"))
+            users.append(user)
+        with self.make_pool() as pool:
+            results = send_email_reminders(users, pool)
+        self.assertEqual(len(results), 6)
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.server.messages[1]['recipients'], ["user0@example.com"])
+        self.assertIn("Subject: Reminder: Read", self.server.messages[1]['data'])
+
+    @patch.dict(os.environ, CREDENTIALS)
+    def test_send_email_digests_for_many_users(self):
+        users = []
+        for i in range(3):
+            user = User(f"user{i}", f"user{i}@example.com")
+            user.add_habit(Habit("Exercise", "daily"))
+            user.add_habit(Habit("Read", "weekly"))
+            users.append(user)
+        users.append(User("idle_user", "idle_user@example.com"))
+        with self.make_pool() as pool:
+            results = send_email_reminders(users, pool, digest=True)
+        self.assertEqual([result.recipient for result in results], [f"user{i}@example.com" for i in range(3)])
+        self.assertIn("Subject: Reminder: Exercise, Read", self.server.messages[0]['data'])
+
+class TestSMTPSettings(unittest.TestCase):
+
+    def setUp(self):
+        self.server = LocalSMTPServer().__enter__()
+        self.environ = patch.dict(os.environ, dict(CREDENTIALS, SMTP_HOST='127.0.0.1', SMTP_PORT=str(self.server.port),
+                                                   SMTP_SSL='false'))
+        self.environ.start()
+        self.user = User(username="test_user", email="test_user@example.com")
+        self.user.add_habit(Habit(name="Exercise", frequency="daily"))
+        self.user.add_habit(Habit(name="Read", frequency="weekly"))
+
+    def tearDown(self):
+        close_smtp_pool()
+        self.environ.stop()
+        self.server.__exit__(None, None, None)
+
+    def test_settings(self):
+        settings = smtp_settings()
+        self.assertEqual((settings['host'], settings['port'], settings['use_ssl']),
+                         ('127.0.0.1', self.server.port, False))
+        self.assertEqual(settings['email_user'], "sender@example.com")
+        with patch.dict(os.environ, {'SMTP_HOST': '', 'SMTP_PORT': '', 'SMTP_SSL': ''}):
+            settings = smtp_settings()
+        self.assertEqual((settings['host'], settings['port'], settings['use_ssl']), ('smtp.gmail.com', 465, True))
+
+    @patch('requests.Session.post')
+    def test_reminders_share_a_connection(self, mock_post):
+        Reminder(self.user).send_reminders()
+        Reminder(User("other", "other@example.com")).send_email_digest(self.user.get_habits())
+        self.assertEqual([message['recipients'] for message in self.server.messages],
+                         [["test_user@example.com"], ["test_user@example.com"], ["other@example.com"]])
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.server.logins, 1)
+
+    def test_pool_follows_settings(self):
+        pool = get_smtp_pool()
+        self.assertIs(get_smtp_pool(), pool)
+        with patch.dict(os.environ, {'SMTP_PORT': '2525'}):
+            self.assertEqual(get_smtp_pool().port, 2525)
+        self.assertIsNot(get_smtp_pool(), pool)
+
+class TestPushSession(unittest.TestCase):
+
+    @patch.dict(os.environ, CREDENTIALS)
+    def setUp(self):
+        self.server = LocalPushServer().__enter__()
+        self.user = User(username="test_user", email="test_user@example.com")
+        self.habit = Habit(name="Exercise", frequency="daily")
+        self.user.add_habit(self.habit)
+        self.reminder = Reminder(self.user, session=create_push_session(max_connections=2), push_url=self.server.url)
+
+    def tearDown(self):
+        self.reminder.session.close()
+        self.server.__exit__(None, None, None)
+
+    def test_connection_kept_alive(self):
+        for _ in range(5):
+            self.reminder.send_push_notification(self.habit, "device_token")
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertEqual(len(self.server.clients), 1)
+
+    def test_send_push_batch(self):
+        tokens = [f"device{i}" for i in range(20)]
+        results = self.reminder.send_push_batch([self.habit], tokens, max_workers=4)
+        self.assertEqual([result.recipient for result in results], tokens)
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual(sorted(request['json']['to'] for request in self.server.requests), sorted(tokens))
+        # Four threads share the session's two connections
+        self.assertLessEqual(len(self.server.clients), 2)
+
+    def test_send_push_batch_failure(self):
+        self.server.failures_left = 1
+        results = self.reminder.send_push_batch([self.habit], ["device0", "device1"], max_workers=1)
+        self.assertEqual([result.success for result in results], [False, True])
+        self.assertIn("503", results[0].error)
+
+    @patch.dict(os.environ, CREDENTIALS)
+    def test_shared_session(self):
+        self.assertIs(Reminder(self.user).session, Reminder(User("other", "other@example.com")).session)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
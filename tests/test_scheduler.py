@@ -0,0 +1,149 @@
+import unittest
+from datetime import datetime, timedelta
+from src.user import User
+from src.habit import Habit
+from src.scheduler import ReminderScheduler, next_due, advance
+
+NOW = datetime(2024, 3, 10, 12, 0)
+
+def make_habit(name: str, frequency: str, completions=()) -> Habit:
+    habit = Habit(name=name, frequency=frequency)
+    habit.creation_date = datetime(2024, 1, 1)
+    habit.completion_dates = list(completions)
+    return habit
+
+class TestNextDue(unittest.TestCase):
+
+    def test_never_completed(self):
+        self.assertEqual(next_due(make_habit("Read", "daily")), datetime(2024, 1, 1))
+
+    def test_daily_and_weekly(self):
+        self.assertEqual(next_due(make_habit("Read", "daily", [NOW - timedelta(days=3), NOW])), NOW + timedelta(days=1))
+        self.assertEqual(next_due(make_habit("Gym", "weekly", [NOW])), NOW + timedelta(weeks=1))
+
+    def test_monthly(self):
+        self.assertEqual(next_due(make_habit("Budget", "monthly", [NOW])), datetime(2024, 4, 1))
+        self.assertEqual(advance(datetime(2024, 12, 15), "monthly"), datetime(2025, 1, 1))
+
+    def test_unsupported_frequency(self):
+        with self.assertRaises(ValueError):
+            next_due(make_habit("Read", "hourly", [NOW]))
+
+class TestReminderScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.user = User(username="test_user", email="test_user@example.com")
+        self.daily = make_habit("Exercise", "daily", [NOW - timedelta(hours=30)])
+        self.weekly = make_habit("Read", "weekly", [NOW - timedelta(days=2)])
+        self.monthly = make_habit("Budget", "monthly", [datetime(2024, 2, 20)])
+        for habit in (self.daily, self.weekly, self.monthly):
+            self.user.add_habit(habit)
+        self.scheduler = ReminderScheduler()
+        self.scheduler.add_users([self.user])
+
+    def test_tick_pops_only_due_habits(self):
+        self.assertEqual(self.scheduler.tick(NOW), [(self.user, [self.monthly, self.daily])])
+        self.assertEqual(self.scheduler.tick(NOW), [])
+        self.assertEqual(len(self.scheduler), 3)
+
+    def test_next_due_time(self):
+        self.assertEqual(self.scheduler.next_due_time(), datetime(2024, 3, 1))
+        self.scheduler.mark_reminded(self.scheduler.tick(NOW), NOW)
+        self.assertEqual(self.scheduler.next_due_time(), NOW + timedelta(hours=18))
+
+    def test_incomplete_habit_reminded_once_per_period(self):
+        self.scheduler.mark_reminded(self.scheduler.tick(NOW), NOW)
+        reminders = self.scheduler.tick(NOW + timedelta(days=1))
+        self.assertEqual(reminders, [(self.user, [self.daily])])
+
+    def test_rescheduled_only_after_delivery(self):
+        reminders = self.scheduler.tick(NOW)
+        self.assertEqual(self.scheduler.next_due_time(), NOW + timedelta(days=5))
+        self.assertEqual(self.scheduler.tick(NOW), [])
+        self.scheduler.retry(reminders)
+        self.assertEqual(self.scheduler.tick(NOW), reminders)
+        self.scheduler.mark_reminded([(self.user, [self.daily])], NOW)
+        self.scheduler.retry([(self.user, [self.monthly])])
+        self.assertEqual(self.daily.last_reminded, NOW)
+        self.assertIsNone(self.monthly.last_reminded)
+        self.assertEqual(self.scheduler.tick(NOW + timedelta(hours=1)), [(self.user, [self.monthly])])
+
+    def test_completion_while_reminding(self):
+        reminders = self.scheduler.tick(NOW)
+        self.daily.add_completion(NOW)
+        # The completion rescheduled the habit; the late outcome doesn't add a second entry
+        self.scheduler.retry(reminders)
+        self.assertEqual(self.scheduler.tick(NOW), [(self.user, [self.monthly])])
+        self.assertEqual(self.scheduler.tick(NOW + timedelta(days=1)), [(self.user, [self.daily])])
+
+    def test_last_reminded_seeds_due_time(self):
+        habit = make_habit("Meditate", "daily")
+        habit.last_reminded = NOW - timedelta(hours=1)
+        self.assertEqual(next_due(habit), datetime(2024, 3, 11))
+        self.weekly.last_reminded = NOW
+        self.assertEqual(next_due(self.weekly), NOW + timedelta(days=5))
+        self.monthly.last_reminded = datetime(2024, 3, 1, 9)
+        self.assertEqual(next_due(self.monthly), datetime(2024, 4, 1))
+        # A fresh scheduler in another run doesn't remind again within the period
+        scheduler = ReminderScheduler()
+        scheduler.add_users([self.user])
+        self.assertEqual(scheduler.tick(NOW), [(self.user, [self.daily])])
+
+    def test_completion_reschedules(self):
+        self.daily.add_completion(NOW)
+        self.assertEqual(self.scheduler.tick(NOW), [(self.user, [self.monthly])])
+        self.assertEqual(self.scheduler.tick(NOW + timedelta(days=1)), [(self.user, [self.daily])])
+
+    def test_habit_done_this_period_is_skipped(self):
+        # Appended without notifying the scheduler, as a completion made through another copy would be
+        self.daily.completion_dates.append(NOW - timedelta(hours=1))
+        self.assertEqual(self.scheduler.tick(NOW), [(self.user, [self.monthly])])
+        self.assertEqual(self.scheduler.tick(NOW + timedelta(days=1)), [(self.user, [self.daily])])
+
+    def test_frequency_change_reschedules(self):
+        self.weekly.frequency = "daily"
+        self.assertEqual(self.scheduler.tick(NOW), [(self.user, [self.monthly, self.weekly, self.daily])])
+
+    def test_remove_habit(self):
+        self.scheduler.remove_habit("test_user", "Exercise")
+        self.assertNotIn(("test_user", "Exercise"), self.scheduler)
+        self.assertEqual(self.scheduler.tick(NOW), [(self.user, [self.monthly])])
+        # A removed habit no longer reschedules itself
+        self.daily.add_completion(NOW)
+        self.assertEqual(self.scheduler.tick(NOW + timedelta(days=2)), [])
+
+    def test_remove_user(self):
+        self.scheduler.remove_user("test_user")
+        self.assertEqual(len(self.scheduler), 0)
+        self.assertIsNone(self.scheduler.next_due_time())
+        self.assertEqual(self.scheduler.tick(NOW + timedelta(days=60)), [])
+
+    def test_close(self):
+        self.scheduler.tick(NOW)
+        self.scheduler.close()
+        self.assertEqual(len(self.scheduler), 0)
+        for habit in (self.daily, self.weekly, self.monthly):
+            self.assertFalse(habit._listeners)
+        # Later completions no longer reach the closed scheduler
+        self.daily.add_completion(NOW)
+        self.assertIsNone(self.scheduler.next_due_time())
+
+    def test_add_habit(self):
+        habit = make_habit("Meditate", "daily")
+        self.user.add_habit(habit)
+        self.scheduler.add_habit("test_user", habit)
+        self.assertIn(habit, self.scheduler.tick(NOW)[0][1])
+
+    def test_many_users(self):
+        users = []
+        for i in range(100):
+            user = User(username=f"user{i}", email=f"user{i}@example.com")
+            user.add_habit(make_habit("Exercise", "daily", [NOW - timedelta(hours=i)]))
+            users.append(user)
+        scheduler = ReminderScheduler()
+        scheduler.add_users(users)
+        due = scheduler.tick(NOW)
+        self.assertEqual(sorted(user.username for user, _ in due), sorted(f"user{i}" for i in range(24, 100)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from src.user import User
+from src.habit import Habit
+from src.completions import CompletionLog
+from src.journal import Journal
+from src.serializers import BinarySnapshot, get_serializer, save_users, load_users, convert
+
+class TestSerializers(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.users = {}
+        for username in ("alice", "bob"):
+            user = User(username, f"{username}@example.com")
+            exercise = Habit("Exercise", "daily")
+            exercise.completion_dates = [datetime(2023, 1, day, 7, 30, 0, 250) for day in (1, 2, 3, 5)]
+            user.add_habit(exercise)
+            user.add_habit(Habit("Read", "weekly"))
+            self.users[username] = user
+        self.users["carol"] = User("carol", "carol@example.com")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.tmp_dir.name, name)
+
+    def as_dicts(self, users):
+        return {username: user.to_dict() for username, user in users.items()}
+
+    def test_get_serializer(self):
+        self.assertEqual(get_serializer("users.json").name, "json")
+        self.assertEqual(get_serializer("users.bin").name, "binary")
+        self.assertEqual(get_serializer("users.dat", "binary").name, "binary")
+        with self.assertRaises(ValueError):
+            get_serializer("users.dat")
+        with self.assertRaises(ValueError):
+            get_serializer("users.json", "xml")
+
+    def test_binary_round_trip(self):
+        save_users(self.users, self.path("users.bin"))
+        for compact in (False, True):
+            loaded = load_users(self.path("users.bin"), compact=compact)
+            self.assertEqual(self.as_dicts(loaded), self.as_dicts(self.users))
+        self.assertIsInstance(loaded["alice"].get_habit_by_name("Exercise").completion_dates, CompletionLog)
+
+    def test_compact_users_round_trip(self):
+        save_users(self.users, self.path("users.json"))
+        compact = load_users(self.path("users.json"), compact=True)
+        save_users(compact, self.path("users.bin"))
+        self.assertEqual(self.as_dicts(load_users(self.path("users.bin"))), self.as_dicts(self.users))
+
+    def test_convert(self):
+        save_users(self.users, self.path("users.json"))
+        self.assertEqual(convert(self.path("users.json"), self.path("users.bin")), 3)
+        self.assertEqual(convert(self.path("users.bin"), self.path("copy.json")), 3)
+        with open(self.path("users.json")) as original, open(self.path("copy.json")) as copy:
+            self.assertEqual(copy.read(), original.read())
+
+    def test_convert_replays_journal(self):
+        save_users(self.users, self.path("users.json"))
+        journal = Journal(self.path("users.json"))
+        journal.load()
+        journal.create_user(User("dave", "dave@example.com"))
+        journal.complete("alice", "Exercise", datetime(2023, 1, 4))
+        self.assertEqual(convert(self.path("users.json"), self.path("users.bin")), 4)
+        converted = load_users(self.path("users.bin"))
+        self.assertIn("dave", converted)
+        self.assertEqual(len(converted["alice"].get_habit_by_name("Exercise").completion_dates), 5)
+
+        # Users that have only been journaled
+        journal = Journal(self.path("new.json"))
+        journal.load()
+        journal.create_user(User("erin", "erin@example.com"))
+        self.assertEqual(convert(self.path("new.json"), self.path("new.bin")), 1)
+        with self.assertRaises(FileNotFoundError):
+            convert(self.path("missing.json"), self.path("missing.bin"))
+
+    def test_snapshot_timestamps_view(self):
+        save_users(self.users, self.path("users.bin"))
+        with BinarySnapshot(self.path("users.bin")) as snapshot:
+            view = snapshot.timestamps("bob", "Exercise")
+            expected = CompletionLog(self.users["bob"].get_habit_by_name("Exercise").completion_dates)
+            self.assertEqual(list(view), list(expected.timestamps))
+            self.assertEqual(len(snapshot.timestamps("bob", "Read")), 0)
+            if isinstance(view, memoryview):
+                view.release()
+
+    def test_not_a_snapshot(self):
+        save_users(self.users, self.path("users.json"))
+        with self.assertRaises(ValueError):
+            load_users(self.path("users.json"), "binary")
+
+if __name__ == '__main__':
+    unittest.main()
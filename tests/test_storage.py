@@ -0,0 +1,162 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime
+from src.user import User
+from src.habit import Habit
+from src.storage import BinaryStorage, JSONStorage, SQLiteStorage, Storage, open_storage
+from src.serializers import BinarySerializer, load_users, save_users
+from src.analytics import get_all_habits, get_habits_by_period, get_longest_streak, get_longest_streak_all
+
+class StorageTests:
+    """
+    Tests run against every storage backend.
+    """
+    file_name = None
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, self.file_name)
+        self.storage = open_storage(self.file_path)
+        users = self.storage.load_users()
+        user = User("test_user", "test_user@example.com")
+        users[user.username] = user
+        self.storage.create_user(user)
+        for name, frequency in (("Exercise", "daily"), ("Read", "weekly")):
+            habit = Habit(name, frequency)
+            user.add_habit(habit)
+            self.storage.add_habit(user.username, habit)
+        for day in (1, 2, 3, 5):
+            completed_at = datetime(2023, 1, day)
+            user.get_habit_by_name("Exercise").add_completion(completed_at)
+            self.storage.complete(user.username, "Exercise", completed_at)
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmp_dir.cleanup()
+
+    def reopen(self):
+        self.storage.close()
+        self.storage = open_storage(self.file_path)
+        return self.storage.load_users()
+
+    def test_persisted(self):
+        users = self.reopen()
+        self.assertIn("test_user", users)
+        self.assertNotIn("other_user", users)
+        user = users["test_user"]
+        self.assertEqual([habit.name for habit in user.get_habits()], ["Exercise", "Read"])
+        self.assertEqual(user.get_habit_by_name("Exercise").completion_dates,
+                         [datetime(2023, 1, day) for day in (1, 2, 3, 5)])
+        self.assertEqual(user.get_habit_by_name("Exercise").get_longest_streak(), 3)
+
+    def test_set_frequency_and_remove(self):
+        self.storage.set_frequency("test_user", "Read", "monthly")
+        self.storage.remove_habit("test_user", "Exercise")
+        user = self.reopen()["test_user"]
+        self.assertEqual([habit.name for habit in user.get_habits()], ["Read"])
+        self.assertEqual(user.get_habit_by_name("Read").frequency, "monthly")
+
+        self.storage.remove_user("test_user")
+        self.assertNotIn("test_user", self.reopen())
+
+    def test_record_reminders(self):
+        reminded_at = datetime(2023, 1, 6, 9)
+        self.storage.record_reminders({("test_user", "Read"): reminded_at})
+        self.storage.record_reminders({("test_user", "Read"): datetime(2023, 1, 5)})
+        user = self.reopen()["test_user"]
+        self.assertEqual(user.get_habit_by_name("Read").last_reminded, reminded_at)
+        self.assertIsNone(user.get_habit_by_name("Exercise").last_reminded)
+
+    def test_completions_range(self):
+        self.assertEqual(self.storage.completions("test_user", "Exercise", datetime(2023, 1, 2), datetime(2023, 1, 5)),
+                         [datetime(2023, 1, 2), datetime(2023, 1, 3)])
+        self.assertEqual(len(self.storage.completions("test_user", "Exercise")), 4)
+
+    def test_analytics(self):
+        self.assertEqual(get_all_habits(self.storage), ["Exercise", "Read"])
+        self.assertEqual(get_habits_by_period("weekly", self.storage), ["Read"])
+        self.assertEqual(get_longest_streak("Exercise", self.storage), 3)
+        self.assertEqual(get_longest_streak_all(self.storage), "Exercise")
+
+    def test_find_habit(self):
+        self.assertEqual(self.storage.find_habit("Read").frequency, "weekly")
+        self.assertIsNone(self.storage.find_habit("Missing"))
+        self.assertEqual(get_longest_streak("Missing", self.storage), 0)
+
+class TestJSONStorage(StorageTests, unittest.TestCase):
+    file_name = 'users_data.json'
+
+    def test_backend(self):
+        self.assertIsInstance(self.storage, JSONStorage)
+
+    def test_storage_is_abstract(self):
+        with self.assertRaises(TypeError):
+            Storage()
+
+class TestBinaryStorage(StorageTests, unittest.TestCase):
+    file_name = 'users_data.bin'
+
+    def test_backend(self):
+        self.assertIsInstance(self.storage, BinaryStorage)
+
+    def test_compaction_writes_binary(self):
+        self.storage.journal.compact()
+        with open(self.file_path, 'rb') as f:
+            self.assertEqual(f.read(len(BinarySerializer.MAGIC)), BinarySerializer.MAGIC)
+        self.assertEqual(os.path.getsize(self.file_path + '.journal'), 0)
+        user = BinarySerializer().load(self.file_path)["test_user"]
+        self.assertEqual(len(user.get_habit_by_name("Exercise").completion_dates), 4)
+        self.assertEqual(len(self.reopen()["test_user"].get_habits()), 2)
+
+class TestSQLiteStorage(StorageTests, unittest.TestCase):
+    file_name = 'users_data.db'
+
+    def test_backend(self):
+        self.assertIsInstance(self.storage, SQLiteStorage)
+
+    def test_concurrent_writers(self):
+        other = SQLiteStorage(self.file_path)
+        try:
+            other.load_users()["test_user"]
+            other.complete("test_user", "Exercise", datetime(2023, 1, 6))
+            self.storage.complete("test_user", "Exercise", datetime(2023, 1, 7))
+        finally:
+            other.close()
+        self.assertEqual(len(self.storage.completions("test_user", "Exercise")), 6)
+
+    def test_unknown_user_or_habit(self):
+        with self.assertRaises(ValueError):
+            self.storage.complete("test_user", "Missing", datetime(2023, 1, 6))
+        with self.assertRaises(ValueError):
+            self.storage.complete("other_user", "Exercise", datetime(2023, 1, 6))
+        with self.assertRaises(ValueError):
+            self.storage.add_habit("other_user", Habit("Exercise", "daily"))
+        with self.assertRaises(ValueError):
+            self.storage.merge_completions({("test_user", "Missing"): [datetime(2023, 1, 6)]})
+        with self.assertRaises(ValueError):
+            self.storage.remove_user("other_user")
+        self.assertEqual(len(self.storage.completions("test_user", "Exercise")), 4)
+
+    def test_find_habit_uses_index(self):
+        plan = self.storage.connection.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM habits WHERE name = 'Read'").fetchall()
+        self.assertIn("habits_name", " ".join(str(row) for row in plan))
+
+    def test_completions_use_index(self):
+        plan = self.storage.connection.execute(
+            "EXPLAIN QUERY PLAN SELECT completed_at FROM completions "
+            "WHERE habit_id = 1 AND completed_at >= 0 AND completed_at < 1 ORDER BY completed_at").fetchall()
+        self.assertIn("completions_habit_time", " ".join(str(row) for row in plan))
+
+    def test_convert(self):
+        users = load_users(self.file_path)
+        json_path = os.path.join(self.tmp_dir.name, 'copy.json')
+        save_users(users, json_path)
+        db_path = os.path.join(self.tmp_dir.name, 'copy.db')
+        save_users(load_users(json_path), db_path)
+        self.assertEqual({username: user.to_dict() for username, user in load_users(db_path).items()},
+                         {username: user.to_dict() for username, user in users.items()})
+
+if __name__ == '__main__':
+    unittest.main()
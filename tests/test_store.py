@@ -0,0 +1,95 @@
+import os
+import json
+import tempfile
+import unittest
+from datetime import datetime
+from src.user import User
+from src.habit import Habit
+from src.store import LazyUserStore
+
+class TestLazyUserStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, 'users_data.json')
+        self.users = {}
+        for username in ("alice", "bob", "carol"):
+            user = User(username, f"{username}@example.com")
+            habit = Habit("Exercise", "daily")
+            habit.completion_dates = [datetime(2023, 1, 1), datetime(2023, 1, 2)]
+            user.add_habit(habit)
+            self.users[username] = user
+        User.save_all_to_json(self.users, self.file_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_snapshot_format_unchanged(self):
+        with open(self.file_path) as f:
+            written = f.read()
+        expected = json.dumps({username: user.to_dict() for username, user in self.users.items()}, indent=4)
+        self.assertEqual(written, expected)
+
+    def test_users_are_loaded_on_access(self):
+        store = LazyUserStore(self.file_path)
+        self.assertEqual(list(store), ["alice", "bob", "carol"])
+        self.assertIn("bob", store)
+        self.assertFalse(store.is_loaded("bob"))
+
+        user = store["bob"]
+        self.assertTrue(store.is_loaded("bob"))
+        self.assertFalse(store.is_loaded("alice"))
+        self.assertEqual(user.email, "bob@example.com")
+        self.assertEqual(user.get_habit_by_name("Exercise").completion_dates,
+                         [datetime(2023, 1, 1), datetime(2023, 1, 2)])
+
+    def test_missing_user(self):
+        store = LazyUserStore(self.file_path)
+        with self.assertRaises(KeyError):
+            store["dave"]
+        self.assertIsNone(store.get("dave"))
+
+    def test_stale_index_is_rebuilt(self):
+        LazyUserStore(self.file_path).close()
+        self.assertTrue(os.path.exists(f"{self.file_path}.idx"))
+        with open(self.file_path, 'w') as f:
+            json.dump({"dave": User("dave", "dave@example.com").to_dict(), "ünïcode": User("ünïcode", "u@example.com").to_dict()},
+                      f, ensure_ascii=False)
+        store = LazyUserStore(self.file_path)
+        self.assertEqual(store["ünïcode"].email, "u@example.com")
+        self.assertEqual(store["dave"].email, "dave@example.com")
+
+    def test_missing_file(self):
+        store = LazyUserStore(os.path.join(self.tmp_dir.name, 'missing.json'))
+        self.assertEqual(len(store), 0)
+
+    def test_save_copies_untouched_users(self):
+        store = LazyUserStore(self.file_path)
+        store["bob"].get_habit_by_name("Exercise").completion_dates.append(datetime(2023, 1, 3))
+        store["dave"] = User("dave", "dave@example.com")
+        del store["carol"]
+        store.save()
+
+        self.assertFalse(store.is_loaded("alice"))
+        users = User.load_all_from_json(self.file_path)
+        self.assertEqual(list(users), ["alice", "bob", "dave"])
+        self.assertEqual(len(users["bob"].get_habit_by_name("Exercise").completion_dates), 3)
+        self.assertEqual(len(users["alice"].get_habit_by_name("Exercise").completion_dates), 2)
+
+        reloaded = LazyUserStore(self.file_path)
+        self.assertEqual(reloaded["alice"].email, "alice@example.com")
+        self.assertEqual(reloaded["dave"].email, "dave@example.com")
+
+    def test_index_only_for_live_snapshot(self):
+        self.assertFalse(os.path.exists(f"{self.file_path}.idx"))
+        store = LazyUserStore(self.file_path)
+        copy_path = os.path.join(self.tmp_dir.name, 'copy.json')
+        store.save(copy_path)
+        self.assertFalse(os.path.exists(f"{copy_path}.idx"))
+        os.remove(f"{self.file_path}.idx")
+        store.save()
+        self.assertTrue(os.path.exists(f"{self.file_path}.idx"))
+        store.close()
+
+if __name__ == '__main__':
+    unittest.main()
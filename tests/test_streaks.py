@@ -0,0 +1,72 @@
+import unittest
+from datetime import datetime, timedelta
+from src.habit import Habit
+from src.analytics import calculate_streak, get_completion_rate, get_current_streak
+from src.scheduler import advance
+from src.streaks import (FREQUENCIES, FrequencyRule, Streaks, calculate_streaks, count_streaks, get_rule,
+                         register_frequency)
+
+class TestStreaks(unittest.TestCase):
+
+    def test_count_streaks(self):
+        self.assertEqual(count_streaks([]), Streaks(0, 0))
+        self.assertEqual(count_streaks([1, 2, 3, 5, 6]), Streaks(3, 2))
+
+    def test_daily_counts_calendar_days(self):
+        dates = [datetime(2023, 1, 1, 8), datetime(2023, 1, 2, 23), datetime(2023, 1, 3, 1), datetime(2023, 1, 5)]
+        self.assertEqual(calculate_streaks(dates, "daily"), Streaks(3, 1))
+
+    def test_completions_in_one_period_count_once(self):
+        dates = [datetime(2023, 1, 1), datetime(2023, 1, 20), datetime(2023, 1, 31), datetime(2023, 2, 1)]
+        self.assertEqual(calculate_streaks(dates, "monthly"), Streaks(2, 2))
+        # Weeks start on Monday: Sunday January 1st and Monday January 2nd are in consecutive weeks
+        self.assertEqual(calculate_streaks(dates[:1] + [datetime(2023, 1, 2), datetime(2023, 1, 8)], "weekly"),
+                         Streaks(2, 2))
+
+    def test_weekdays(self):
+        # Friday, Saturday, Monday, Wednesday
+        dates = [datetime(2023, 1, 6), datetime(2023, 1, 7), datetime(2023, 1, 9), datetime(2023, 1, 11)]
+        self.assertEqual(calculate_streaks(dates, "weekdays"), Streaks(2, 1))
+        self.assertEqual(advance(datetime(2023, 1, 6, 9), "weekdays"), datetime(2023, 1, 9))
+
+    def test_every_n_days(self):
+        rule = get_rule("every 3 days")
+        self.assertIs(get_rule("every 3 days"), rule)
+        start = rule.start(rule.bucket(datetime(2023, 1, 1)))
+        self.assertEqual(rule.bucket(start), rule.bucket(datetime(2023, 1, 1)))
+        dates = [start, start + timedelta(days=2), start + timedelta(days=5)]
+        self.assertEqual(calculate_streaks(dates, "every 3 days"), Streaks(2, 2))
+        self.assertEqual(advance(start, "every 3 days"), start + timedelta(days=3))
+
+    def test_register_frequency(self):
+        rule = register_frequency(FrequencyRule("yearly", lambda date: date.year))
+        try:
+            self.assertIs(get_rule("yearly"), rule)
+            habit = Habit("Checkup", "yearly")
+            for year in (2020, 2021, 2021, 2023):
+                habit.add_completion(datetime(year, 6, 1))
+            self.assertEqual((habit.get_longest_streak(), habit.get_current_streak()), (2, 1))
+            self.assertEqual(get_completion_rate(habit, datetime(2020, 1, 1), datetime(2024, 1, 1)), 0.75)
+        finally:
+            del FREQUENCIES["yearly"]
+
+    def test_unsupported_frequency(self):
+        for frequency in ("hourly", "every 0 days"):
+            with self.assertRaises(ValueError):
+                get_rule(frequency)
+        self.assertEqual(calculate_streak([datetime(2023, 1, 1)], "hourly"), 1)
+
+    def test_habit_and_analytics_agree(self):
+        habit = Habit("Exercise", "weekdays")
+        # Monday to Wednesday, then Friday to Tuesday (skipping the weekend), then Thursday
+        dates = [datetime(2023, 1, day, 7) for day in (2, 3, 3, 4, 6, 9, 10, 12)]
+        for date in dates:
+            habit.add_completion(date)
+        self.assertEqual(habit.get_longest_streak(), calculate_streak(dates, "weekdays"))
+        self.assertEqual(habit.get_longest_streak(), 3)
+        self.assertEqual(habit.get_current_streak(), 1)
+        self.assertEqual(get_current_streak(habit, datetime(2023, 1, 13)), 1)
+        self.assertEqual(get_current_streak(habit, datetime(2023, 1, 17)), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 import os
 import json
+from datetime import datetime
 from src.user import User
 from src.habit import Habit
 
@@ -33,6 +34,17 @@ class TestUser(unittest.TestCase):
         self.assertIn(self.habit1, habits)
         self.assertIn(self.habit2, habits)
 
+    def test_habits_view(self):
+        habits = self.user.get_habits()
+        self.user.add_habit(self.habit1)
+        self.assertEqual(habits, [self.habit1])
+        self.assertIs(self.user.habits[0], self.habit1)
+        # Changes must go through add_habit so lookups by name see them
+        with self.assertRaises(AttributeError):
+            self.user.habits.append(self.habit2)
+        self.user.remove_habit(self.habit1)
+        self.assertEqual(len(habits), 0)
+
     def test_get_habit_by_name(self):
         self.user.add_habit(self.habit1)
         habit = self.user.get_habit_by_name("Exercise")
@@ -42,6 +54,58 @@ class TestUser(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.user.get_habit_by_name("Nonexistent Habit")
 
+    def test_add_duplicate_habit(self):
+        self.user.add_habit(self.habit1)
+        with self.assertRaises(ValueError):
+            self.user.add_habit(Habit("Exercise", "weekly"))
+        self.assertIs(self.user.get_habit_by_name("Exercise"), self.habit1)
+
+    def test_remove_habit_with_same_name(self):
+        self.user.add_habit(self.habit1)
+        self.user.remove_habit(Habit("Exercise", "daily"))  # a different habit with the same name
+        self.assertIs(self.user.get_habit_by_name("Exercise"), self.habit1)
+
+    def test_habit_index_after_remove(self):
+        self.user.add_habit(self.habit1)
+        self.user.remove_habit(self.habit1)
+        with self.assertRaises(ValueError):
+            self.user.get_habit_by_name("Exercise")
+        self.user.add_habit(Habit("Exercise", "weekly"))
+        self.assertEqual(self.user.get_habit_by_name("Exercise").frequency, "weekly")
+
+    def test_from_dict_merges_duplicate_habits(self):
+        # Older versions let create_habit add a second habit with the same name
+        self.habit1.add_completion(datetime(2023, 1, 1))
+        duplicate = Habit("Exercise", "weekly")
+        duplicate.add_completion(datetime(2023, 1, 2))
+        duplicate.add_completion(datetime(2023, 1, 1))
+        data = {
+            'username': "test_user",
+            'email': "test_user@example.com",
+            'habits': [self.habit1.to_dict(), self.habit2.to_dict(), duplicate.to_dict()]
+        }
+        user = User.from_dict(data)
+        self.assertEqual([habit.name for habit in user.get_habits()], ["Exercise", "Read"])
+        habit = user.get_habit_by_name("Exercise")
+        self.assertEqual(habit.frequency, "daily")
+        self.assertEqual(habit.completion_dates, [datetime(2023, 1, 1), datetime(2023, 1, 2)])
+
+    def test_remove_keeps_order(self):
+        habit3 = Habit("Meditate", "daily")
+        for habit in (self.habit1, self.habit2, habit3):
+            self.user.add_habit(habit)
+        self.user.remove_habit(self.habit2)
+        self.assertEqual(list(self.user.get_habits()), [self.habit1, habit3])
+        self.assertNotIn(self.habit2, self.user.get_habits())
+        self.assertNotIn(Habit("Exercise", "daily"), self.user.get_habits())
+
+    def test_from_dict_builds_habit_index(self):
+        self.user.add_habit(self.habit1)
+        self.user.add_habit(self.habit2)
+        user = User.from_dict(self.user.to_dict())
+        self.assertEqual([habit.name for habit in user.get_habits()], ["Exercise", "Read"])
+        self.assertEqual(user.get_habit_by_name("Read").frequency, "weekly")
+
     def test_save_and_load_user(self):
         self.user.add_habit(self.habit1)
         self.user.add_habit(self.habit2)